@@ -41,6 +41,7 @@ CACHE_TIMES = {
     'analysis': 600,               # 分析结果缓存10分钟
     'query_history': 300,          # 查询历史缓存5分钟
     'building_data': 600,          # 楼栋数据缓存10分钟
+    'building_trend': 600,         # 楼栋每日趋势缓存10分钟
     'history_times': 300,          # 历史时间点缓存5分钟
     'history_data': 600,           # 历史数据缓存10分钟
     'room_history': 600            # 房间历史数据缓存10分钟
@@ -1,6 +1,11 @@
 from flask import jsonify, request
 import datetime
 import pymysql
+import sys
+import os
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+from utils.wide_table_migration import legacy_reads_enabled, migration_complete
 from ..config import DB_CONFIG
 from ..database import get_db_connection, get_db_tables, get_table_structure, get_sample_data
 from . import debug_bp
@@ -28,6 +33,13 @@ def debug_database_info():
                 conn = get_db_connection()
                 cursor = conn.cursor()
                 
+                # 宽表已迁移时不再逐列统计，每列一次全表扫描
+                result['wide_table_migrated'] = migration_complete(cursor)
+                if not legacy_reads_enabled(cursor):
+                    cursor.close()
+                    conn.close()
+                    continue
+                
                 cursor.execute(f"SHOW COLUMNS FROM {table}")
                 all_columns = [col[0] for col in cursor.fetchall()]
                 result['electricity_history_columns'] = all_columns
@@ -94,6 +106,13 @@ def fix_history_data():
                 'message': '电量历史表不存在，无法修复'
             })
         
+        # 宽表已迁移到electricity_records，不再为其增加列
+        if not legacy_reads_enabled(cursor):
+            return jsonify({
+                'success': False,
+                'message': '电量历史宽表已停用（已迁移到electricity_records），无需修复'
+            })
+        
         # 检查是否有查询历史记录
         cursor.execute("SELECT COUNT(*) FROM query_history")
         if cursor.fetchone()[0] == 0:
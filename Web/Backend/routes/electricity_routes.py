@@ -68,29 +68,13 @@ def get_analysis():
 @electricity_bp.route('/api/building_data')
 @cache_with_redis(expire=CACHE_TIMES['building_data'])
 def get_building_data():
-    """获取楼栋数据"""
+    """获取楼栋数据，读取入库时写入的楼栋汇总"""
     analyzer = ElectricityAnalysis(
         DB_CONFIG['host'], 
         DB_CONFIG['user'], 
         DB_CONFIG['password']
     )
-    data, query_time = analyzer.get_latest_data()
-    
-    building_stats = []
-    for building, rooms in data.items():
-        if rooms:
-            electricity_values = list(rooms.values())
-            avg_electricity = sum(electricity_values) / len(electricity_values)
-            min_electricity = min(electricity_values)
-            max_electricity = max(electricity_values)
-            
-            building_stats.append({
-                'building': building,
-                'count': len(rooms),
-                'average': avg_electricity,
-                'min': min_electricity,
-                'max': max_electricity
-            })
+    building_stats, query_time = analyzer.get_building_stats()
     
     # 按照楼栋编号排序
     building_stats.sort(key=lambda x: x['building'])
@@ -98,4 +82,20 @@ def get_building_data():
     return jsonify({
         'query_time': query_time,
         'building_stats': building_stats
-    }) 
\ No newline at end of file
+    })
+
+@electricity_bp.route('/api/building_trend', defaults={'days': 30})
+@electricity_bp.route('/api/building_trend/<int:days>')
+@cache_with_redis(expire=CACHE_TIMES['building_trend'])
+def get_building_trend(days):
+    """获取各楼栋最近若干天的每日汇总（缓存键包含days，因此天数放在路径中）"""
+    days = max(1, min(days, 366))
+    analyzer = ElectricityAnalysis(
+        DB_CONFIG['host'], 
+        DB_CONFIG['user'], 
+        DB_CONFIG['password']
+    )
+    return jsonify({
+        'days': days,
+        'trend': analyzer.get_building_trend(days)
+    }) 
@@ -2,6 +2,12 @@ from flask import jsonify, request
 import urllib.parse
 import pymysql
 import datetime
+import sys
+import os
+# 添加项目根目录到路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+from utils.db_migrations import crawl_id_range, table_exists
+from utils.wide_table_migration import legacy_reads_enabled
 from ..config import DB_CONFIG, CACHE_TIMES
 from ..cache import cache_with_redis
 from ..database import get_db_connection, get_query_history_records
@@ -28,28 +34,30 @@ def get_history_times():
         # 调试信息
         debug_info = {}
         
-        # 统计记录总数
-        cursor.execute("SELECT COUNT(*) AS count FROM electricity_records")
+        # 统计记录总数 - 每次查询的记录数在入库时写入query_history，不再扫描electricity_records
+        cursor.execute("SELECT COALESCE(SUM(record_count), 0) AS count FROM query_history")
         result = cursor.fetchone()
-        record_count = result['count'] if result else 0
+        record_count = int(result['count']) if result else 0
         debug_info['total_records'] = record_count
         
         print(f"开始查询历史时间点，共有 {record_count} 条记录")
         
-        # 使用简单的SQL查询获取历史时间点
+        # 每次查询在query_history中只有一行，按主键时间倒序取最近100次；
+        # record_count为NULL的是迁移回填不到的旧查询，记录数未知，仍然列出
         try:
             cursor.execute("""
                 SELECT 
+                    id,
                     DATE_FORMAT(query_time, '%Y%m%d%H%i') AS time_id_format,
-                    DATE_FORMAT(query_time, '%Y-%m-%d %H:%i') AS formatted_time,
-                    COUNT(*) AS record_count,
-                    MAX(query_time) AS latest_time
+                    query_time,
+                    description,
+                    record_count
                 FROM 
-                    electricity_records
-                GROUP BY 
-                    time_id_format, formatted_time
+                    query_history
+                WHERE 
+                    record_count IS NULL OR record_count > 0
                 ORDER BY 
-                    latest_time DESC
+                    query_time DESC
                 LIMIT 100
             """)
             
@@ -76,8 +84,7 @@ def get_history_times():
         for point in time_points:
             # 从格式化字段提取时间ID (使用time_id_format字段)
             time_id_raw = point.get('time_id_format')
-            formatted_time = point.get('formatted_time')
-            record_count = point.get('record_count', 0)
+            record_count = point.get('record_count')
             
             # 确保time_id是一个有效的字符串
             if not time_id_raw or time_id_raw == 'None' or time_id_raw == 'null':
@@ -87,45 +94,15 @@ def get_history_times():
             # 强制转换为字符串并移除任何空白字符
             time_id_str = str(time_id_raw).strip()
             
-            # 创建包含有效time_id的记录
+            description = point.get('description') or "电量记录"
             time_record = {
                 'time_id': time_id_str,  # 确保这是一个字符串
-                'query_time': formatted_time,
-                'description': f"电量记录 ({record_count}条)",
+                'query_time': point['query_time'].strftime('%Y-%m-%d %H:%M:%S'),
+                'description': f"{description} ({record_count}条)" if record_count is not None else description,
                 'record_count': record_count,
-                'id': 0
+                'id': point['id']
             }
             
-            # 尝试从query_history找到对应的描述
-            try:
-                # 使用时间范围查询，匹配同一分钟内的查询历史
-                minute_start = formatted_time + ":00"
-                minute_end = formatted_time + ":59"
-                
-                cursor.execute("""
-                    SELECT id, query_time, description 
-                    FROM query_history 
-                    WHERE query_time BETWEEN %s AND %s
-                    ORDER BY query_time DESC
-                    LIMIT 1
-                """, (minute_start, minute_end))
-                
-                history_record = cursor.fetchone()
-                
-                # 如果找到了匹配的查询历史记录，更新描述信息
-                if history_record:
-                    time_record['id'] = history_record['id']
-                    
-                    # 使用更精确的时间
-                    if history_record['query_time']:
-                        time_record['query_time'] = history_record['query_time'].strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    if history_record['description']:
-                        time_record['description'] = f"{history_record['description']} ({record_count}条)"
-            except Exception as qh_error:
-                debug_info['query_history_error'] = str(qh_error)
-                print(f"  查询历史记录出错: {str(qh_error)}")
-            
             valid_times.append(time_record)
             
         cursor.close()
@@ -219,7 +196,7 @@ def get_history_data(time_id):
                 debug_info['formatted_date'] = formatted_date
                 print(f"按日期查询：{formatted_date}")
                 
-                # 查询该日期的所有数据
+                # 查询该日期的所有数据 - crawl_id范围扫描，走idx_crawl索引
                 cursor.execute("""
                     SELECT building, room, electricity, 
                            CONCAT(
@@ -231,9 +208,9 @@ def get_history_data(time_id):
                                 LPAD(SECOND(query_time), 2, '0')
                            ) AS query_time
                     FROM electricity_records
-                    WHERE DATE(query_time) = %s
+                    WHERE crawl_id BETWEEN %s AND %s
                     ORDER BY query_time DESC
-                """, (formatted_date,))
+                """, crawl_id_range(time_id))
                 
                 # 设置显示时间为该天
                 display_time = formatted_date
@@ -252,7 +229,7 @@ def get_history_data(time_id):
                 debug_info['formatted_datetime'] = formatted_datetime
                 print(f"按时间点查询：{formatted_datetime}")
                 
-                # 查询指定分钟的数据 - 使用CONCAT替代DATE_FORMAT
+                # 查询指定分钟的数据 - crawl_id范围扫描，走idx_crawl索引
                 cursor.execute("""
                     SELECT building, room, electricity, 
                           CONCAT(
@@ -264,15 +241,9 @@ def get_history_data(time_id):
                                LPAD(SECOND(query_time), 2, '0')
                           ) AS query_time
                     FROM electricity_records
-                    WHERE CONCAT(
-                             YEAR(query_time),
-                             LPAD(MONTH(query_time), 2, '0'),
-                             LPAD(DAY(query_time), 2, '0'),
-                             LPAD(HOUR(query_time), 2, '0'),
-                             LPAD(MINUTE(query_time), 2, '0')
-                         ) = %s
+                    WHERE crawl_id BETWEEN %s AND %s
                     ORDER BY query_time DESC
-                """, (time_id,))
+                """, crawl_id_range(time_id))
                 
                 # 设置显示时间为该分钟
                 display_time = formatted_datetime
@@ -307,9 +278,9 @@ def get_history_data(time_id):
                                                 LPAD(SECOND(query_time), 2, '0')
                                            ) AS query_time
                                     FROM electricity_records
-                                    WHERE DATE(query_time) = %s
+                                    WHERE crawl_id BETWEEN %s AND %s
                                     ORDER BY query_time DESC
-                                """, (formatted_date,))
+                                """, crawl_id_range(date_id))
                                 
                                 display_time = formatted_date
                                 debug_info['query_type'] = 'by_date_string'
@@ -479,12 +450,39 @@ def get_room_history(building, room):
                 except (ValueError, TypeError):
                     # 跳过无效数据
                     continue
+            
+            # 超出完整精度保留期的数据已降采样为每天一行，接在完整记录之后，取每天最后一次读数；
+            # 尚未执行迁移6的库没有electricity_daily表
+            oldest_time = records[-1]['query_time'] if records else None
+            daily_records = []
+            if table_exists(cursor, 'electricity_daily'):
+                cursor.execute("""
+                    SELECT DATE_FORMAT(last_time, '%%Y-%%m-%%d %%H:%%i:%%s') AS query_time, last_electricity
+                    FROM electricity_daily
+                    WHERE building = %s AND room = %s
+                    ORDER BY day DESC
+                """, (building, room))
+                daily_records = cursor.fetchall()
+            for record in daily_records:
+                if record['last_electricity'] is None or (oldest_time and record['query_time'] >= oldest_time):
+                    continue
+                result.append({
+                    'query_time': record['query_time'],
+                    'electricity': float(record['last_electricity']),
+                    'resolution': 'daily'
+                })
                     
             return jsonify({
                 'building': building,
                 'room': room,
                 'history': result
             })
+        elif not legacy_reads_enabled(cursor):
+            return jsonify({
+                'building': building,
+                'room': room,
+                'history': []
+            })
         else:
             # 使用旧表结构 - 保持原有逻辑
             # 获取所有电量列
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""eleresult页面剩余电量提取的微基准
+
+对比快速路径(正则)与原BeautifulSoup路径在样例页面上的耗时，并校验两者结果一致。
+
+用法:
+    python benchmarks/bench_eleresult_parser.py [--number 2000]
+"""
+import os
+import sys
+import json
+import timeit
+import argparse
+
+# 添加项目根目录到系统路径
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
+from utils.eleresult_parser import (extract_remaining_electricity,
+                                    extract_remaining_electricity_soup)
+
+FIXTURE_DIR = os.path.join(ROOT_DIR, "benchmarks", "fixtures")
+SAMPLE_PAGES = [
+    "eleresult_ok.html", "eleresult_nested.html", "eleresult_failed.html",
+    # 值div含嵌套标签且其后还有纯文本div；值中含HTML实体
+    "eleresult_trailing.html", "eleresult_entity.html",
+]
+
+
+def bench_page(html, number):
+    """返回单个页面上两种路径的每次调用耗时(微秒)"""
+    fast = min(timeit.repeat(lambda: extract_remaining_electricity(html), number=number, repeat=3))
+    soup = min(timeit.repeat(lambda: extract_remaining_electricity_soup(html), number=number, repeat=3))
+    return fast / number * 1e6, soup / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='eleresult剩余电量提取微基准')
+    parser.add_argument('--number', type=int, default=2000, help='每轮调用次数')
+    args = parser.parse_args()
+
+    report = []
+    for name in SAMPLE_PAGES:
+        with open(os.path.join(FIXTURE_DIR, name), "r", encoding="utf-8") as f:
+            html = f.read()
+
+        fast_value = extract_remaining_electricity(html)
+        soup_value = extract_remaining_electricity_soup(html)
+        if fast_value != soup_value:
+            raise SystemExit(f"{name}: 快速路径结果 {fast_value!r} 与BeautifulSoup结果 {soup_value!r} 不一致")
+
+        fast_us, soup_us = bench_page(html, args.number)
+        report.append({
+            'page': name,
+            'value': fast_value,
+            'fast_us': round(fast_us, 2),
+            'soup_us': round(soup_us, 2),
+            'speedup': round(soup_us / fast_us, 1) if fast_us else None
+        })
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
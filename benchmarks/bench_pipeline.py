@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""批量查询到入库全流程的基准
+
+在本地模拟服务器(ykt_stub_server.py)上运行批量查询，随后调用save_batch_to_history_database写入数据库，
+对不同的并发上限和上游延迟分布逐一测量，输出JSON:
+吞吐量(间/秒)、请求延迟p50/p95/p99、峰值内存(RSS)、all_room写入耗时和历史记录写入耗时。
+
+每个测量点在独立的子进程中运行，峰值内存和各模块的进程内状态互不影响。
+写入数据库时默认使用独立的electricity_bench库，不会影响正式数据。
+
+用法:
+    python benchmarks/bench_pipeline.py --concurrency 20,60,100 --latency fixed:20 --latency lognormal:80,0.5
+    python benchmarks/bench_pipeline.py --no-db --buildings 1 2 --repeat 3 --output bench.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import datetime
+import concurrent.futures
+import multiprocessing
+
+# 添加项目根目录到系统路径
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+BENCH_DIR = os.path.join(ROOT_DIR, "benchmarks")
+if BENCH_DIR not in sys.path:
+    sys.path.append(BENCH_DIR)
+
+from ykt_stub_server import StubServer
+
+
+def peak_rss_bytes():
+    """当前进程的峰值常驻内存(字节)，无法获取时返回None"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux单位为KB，macOS为字节
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        memory = psutil.Process().memory_info()
+        return getattr(memory, 'peak_wset', memory.rss)
+    except ImportError:
+        return None
+
+
+def run_case(case):
+    """在子进程中运行一个测量点，返回测量结果"""
+    os.chdir(ROOT_DIR)
+    from config.config import Config
+    Config.YKT_BASE_URL = case['upstream']
+    from utils.query_electricity import ElectricityQuery
+
+    query = ElectricityQuery()
+    query.db_host = case['db_host']
+    query.db_user = case['db_user']
+    query.db_password = case['db_password']
+    query.db_name = case['db_name']
+    query.write_all_room = case['db']
+    query.write_snapshot = False
+    query.prune_dead_rooms = False
+    if case['engine'] == 'async':
+        query.async_concurrency = case['concurrency']
+    else:
+        query.max_workers = case['concurrency']
+
+    started = time.monotonic()
+    if case['engine'] == 'async':
+        results, query_time = query.query_all_rooms_async(buildings=case['buildings'])
+    else:
+        results, query_time = query.query_all_rooms(buildings=case['buildings'])
+    crawl_seconds = time.monotonic() - started
+
+    stats = results.get('stats', {}) if results else {}
+    history_seconds = None
+    history_saved = None
+    if case['db'] and stats.get('success_count'):
+        started = time.monotonic()
+        history_saved = query.save_batch_to_history_database(query_time, results)
+        history_seconds = round(time.monotonic() - started, 3)
+
+    latency = stats.get('latency', {})
+    total = stats.get('total_count', 0)
+    return {
+        'engine': case['engine'],
+        'concurrency': case['concurrency'],
+        'latency_model': case['latency_model'],
+        'repeat': case['repeat'],
+        'total_count': total,
+        'success_count': stats.get('success_count', 0),
+        'crawl_seconds': round(crawl_seconds, 3),
+        'rooms_per_second': round(total / crawl_seconds, 1) if crawl_seconds > 0 else None,
+        'p50': latency.get('p50'),
+        'p95': latency.get('p95'),
+        'p99': latency.get('p99'),
+        'hedge_rate': latency.get('hedge_rate'),
+        'peak_rss_mb': round(peak_rss_bytes() / 1024 / 1024, 1) if peak_rss_bytes() else None,
+        'all_room_write_seconds': stats.get('db_write', {}).get('write_seconds') if case['db'] else None,
+        'history_write_seconds': history_seconds,
+        'history_saved': history_saved,
+        'db_failed': stats.get('db_write', {}).get('failed') if case['db'] else None,
+        'rate_controller': stats.get('rate_controller'),
+    }
+
+
+def environment():
+    """记录运行环境，便于对比不同机器和版本的结果"""
+    commit = None
+    try:
+        import subprocess
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        pass
+    return {
+        'time': datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'host': socket.gethostname(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit,
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='批量查询到入库全流程的基准')
+    parser.add_argument('--engine', choices=['async', 'thread'], default='async', help='查询引擎')
+    parser.add_argument('--concurrency', default='20,60,100', help='逗号分隔的并发上限列表')
+    parser.add_argument('--latency', action='append', help='上游延迟分布，可重复指定，格式见ykt_stub_server.py')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='上游返回503的比例')
+    parser.add_argument('--buildings', type=int, nargs='+', choices=range(1, 7), help='只查询这些楼栋')
+    parser.add_argument('--repeat', type=int, default=1, help='每个测量点重复次数')
+    parser.add_argument('--seed', type=int, default=42, help='模拟服务器随机种子')
+    parser.add_argument('--no-db', action='store_true', help='不写入数据库，只测量查询')
+    parser.add_argument('--db-host', default='localhost')
+    parser.add_argument('--db-user', default='root')
+    parser.add_argument('--db-password', default='')
+    parser.add_argument('--db-name', default='electricity_bench', help='基准使用的数据库，不要指向正式库')
+    parser.add_argument('--output', help='结果写入的JSON文件，默认打印到标准输出')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    levels = [int(value) for value in args.concurrency.split(',') if value]
+    latencies = args.latency or ['fixed:20', 'lognormal:80,0.5']
+    context = multiprocessing.get_context('spawn')
+
+    cases = []
+    for latency_model in latencies:
+        with StubServer(latency=latency_model, error_rate=args.error_rate, seed=args.seed) as server:
+            for concurrency in levels:
+                for repeat in range(args.repeat):
+                    case = {
+                        'upstream': server.base_url,
+                        'engine': args.engine,
+                        'concurrency': concurrency,
+                        'latency_model': latency_model,
+                        'repeat': repeat,
+                        'buildings': args.buildings,
+                        'db': not args.no_db,
+                        'db_host': args.db_host,
+                        'db_user': args.db_user,
+                        'db_password': args.db_password,
+                        'db_name': args.db_name,
+                    }
+                    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        result = executor.submit(run_case, case).result()
+                    print(f"[{latency_model} 并发{concurrency} #{repeat}] {result['rooms_per_second']} 间/秒, "
+                          f"p95 {result['p95']}s", file=sys.stderr)
+                    cases.append(result)
+
+    payload = json.dumps({'environment': environment(), 'cases': cases}, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
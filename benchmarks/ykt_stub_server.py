@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""一卡通服务的本地模拟服务器
+
+提供 /ykt/h5/eleresult、/ykt/h5/loadbill.json 和 /ykt/h5/index 三个接口，
+页面由 benchmarks/fixtures 中的样例生成，可配置延迟分布、错误注入和每个房间的电量，
+用于在不访问校园服务器的情况下对批量查询和账单查询做压测。
+/__stats 返回各接口的请求计数，/__reset 清零计数。
+
+客户端通过环境变量LIXIN_YKT_BASE_URL切换到模拟服务器:
+    python benchmarks/ykt_stub_server.py --port 8765 --latency lognormal:80,0.5 --error-rate 0.02
+    LIXIN_YKT_BASE_URL=http://127.0.0.1:8765 python -m utils.crawl --output none
+
+延迟分布格式(毫秒):
+    none | fixed:50 | uniform:20,200 | lognormal:80,0.5(中位数,sigma) | pareto:30,2.5(最小值,alpha)
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_DIR = os.path.join(ROOT_DIR, "benchmarks", "fixtures")
+
+INDEX_PAGE = """<!DOCTYPE html>
+<html lang="zh-CN"><head><meta charset="UTF-8"><title>一卡通</title></head>
+<body><div class="page"><h1 class="page__title">一卡通</h1><p>本地模拟服务器</p></div></body></html>
+"""
+
+
+class LatencyModel:
+    """按分布生成响应延迟(秒)"""
+
+    def __init__(self, spec="none", seed=None):
+        self.spec = spec
+        self.kind, _, params = spec.partition(":")
+        self.params = [float(value) for value in params.split(",")] if params else []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        expected = {"none": 0, "fixed": 1, "uniform": 2, "lognormal": 2, "pareto": 2}
+        if self.kind not in expected or len(self.params) != expected[self.kind]:
+            raise ValueError(f"无法识别的延迟分布: {spec}")
+
+    def sample(self):
+        with self._lock:
+            if self.kind == "none":
+                return 0.0
+            if self.kind == "fixed":
+                milliseconds = self.params[0]
+            elif self.kind == "uniform":
+                milliseconds = self._random.uniform(*self.params)
+            elif self.kind == "lognormal":
+                median, sigma = self.params
+                milliseconds = median * self._random.lognormvariate(0, sigma)
+            else:
+                minimum, alpha = self.params
+                milliseconds = minimum * self._random.paretovariate(alpha)
+        return milliseconds / 1000
+
+
+class StubState:
+    """模拟服务器的配置和请求计数，处理线程共享"""
+
+    def __init__(self, latency="none", error_rate=0.0, fail_rate=0.0, hang_rate=0.0, hang_seconds=30,
+                 values=None, bill_pages=5, seed=None):
+        self.latency = LatencyModel(latency, seed)
+        self.error_rate = error_rate
+        self.fail_rate = fail_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        # roomid -> 电量；值为None的房间返回查询失败页面
+        self.values = values or {}
+        self.bill_pages = bill_pages
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {}
+
+        with open(os.path.join(FIXTURE_DIR, "eleresult_ok.html"), encoding="utf-8") as f:
+            self.ok_template = f.read().replace("42.37度", "{value}度")
+        with open(os.path.join(FIXTURE_DIR, "eleresult_failed.html"), encoding="utf-8") as f:
+            self.failed_page = f.read().encode("utf-8")
+
+    def count(self, key):
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    def roll(self):
+        """返回本次请求注入的故障: 'error'、'hang' 或 None"""
+        with self._lock:
+            draw = self._random.random()
+        if draw < self.error_rate:
+            return "error"
+        if draw < self.error_rate + self.hang_rate:
+            return "hang"
+        return None
+
+    def electricity_for(self, roomid):
+        """房间的电量：优先使用配置的值，否则由roomid确定性生成"""
+        if roomid in self.values:
+            return self.values[roomid]
+        if self.fail_rate and (zlib.crc32(f"fail:{roomid}".encode()) % 10000) / 10000 < self.fail_rate:
+            return None
+        return f"{zlib.crc32(roomid.encode()) % 20000 / 100:.2f}"
+
+    def bill_page(self, page_no):
+        """生成确定性的账单分页数据，格式与loadbill.json一致"""
+        now_ms = int(time.time() * 1000)
+        items = []
+        if 1 <= page_no <= self.bill_pages:
+            for index in range(10):
+                seed = zlib.crc32(f"bill:{page_no}:{index}".encode())
+                items.append({
+                    "createtime": now_ms - (page_no * 10 + index) * 3600 * 1000,
+                    "amount": -((seed % 3000) / 100 + 1),
+                    "tradename": "消费" if seed % 5 else "充值",
+                    "shopname": ["第一食堂", "第二食堂", "超市", ""][seed % 4],
+                    "status": 2 if seed % 50 else 1,
+                })
+        return {"retcode": 0, "retmsg": "成功", "totalpage": self.bill_pages, "dtls": items}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "YktStub/1.0"
+
+    def log_message(self, format, *args):
+        # 压测时不打印每个请求
+        pass
+
+    def _send(self, status, body, content_type="text/html; charset=utf-8"):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        state = self.server.state
+        parts = urlsplit(self.path)
+        params = {key: values[0] for key, values in parse_qs(parts.query).items()}
+
+        if parts.path == "/__stats":
+            with state._lock:
+                counts = dict(state.counts)
+            return self._send(200, json.dumps(counts), "application/json")
+        if parts.path == "/__reset":
+            with state._lock:
+                state.counts.clear()
+            return self._send(200, "{}", "application/json")
+
+        routes = {
+            "/ykt/h5/eleresult": self._eleresult,
+            "/ykt/h5/loadbill.json": self._loadbill,
+            "/ykt/h5/index": self._index,
+        }
+        handler = routes.get(parts.path)
+        if handler is None:
+            state.count("not_found")
+            return self._send(404, "Not Found")
+
+        delay = state.latency.sample()
+        fault = state.roll()
+        if fault == "hang":
+            delay += state.hang_seconds
+        if delay:
+            time.sleep(delay)
+        if fault == "error":
+            state.count("error")
+            return self._send(503, "Service Unavailable")
+        handler(state, params)
+
+    def _eleresult(self, state, params):
+        roomid = params.get("roomid", "")
+        electricity = state.electricity_for(roomid)
+        if electricity is None:
+            state.count("eleresult_failed")
+            return self._send(200, state.failed_page)
+        state.count("eleresult")
+        self._send(200, state.ok_template.replace("{value}", str(electricity)))
+
+    def _loadbill(self, state, params):
+        state.count("loadbill")
+        try:
+            page_no = int(params.get("pageno", "1"))
+        except ValueError:
+            page_no = 1
+        self._send(200, json.dumps(state.bill_page(page_no), ensure_ascii=False), "application/json")
+
+    def _index(self, state, params):
+        state.count("index")
+        self._send(200, INDEX_PAGE)
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 对冲请求被取消、客户端超时断开属于正常情况，不打印堆栈
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class StubServer:
+    """在后台线程中运行的模拟服务器，供基准脚本在进程内启动"""
+
+    def __init__(self, host="127.0.0.1", port=0, **state_options):
+        self.httpd = StubHTTPServer((host, port), StubHandler)
+        self.httpd.state = StubState(**state_options)
+        self._thread = None
+
+    @property
+    def state(self):
+        return self.httpd.state
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+def load_values(path):
+    """读取每个房间的电量，JSON对象 {roomid: 电量或null}"""
+    with open(path, "r", encoding="utf-8") as f:
+        return {str(roomid): value for roomid, value in json.load(f).items()}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="一卡通服务本地模拟服务器")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='none', help='延迟分布，如 fixed:50、uniform:20,200、lognormal:80,0.5')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回503的请求比例')
+    parser.add_argument('--hang-rate', type=float, default=0.0, help='长时间不响应的请求比例，用于触发客户端超时')
+    parser.add_argument('--hang-seconds', type=float, default=30, help='不响应请求的挂起时间(秒)')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='返回查询失败页面的房间比例（按roomid固定）')
+    parser.add_argument('--values', help='每个房间电量的JSON文件 {roomid: 电量或null}')
+    parser.add_argument('--bill-pages', type=int, default=5, help='账单总页数')
+    parser.add_argument('--seed', type=int, help='随机种子，便于复现')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    server = StubServer(args.host, args.port, latency=args.latency, error_rate=args.error_rate,
+                        fail_rate=args.fail_rate, hang_rate=args.hang_rate, hang_seconds=args.hang_seconds,
+                        values=load_values(args.values) if args.values else None,
+                        bill_pages=args.bill_pages, seed=args.seed)
+    print(f"模拟服务器已启动: {server.base_url}（设置 LIXIN_YKT_BASE_URL={server.base_url}）")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,6 +6,19 @@ class Config:
     # Cookie配置
     COOKIE_FILE = os.path.join("cookies", "session_cookies.json")
     
+    # 批量查询断点续查日志目录
+    CRAWL_JOURNAL_DIR = "crawl_journal"
+    # 增量查询调度等批量查询状态文件目录
+    CRAWL_STATE_DIR = "crawl_state"
+    # 每次批量查询的列式快照目录
+    SNAPSHOT_DIR = "snapshots"
+    # 是否保留旧版宽表electricity_history的读取路径；宽表迁移完成后读取路径自动关闭（utils/wide_table_migration.py）
+    LEGACY_WIDE_TABLE_READS = os.environ.get("LIXIN_LEGACY_WIDE_TABLE_READS", "1") != "0"
+    # 数据保留（utils/retention.py）：electricity_records保留完整精度的月数，更早的数据降采样为每房间每天一行
+    RECORDS_FULL_RESOLUTION_MONTHS = 6
+    ALL_ROOM_RETENTION_MONTHS = 3  # all_room原始查询日志保留的月数
+    PARTITION_MONTHS_AHEAD = 2  # 按月分区时预先创建的未来月份数
+    
     # 房间数据配置 - 直接使用资源文件路径，不再创建目录
     @staticmethod
     def get_room_data_folder():
@@ -17,9 +30,19 @@ class Config:
             # 在开发环境中，使用相对路径
             return os.path.join("config", "room_data")
     
+    # 由房间CSV编译的索引缓存目录
+    ROOM_INDEX_CACHE_DIR = os.path.join("cache", "room_index")
+    
     # 网络配置
+    # 一卡通服务地址，可通过环境变量LIXIN_YKT_BASE_URL指向本地模拟服务器（benchmarks/ykt_stub_server.py）
+    YKT_BASE_URL = os.environ.get("LIXIN_YKT_BASE_URL", "https://yktepay.lixin.edu.cn").rstrip("/")
     USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36 Edg/131.0.0.0"
     TIMEOUT = 10
+    HTTP_POOL_SIZE = 64  # 电费查询连接池大小，不应小于并发线程数
+    RESULT_CACHE_MAX_AGE = 300  # 单个房间查询结果的缓存有效期（秒）
+    RESULT_CACHE_MAX_ENTRIES = 4096  # 结果缓存最多保留的房间数
+    PROGRESS_MAX_UPDATES = 4  # 批量查询每秒最多发出的进度更新次数
+    HEDGE_SLOTS = 6  # 对冲请求在并发上限之外的额外名额，上限用满时对冲仍能发出
     
     # 楼宇映射配置
     BUILDING_NAME_MAP = {1: "一", 2: "二", 3: "三", 4: "四", 5: "五", 6: "六"}
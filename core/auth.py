@@ -51,7 +51,7 @@ class SessionManager:
         """验证当前会话是否有效"""
         try:
             resp = self.session.get(
-                "https://yktepay.lixin.edu.cn/ykt/h5/index",
+                f"{Config.YKT_BASE_URL}/ykt/h5/index",
                 timeout=Config.TIMEOUT//2
             )
             return resp.ok and "一卡通" in resp.text
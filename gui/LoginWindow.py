@@ -511,7 +511,7 @@ class LoginWindow(BaseWindow):
                     
                 # 获取用户信息
                 response = session_mgr.session.get(
-                    "https://yktepay.lixin.edu.cn/ykt/h5/accountinfo",
+                    f"{Config.YKT_BASE_URL}/ykt/h5/accountinfo",
                     timeout=10
                 )
                 response.raise_for_status()
@@ -680,7 +680,7 @@ class LoginWindow(BaseWindow):
             session.headers.update({"User-Agent": Config.USER_AGENT})
             
             # 发送请求验证会话
-            resp = session.get("https://yktepay.lixin.edu.cn/ykt/h5/index")
+            resp = session.get(f"{Config.YKT_BASE_URL}/ykt/h5/index")
             return resp.ok and "一卡通" in resp.text
         except Exception:
             return False
@@ -754,7 +754,7 @@ class LoginWindow(BaseWindow):
                     
                     # 获取用户信息
                     response = session_mgr.session.get(
-                        "https://yktepay.lixin.edu.cn/ykt/h5/accountinfo",
+                        f"{Config.YKT_BASE_URL}/ykt/h5/accountinfo",
                         timeout=10
                     )
                     response.raise_for_status()
@@ -1396,7 +1396,7 @@ class AccountSelectionWindow(BaseWindow):
                     temp_session.headers.update({"User-Agent": Config.USER_AGENT})
                     
                     # 访问首页刷新会话
-                    resp = temp_session.get("https://yktepay.lixin.edu.cn/ykt/h5/index", timeout=10)
+                    resp = temp_session.get(f"{Config.YKT_BASE_URL}/ykt/h5/index", timeout=10)
                     if resp.ok and "一卡通" in resp.text:
                         # 更新cookies
                         account_data["cookies"] = requests.utils.dict_from_cookiejar(temp_session.cookies)
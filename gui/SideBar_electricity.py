@@ -3,6 +3,8 @@ from PySide6.QtWidgets import (QWidget, QLabel, QVBoxLayout, QHBoxLayout,
                               QDialog, QFormLayout, QDialogButtonBox, QCheckBox, QScrollArea, QTextEdit)
 from PySide6.QtCore import Qt, Signal, QObject, QThread, QEvent
 from utils.query_electricity import ElectricityQuery
+from utils.crawl_journal import CrawlJournal
+from utils.crawl_results import CrawlResults
 from utils.analysis_electricity import ElectricityAnalysis
 from config.config import Config
 from gui.LoadWindow import show_loading, LoadingWindow
@@ -36,11 +38,13 @@ class ElectricityQueryWorker(QObject):
 class AllRoomsQueryWorker(QObject):
     """查询所有宿舍的工作线程信号对象"""
     progress = Signal(str, int, int)
-    finished = Signal(dict, str, int, int)  # 添加总数和成功数参数
+    finished = Signal(object, str, int, int)  # 结果(CrawlResults)、查询时间、总数和成功数
     
-    def __init__(self, query):
+    def __init__(self, query, journal=None):
         super().__init__()
         self.query = query
+        # 用户选择续查的中断查询，None表示开始新的查询
+        self.journal = journal
         
     def update_progress_with_log(self, message, total, current):
         """更新进度但不记录日志"""
@@ -54,55 +58,48 @@ class AllRoomsQueryWorker(QObject):
         # 只记录开始日志
         try:
             if log_window:
-                log_window.log("电费批量查询开始，使用多线程并发", "INFO")
+                log_window.log("电费批量查询开始，使用并发查询", "INFO")
         except Exception:
             pass
             
         try:
-            # 传递自定义的进度回调函数
-            results, query_time = self.query.query_all_rooms(self.update_progress_with_log)
+            # 续查时沿用日志中的查询范围，只查询缺失的房间；否则开始新的查询
+            journal = self.journal
+            if journal:
+                if log_window:
+                    log_window.log(f"续查中断的电费批量查询 {journal.crawl_id}，已完成{len(journal.completed)}个房间", "INFO")
+            else:
+                journal = CrawlJournal.start(source='gui')
+            
+            # 传递自定义的进度回调函数，优先使用单线程异步引擎
+            if self.query.async_engine_available():
+                results, query_time = self.query.query_all_rooms_async(self.update_progress_with_log, buildings=journal.buildings,
+                                                                       journal=journal, rooms=journal.rooms)
+            else:
+                results, query_time = self.query.query_all_rooms(self.update_progress_with_log, buildings=journal.buildings,
+                                                                 journal=journal, rooms=journal.rooms)
             
             # 将查询结果保存到历史数据库，作为新列
             try:
-                # 使用新方法保存批量查询结果
-                self.query.save_batch_to_history_database(query_time, results)
+                # 使用新方法保存批量查询结果，同一次查询只写入一次
+                self.query.save_batch_to_history_database(query_time, results, journal=journal)
                 if log_window:
                     log_window.log(f"电费批量查询结果已保存为历史记录列", "INFO")
             except Exception as save_error:
                 if log_window:
                     log_window.log(f"保存电费批量查询历史记录失败: {str(save_error)}", "ERROR")
             
-            # 从结果中获取统计数据（适应新格式）
+            # 统计数据优先使用查询引擎返回的stats，否则按结果的状态码计数，不再逐个匹配字符串
             total_rooms = 0
             success_rooms = 0
+            data = {}
             
-            if isinstance(results, dict):
-                if 'stats' in results:
-                    # 使用返回的统计数据
-                    total_rooms = results['stats'].get('total_count', 0)
-                    success_rooms = results['stats'].get('success_count', 0)
-                    
-                    # 获取真正的数据部分
-                    data = results.get('data', {})
-                elif 'data' not in results:
-                    # 旧格式，直接统计
-                    data = results
-                    for building, rooms in data.items():
-                        total_rooms += len(rooms)
-                        for room, result in rooms.items():
-                            if "查询失败" not in result and "查询异常" not in result and "处理错误" not in result:
-                                success_rooms += 1
-                else:
-                    # 已经包含data字段，但没有stats
-                    data = results.get('data', {})
-                    for building, rooms in data.items():
-                        total_rooms += len(rooms)
-                        for room, result in rooms.items():
-                            if "查询失败" not in result and "查询异常" not in result and "处理错误" not in result:
-                                success_rooms += 1
-            else:
-                # 不是字典格式，使用空数据
-                data = {}
+            if isinstance(results, dict) and 'data' in results:
+                data = results['data']
+                stats = results.get('stats', {})
+                counts = data.counts() if isinstance(data, CrawlResults) else {}
+                total_rooms = stats.get('total_count', counts.get('total', 0))
+                success_rooms = stats.get('success_count', counts.get('success', 0))
             
             # 只记录结束日志
             try:
@@ -392,6 +389,21 @@ class SideBarElectricity(QWidget):
             if reply != QMessageBox.Yes:
                 return
             
+            # 本界面上次的查询被中断（或入库失败）时，由用户选择续查还是重新查询
+            journal = CrawlJournal.latest_incomplete(source='gui')
+            if journal:
+                reply = QMessageBox.question(
+                    self.window(),
+                    "续查中断的查询",
+                    f"{journal.query_time} 的批量查询未完成（已完成{len(journal.completed)}个房间）。\n"
+                    "选择“是”续查该次查询，选择“否”放弃它并重新查询。",
+                    QMessageBox.Yes | QMessageBox.No,
+                    QMessageBox.Yes
+                )
+                if reply != QMessageBox.Yes:
+                    journal.discard()
+                    journal = None
+            
             self.query_in_progress = True
             
             # 记录开始查询的日志
@@ -408,7 +420,7 @@ class SideBarElectricity(QWidget):
             
             # 创建查询工作线程
             self.all_thread = QThread()
-            self.all_worker = AllRoomsQueryWorker(self.query)
+            self.all_worker = AllRoomsQueryWorker(self.query, journal)
             
             self.all_worker.moveToThread(self.all_thread)
             
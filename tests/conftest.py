@@ -0,0 +1,20 @@
+import os
+import sys
+
+# 测试直接导入项目根目录下的utils、config等包
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+class FakeClock:
+    """可手动推进的time.monotonic替身"""
+
+    def __init__(self, start=1000.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
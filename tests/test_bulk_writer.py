@@ -0,0 +1,66 @@
+import pytest
+from utils.bulk_writer import AllRoomBulkWriter
+
+
+class FakeConnection:
+    def __init__(self):
+        self.log = []
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                return False
+
+            def executemany(self, sql, rows):
+                connection.log.append(('insert', len(rows)))
+
+        return Cursor()
+
+    def commit(self):
+        self.log.append('commit')
+
+    def rollback(self):
+        self.log.append('rollback')
+
+    def close(self):
+        self.log.append('close')
+
+
+def make_writer():
+    writer = AllRoomBulkWriter('localhost', 'user', 'password', flush_size=2)
+    writer.conn = connection = FakeConnection()
+    return writer, connection
+
+
+def test_clean_exit_flushes_and_commits():
+    writer, connection = make_writer()
+    with writer:
+        for room in ('1-101', '1-102', '1-103'):
+            writer.add('2025-01-01 08:00:00', 1, room, '12.3度')
+    assert connection.log == [('insert', 2), ('insert', 1), 'commit', 'close']
+    assert writer.stats()['rows_written'] == 3
+
+
+@pytest.mark.parametrize("exc_type", [KeyboardInterrupt, RuntimeError])
+def test_exception_rolls_back_instead_of_committing(exc_type):
+    writer, connection = make_writer()
+    with pytest.raises(exc_type):
+        with writer:
+            for room in ('1-101', '1-102', '1-103'):
+                writer.add('2025-01-01 08:00:00', 1, room, '12.3')
+            raise exc_type()
+    assert 'commit' not in connection.log
+    assert connection.log[-2:] == ['rollback', 'close']
+    assert writer.failed and writer.stats()['rows_written'] == 0
+
+
+def test_disabled_writer_ignores_rows():
+    writer = AllRoomBulkWriter('localhost', 'user', 'password', enabled=False)
+    with writer:
+        writer.add('2025-01-01 08:00:00', 1, '1-101', '12.3')
+    assert writer.buffer == [] and writer.conn is None
@@ -0,0 +1,102 @@
+import pytest
+import utils.circuit_breaker as circuit_breaker_module
+from utils.circuit_breaker import CircuitBreaker
+from conftest import FakeClock
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit_breaker_module.time, "monotonic", clock)
+    return clock
+
+
+def make_breaker():
+    return CircuitBreaker(window=10, error_threshold=0.5, min_requests=4, open_seconds=10, half_open_probes=2,
+                          probe_poll=0.5)
+
+
+def open_breaker(breaker):
+    for _ in range(4):
+        assert breaker.allow()
+        breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_opens_at_error_threshold(clock):
+    breaker = make_breaker()
+    for success in (True, True, False):
+        breaker.allow()
+        breaker.record(success)
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.allow()
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.snapshot()['rejected'] == 1
+
+
+def test_half_open_probes_close_on_success(clock):
+    breaker = make_breaker()
+    open_breaker(breaker)
+    clock.advance(10)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow() and breaker.allow()
+    # 探测名额用完
+    assert not breaker.allow()
+    breaker.record(True)
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens(clock):
+    breaker = make_breaker()
+    open_breaker(breaker)
+    clock.advance(10)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.snapshot()['open_count'] == 2
+
+
+def test_retry_after_waits_for_cooldown_then_polls(clock):
+    breaker = make_breaker()
+    breaker.begin()
+    open_breaker(breaker)
+    clock.advance(4)
+    assert breaker.retry_after() == pytest.approx(6)
+    clock.advance(6)
+    assert breaker.allow() and breaker.allow()
+    assert breaker.retry_after() == 0.5
+
+
+def test_retry_after_fails_fast_once_probe_failed_in_sweep(clock):
+    breaker = make_breaker()
+    breaker.begin()
+    open_breaker(breaker)
+    clock.advance(10)
+    assert breaker.allow()
+    breaker.record(False)
+    # 本次查询中探测已失败，之后被拒绝的请求都不再等待新的冷却期
+    assert breaker.retry_after() is None
+    clock.advance(10)
+    assert breaker.retry_after() is None
+
+    # 新的一次批量查询重新等待
+    breaker.begin()
+    assert breaker.retry_after() == 0.5
+
+
+def test_successful_probes_clear_sweep_failure(clock):
+    breaker = make_breaker()
+    breaker.begin()
+    open_breaker(breaker)
+    clock.advance(10)
+    breaker.allow()
+    breaker.record(False)
+    clock.advance(10)
+    assert breaker.allow() and breaker.allow()
+    breaker.record(True)
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.retry_after() == 0.0
@@ -0,0 +1,91 @@
+import os
+import pytest
+from config.config import Config
+from utils.crawl_journal import CrawlJournal
+
+
+@pytest.fixture(autouse=True)
+def journal_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "CRAWL_JOURNAL_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_resume_restores_completed_rooms_but_not_errors():
+    journal = CrawlJournal.start(buildings=[1], source='cli')
+    journal.record(1, '1-101', '12.3', 'success')
+    journal.record(1, '1-102', '查询失败', 'failed')
+    journal.record(1, '1-103', '查询异常: timeout', 'error')
+    journal.close()
+
+    resumed = CrawlJournal.open(journal.crawl_id)
+    assert resumed.query_time == journal.query_time
+    assert resumed.buildings == [1]
+    assert resumed.source == 'cli'
+    assert resumed.completed == {(1, '1-101'): ('12.3', 'success'), (1, '1-102'): ('查询失败', 'failed')}
+    assert not resumed.all_room_committed and not resumed.history_committed
+
+
+def test_error_after_success_reopens_room():
+    journal = CrawlJournal.start()
+    journal.record(1, '1-101', '12.3', 'success')
+    journal.record(1, '1-101', '查询异常: timeout', 'error')
+    journal.close()
+    assert CrawlJournal.open(journal.crawl_id).completed == {}
+
+
+def test_rooms_scope_round_trips_as_tuples():
+    journal = CrawlJournal.start(rooms=[[1, '1-101'], [2, '2-101']])
+    journal.close()
+    assert CrawlJournal.open(journal.crawl_id).rooms == [(1, '1-101'), (2, '2-101')]
+
+
+def test_commit_markers():
+    journal = CrawlJournal.start()
+    journal.mark_all_room_committed()
+    journal.close()
+    resumed = CrawlJournal.open(journal.crawl_id)
+    assert resumed.all_room_committed and not resumed.history_committed
+    resumed.mark_history_committed()
+    assert CrawlJournal.open(journal.crawl_id).history_committed
+
+
+def test_truncated_last_line_is_ignored_and_appends_continue():
+    journal = CrawlJournal.start()
+    journal.record(1, '1-101', '12.3', 'success')
+    journal.close()
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"type": "room", "building": 1, "ro')
+
+    resumed = CrawlJournal.open(journal.crawl_id)
+    resumed.record(1, '1-102', '4.5', 'success')
+    resumed.close()
+    assert set(CrawlJournal.open(journal.crawl_id).completed) == {(1, '1-101'), (1, '1-102')}
+
+
+def test_latest_incomplete_filters_by_source(journal_dir):
+    cli = CrawlJournal(os.path.join(str(journal_dir), "20990101000000.jsonl"), "20990101000000",
+                       "2099-01-01 00:00:00", source='cli')
+    cli._append({'type': 'start', 'crawl_id': cli.crawl_id, 'query_time': cli.query_time,
+                 'buildings': None, 'rooms': None, 'source': 'cli'})
+    cli.close()
+    gui = CrawlJournal.start(source='gui')
+    gui.close()
+
+    assert CrawlJournal.latest_incomplete().crawl_id == cli.crawl_id
+    assert CrawlJournal.latest_incomplete(source='gui').crawl_id == gui.crawl_id
+
+    gui.discard()
+    assert CrawlJournal.latest_incomplete(source='gui') is None
+
+
+def test_committed_journals_are_not_resumed_and_pruned():
+    journal = CrawlJournal.start()
+    journal.mark_history_committed()
+    assert CrawlJournal.latest_incomplete() is None
+    CrawlJournal.prune()
+    assert not os.path.exists(journal.path)
+
+
+def test_missing_journal():
+    with pytest.raises(FileNotFoundError):
+        CrawlJournal.open("20000101000000")
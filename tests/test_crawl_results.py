@@ -0,0 +1,63 @@
+import math
+from utils.crawl_results import CrawlResults, STATUS_SUCCESS
+
+
+def test_success_text_round_trips_upstream_format():
+    results = CrawlResults()
+    results.set(1, '1-101', '42.3', 'success')
+    results.set(1, '1-102', '42.30度', 'success')
+    results.set(1, '1-103', '100', 'success')
+
+    assert dict(results[1]) == {'1-101': '42.3', '1-102': '42.30', '1-103': '100'}
+    assert list(results.success_texts()) == [(1, '1-101', '42.3'), (1, '1-102', '42.30'), (1, '1-103', '100')]
+    assert list(results.success_items()) == [(1, '1-101', 42.3), (1, '1-102', 42.3), (1, '1-103', 100.0)]
+
+
+def test_non_numeric_success_keeps_status_and_text():
+    results = CrawlResults()
+    results.set(1, '1-101', '暂无数据', 'success')
+
+    assert results.counts()['success'] == 1
+    assert results[1]['1-101'] == '暂无数据'
+    assert list(results.success_texts()) == [(1, '1-101', '暂无数据')]
+    # 没有数值的房间不进入汇总和快照
+    assert list(results.success_items()) == []
+    position = results._positions[(1, '1-101')]
+    assert results.status[position] == STATUS_SUCCESS
+    assert math.isnan(results.values[position])
+    assert not results.has_value(position)
+
+
+def test_failed_and_error_rooms():
+    results = CrawlResults()
+    results.set(1, '1-101', '查询失败', 'failed')
+    results.set(1, '1-102', '查询异常: timeout', 'error')
+
+    assert results[1]['1-101'] == '查询失败'
+    assert results[1]['1-102'] == '查询异常: timeout'
+    assert results.counts() == {'success': 0, 'failed': 1, 'error': 1, 'total': 2}
+
+
+def test_overwrite_clears_previous_text():
+    results = CrawlResults()
+    results.set(1, '1-101', '查询异常: timeout', 'error')
+    results.set(1, '1-101', '5.5', 'success')
+    assert results[1]['1-101'] == '5.5'
+    assert results.errors == {} and results.texts == {}
+
+
+def test_mapping_views_only_include_queried_rooms():
+    results = CrawlResults()
+    assert len(results) == 0
+    results.set(2, '2-101', '3.5', 'success')
+
+    assert list(results) == [2]
+    assert list(results[2]) == ['2-101']
+    assert '2-102' not in results[2]
+    assert results.to_dict() == {2: {'2-101': '3.5'}}
+
+
+def test_unknown_room_is_ignored():
+    results = CrawlResults()
+    results.set(1, '9-999', '1.0', 'success')
+    assert results.counts()['total'] == 0
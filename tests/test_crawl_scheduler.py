@@ -0,0 +1,81 @@
+import os
+import pytest
+from config.config import Config
+from utils.crawl_scheduler import IncrementalScheduler
+
+
+class FakeQuery:
+    room_mappings = {1: {'1-101': 'r1', '1-102': 'r2'}, 2: {'2-101': 'r3'}}
+
+    def __init__(self, data=None):
+        self.data = data or {}
+        self.calls = []
+
+    def query_all_rooms(self, callback=None, journal=None, rooms=None):
+        self.calls.append(rooms)
+        return {'data': self.data}, "2025-01-01 08:00:00"
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "CRAWL_STATE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def make_scheduler(query=None):
+    return IncrementalScheduler(query or FakeQuery(), min_interval=1800, max_interval=6 * 3600,
+                                low_balance=10.0, horizon_fraction=0.25)
+
+
+def test_interval_bounds():
+    scheduler = make_scheduler()
+    assert scheduler.interval_for(None, None) == 1800
+    assert scheduler.interval_for(5.0, 0.1) == 1800
+    assert scheduler.interval_for(100.0, 0) == 6 * 3600
+    # 100度、每小时10度：预计10小时用完，取四分之一
+    assert scheduler.interval_for(100.0, 10.0) == 9000
+    assert scheduler.interval_for(100.0, 1000.0) == 1800
+
+
+def test_all_rooms_due_without_state():
+    scheduler = make_scheduler()
+    assert sorted(scheduler.due_rooms(now=0)) == [(1, '1-101'), (1, '1-102'), (2, '2-101')]
+
+
+def test_update_tracks_rate_and_schedules_rooms():
+    scheduler = make_scheduler()
+    scheduler.update({1: {'1-101': '100', '1-102': '查询失败'}}, "2025-01-01 00:00:00")
+    scheduler.update({1: {'1-101': '90'}}, "2025-01-01 01:00:00")
+
+    entry = scheduler.state[scheduler._key(1, '1-101')]
+    assert entry['balance'] == 90.0
+    assert entry['rate'] == pytest.approx(10.0)
+    assert entry['next_due'] - entry['last_query'] == scheduler.interval_for(90.0, 10.0)
+    failed = scheduler.state[scheduler._key(1, '1-102')]
+    assert failed['balance'] is None
+
+    due = scheduler.due_rooms(now=entry['last_query'] + 1)
+    assert (1, '1-101') not in due and (2, '2-101') in due
+
+
+def test_recharge_does_not_update_rate():
+    scheduler = make_scheduler()
+    scheduler.update({1: {'1-101': '50'}}, "2025-01-01 00:00:00")
+    scheduler.update({1: {'1-101': '40'}}, "2025-01-01 01:00:00")
+    scheduler.update({1: {'1-101': '200'}}, "2025-01-01 02:00:00")
+    entry = scheduler.state[scheduler._key(1, '1-101')]
+    assert entry['rate'] == pytest.approx(10.0)
+    assert entry['balance'] == 200.0
+
+
+def test_tick_does_not_persist_state(state_dir):
+    query = FakeQuery({1: {'1-101': '50'}})
+    scheduler = make_scheduler(query)
+    results, query_time = scheduler.tick(engine='thread')
+
+    assert query.calls and query_time == "2025-01-01 08:00:00"
+    assert scheduler._key(1, '1-101') in scheduler.state
+    # 调用方保存结果成功后才写入状态文件
+    assert not os.path.exists(scheduler.state_path)
+    scheduler.save_state()
+    assert make_scheduler().state == scheduler.state
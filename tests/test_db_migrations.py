@@ -0,0 +1,23 @@
+import datetime
+import pytest
+from utils.db_migrations import crawl_id_of, crawl_id_range
+
+
+def test_crawl_id_of():
+    assert crawl_id_of("2025-01-01 08:30:00") == 20250101083000
+    assert crawl_id_of(datetime.datetime(2025, 12, 31, 23, 59, 59)) == 20251231235959
+
+
+@pytest.mark.parametrize("time_id, expected", [
+    ("20250101", (20250101000000, 20250101235959)),
+    ("202501010830", (20250101083000, 20250101083059)),
+    ("20250101083015", (20250101083015, 20250101083015)),
+])
+def test_crawl_id_range(time_id, expected):
+    assert crawl_id_range(time_id) == expected
+
+
+@pytest.mark.parametrize("time_id", ["2025010", "2025-01-01", "2025010108", ""])
+def test_crawl_id_range_rejects_other_formats(time_id):
+    with pytest.raises(ValueError):
+        crawl_id_range(time_id)
@@ -0,0 +1,36 @@
+import os
+import pytest
+from utils.eleresult_parser import (extract_remaining_electricity, extract_remaining_electricity_fast,
+                                    extract_remaining_electricity_soup)
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks", "fixtures")
+
+
+def load(name):
+    with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("eleresult_ok.html", "42.37"),
+    ("eleresult_nested.html", "42.37"),
+    ("eleresult_trailing.html", "42.37"),
+    ("eleresult_entity.html", "12.5"),
+    ("eleresult_failed.html", None),
+])
+def test_fixture_pages(name, expected):
+    html = load(name)
+    assert extract_remaining_electricity_soup(html) == expected
+    assert extract_remaining_electricity(html) == expected
+
+
+@pytest.mark.parametrize("name", ["eleresult_ok.html", "eleresult_entity.html"])
+def test_fast_path_agrees_with_soup(name):
+    html = load(name)
+    assert extract_remaining_electricity_fast(html) == extract_remaining_electricity_soup(html)
+
+
+@pytest.mark.parametrize("name", ["eleresult_nested.html", "eleresult_trailing.html"])
+def test_fast_path_declines_ambiguous_pages(name):
+    # 快速路径无法确定时返回None，由BeautifulSoup路径处理
+    assert extract_remaining_electricity_fast(load(name)) is None
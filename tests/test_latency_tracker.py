@@ -0,0 +1,33 @@
+from utils.latency_tracker import LatencyTracker
+
+
+def test_no_hedging_until_enough_samples():
+    tracker = LatencyTracker(hedge_percentile=95, min_samples=10)
+    for _ in range(9):
+        tracker.record(0.1)
+    assert tracker.hedge_delay() is None
+    tracker.record(0.1)
+    assert tracker.hedge_delay() == 0.1
+
+
+def test_threshold_follows_percentile_and_caps_hedge_rate():
+    tracker = LatencyTracker(hedge_percentile=90, min_samples=10, max_hedge_rate=0.1)
+    for latency in range(1, 21):
+        tracker.record(latency / 10)
+    assert tracker.hedge_delay() == 1.8
+    tracker.record_hedge()
+    assert tracker.hedge_delay() == 1.8
+    tracker.record_hedge()
+    # 对冲数达到样本数的10%后暂停对冲
+    assert tracker.hedge_delay() is None
+
+
+def test_snapshot_counts_hedges():
+    tracker = LatencyTracker()
+    tracker.record(0.2)
+    tracker.record_hedge()
+    tracker.record_hedge(won=True)
+    tracker.record_hedge_skipped()
+    snapshot = tracker.snapshot()
+    assert snapshot['samples'] == 1
+    assert snapshot['hedges'] == 1 and snapshot['hedge_wins'] == 1 and snapshot['hedges_skipped'] == 1
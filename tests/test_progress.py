@@ -0,0 +1,41 @@
+import pytest
+import utils.progress as progress_module
+from utils.progress import ProgressThrottle
+from conftest import FakeClock
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(progress_module.time, "monotonic", clock)
+    return clock
+
+
+def test_routine_progress_is_throttled_but_final_is_kept(clock):
+    messages = []
+    throttle = ProgressThrottle(lambda message, total, current: messages.append(current), max_rate=1)
+    for current in range(1, 10):
+        throttle("进度", 10, current)
+        clock.advance(0.1)
+    throttle("完成", 10, 10)
+    assert messages == [1, 10]
+    assert throttle.dropped == 8
+
+
+def test_emit_bypasses_throttle_without_delaying_progress(clock):
+    messages = []
+    throttle = ProgressThrottle(lambda message, total, current: messages.append(message), max_rate=1)
+    throttle("进度1", 10, 1)
+    throttle.emit("处理房间 1-101 时出错", 10, 1)
+    throttle.emit("处理房间 1-102 时出错", 10, 1)
+    clock.advance(1.0)
+    throttle("进度2", 10, 2)
+    assert messages[0] == "进度1"
+    assert messages[1:3] == ["处理房间 1-101 时出错", "处理房间 1-102 时出错"]
+    assert messages[3].startswith("进度2")
+
+
+def test_wrap_is_idempotent():
+    throttle = ProgressThrottle.wrap(lambda *args: None)
+    assert ProgressThrottle.wrap(throttle) is throttle
+    assert ProgressThrottle.wrap(None) is None
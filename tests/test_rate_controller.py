@@ -0,0 +1,87 @@
+import pytest
+import utils.rate_controller as rate_controller_module
+from utils.rate_controller import AIMDController
+from conftest import FakeClock
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_controller_module.time, "monotonic", clock)
+    return clock
+
+
+def test_slow_start_adds_one_per_success(clock):
+    controller = AIMDController(initial_limit=4, max_limit=10)
+    for _ in range(3):
+        controller.record(0.1)
+    assert controller.current_limit() == 7
+    for _ in range(10):
+        controller.record(0.1)
+    assert controller.current_limit() == 10
+
+
+def test_congestion_halves_limit_once_per_cooldown(clock):
+    controller = AIMDController(initial_limit=16, min_limit=2, max_limit=60, cooldown=1.0)
+    controller.record(1.0, congested=True)
+    assert controller.current_limit() == 8
+    # 冷却期内的拥塞信号不再收缩
+    controller.record(1.0, congested=True)
+    assert controller.current_limit() == 8
+    clock.advance(1.0)
+    controller.record(1.0, congested=True)
+    assert controller.current_limit() == 4
+    clock.advance(1.0)
+    controller.record(1.0, congested=True)
+    clock.advance(1.0)
+    controller.record(1.0, congested=True)
+    assert controller.current_limit() == 2
+    assert controller.snapshot()['decreases'] == 4
+
+
+def test_additive_increase_after_congestion(clock):
+    controller = AIMDController(initial_limit=8, max_limit=60)
+    controller.record(1.0, congested=True)
+    assert controller.limit == 4
+    for _ in range(4):
+        controller.record(0.1)
+    assert controller.current_limit() == 4
+    assert controller.limit > 4.9
+
+
+def test_slow_requests_do_not_increase(clock):
+    controller = AIMDController(initial_limit=4, latency_target=2.0)
+    controller.record(3.0)
+    assert controller.current_limit() == 4
+
+
+def test_acquire_and_cancel_track_inflight(clock):
+    controller = AIMDController(initial_limit=2, min_limit=2, max_limit=2)
+    controller.acquire()
+    controller.acquire()
+    assert controller._inflight == 2
+    controller.cancel()
+    controller.release(0.1)
+    assert controller._inflight == 0
+
+
+def test_hedge_slots_are_separate_from_limit(clock):
+    controller = AIMDController(initial_limit=2, min_limit=2, max_limit=2, hedge_slots=1)
+    controller.acquire()
+    controller.acquire()
+    # 并发上限用满时对冲仍有自己的名额
+    assert controller.try_acquire_hedge()
+    assert not controller.try_acquire_hedge()
+    controller.release_hedge()
+    assert controller.try_acquire_hedge()
+
+
+def test_begin_keeps_learned_limit_and_hedge_slots(clock):
+    controller = AIMDController(initial_limit=4, max_limit=20, hedge_slots=1)
+    for _ in range(6):
+        controller.record(0.1)
+    assert controller.try_acquire_hedge()
+    controller.begin(max_limit=8)
+    assert controller.current_limit() == 8
+    # 上一次查询遗留的对冲请求结束前名额仍被占用
+    assert not controller.try_acquire_hedge()
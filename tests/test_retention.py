@@ -0,0 +1,39 @@
+import datetime
+from utils.retention import (_months_between, _partition_definitions, add_months, month_crawl_id, month_start,
+                             partition_name)
+
+
+def test_month_start():
+    assert month_start(datetime.date(2025, 3, 17)) == datetime.date(2025, 3, 1)
+
+
+def test_add_months_crosses_years():
+    january = datetime.date(2025, 1, 1)
+    assert add_months(january, 1) == datetime.date(2025, 2, 1)
+    assert add_months(january, -1) == datetime.date(2024, 12, 1)
+    assert add_months(january, 12) == datetime.date(2026, 1, 1)
+    assert add_months(datetime.date(2025, 12, 1), 1) == datetime.date(2026, 1, 1)
+    assert add_months(january, -13) == datetime.date(2023, 12, 1)
+
+
+def test_month_crawl_id_and_partition_name():
+    month = datetime.date(2025, 7, 1)
+    assert month_crawl_id(month) == 20250701000000
+    assert partition_name(month) == "p202507"
+
+
+def test_months_between_inclusive():
+    months = _months_between(datetime.date(2024, 11, 1), datetime.date(2025, 2, 1))
+    assert [partition_name(month) for month in months] == ["p202411", "p202412", "p202501", "p202502"]
+    assert _months_between(datetime.date(2025, 2, 1), datetime.date(2025, 1, 1)) == []
+
+
+def test_partition_definitions():
+    months = [datetime.date(2025, 1, 1), datetime.date(2025, 2, 1)]
+    assert _partition_definitions('electricity_records', months) == (
+        "PARTITION p202501 VALUES LESS THAN (20250201000000), "
+        "PARTITION p202502 VALUES LESS THAN (20250301000000), "
+        "PARTITION pmax VALUES LESS THAN MAXVALUE")
+    assert _partition_definitions('all_room', months[:1]) == (
+        "PARTITION p202501 VALUES LESS THAN (TO_DAYS('2025-02-01')), "
+        "PARTITION pmax VALUES LESS THAN MAXVALUE")
@@ -2,6 +2,10 @@ import pymysql
 import datetime
 import statistics
 from typing import Dict, List, Tuple, Any
+from utils.db_migrations import crawl_id_of
+from utils.wide_table_migration import legacy_reads_enabled
+from utils.latest_readings import load_latest_snapshot, latest_crawl_if_complete
+from utils.rollups import BUILDING_FLOOR, LOW_THRESHOLD, HIGH_THRESHOLD, compute_rollups, load_crawl_rollups
 
 class ElectricityAnalysis:
     """电量数据分析类"""
@@ -38,7 +42,7 @@ class ElectricityAnalysis:
             return None
     
     def get_latest_data(self) -> Tuple[Dict[str, Dict[str, float]], str]:
-        """获取最新一次查询的电量数据"""
+        """获取每个房间最新的电量数据，及最新一次查询的时间"""
         try:
             conn = pymysql.connect(
                 host=self.db_host, 
@@ -48,6 +52,21 @@ class ElectricityAnalysis:
             )
             cursor = conn.cursor()
             
+            # 优先读取入库时维护的最新读数表，一条按主键顺序的查询
+            snapshot = load_latest_snapshot(cursor)
+            if snapshot is not None:
+                rows, latest_time, _ = snapshot
+                cursor.close()
+                conn.close()
+                
+                data = {}
+                for building, room, electricity in rows:
+                    try:
+                        data.setdefault(building, {})[room] = float(electricity)
+                    except (ValueError, TypeError):
+                        continue
+                return data, latest_time.strftime('%Y-%m-%d %H:%M:%S')
+            
             # 1. 获取最新的查询时间
             cursor.execute("SELECT query_time FROM query_history ORDER BY query_time DESC LIMIT 1")
             latest_time = cursor.fetchone()
@@ -63,14 +82,12 @@ class ElectricityAnalysis:
             # 检查新表是否存在
             cursor.execute("SHOW TABLES LIKE 'electricity_records'")
             if cursor.fetchone():
-                # 使用新表结构 - 根据最新时间查询
-                time_id = latest_time.strftime('%Y%m%d%H%M%S')
-                
+                # 使用新表结构 - 按crawl_id等值查询，走idx_crawl索引
                 cursor.execute("""
                     SELECT building, room, electricity 
                     FROM electricity_records 
-                    WHERE DATE_FORMAT(query_time, '%%Y%%m%%d%%H%%i%%S') = %s
-                """, (time_id,))
+                    WHERE crawl_id = %s
+                """, (crawl_id_of(latest_time),))
                 results = cursor.fetchall()
                 
                 cursor.close()
@@ -91,6 +108,10 @@ class ElectricityAnalysis:
                         continue
                 
                 return data, formatted_time
+            elif not legacy_reads_enabled(cursor):
+                cursor.close()
+                conn.close()
+                return {}, "未找到电量记录表"
             else:
                 # 使用旧表结构 - 保持原有逻辑
                 # 2. 找到对应的列名
@@ -130,127 +151,165 @@ class ElectricityAnalysis:
             print(f"获取最新数据失败: {str(e)}")
             return {}, f"查询数据失败: {str(e)}"
     
+    def get_latest_rollups(self) -> Tuple[List[Dict[str, Any]], str]:
+        """获取当前状态的按楼栋、楼层汇总
+
+        只有最新一次查询刷新了所有房间时才读取该次查询的汇总；增量查询、部分房间失败
+        或该次查询没有汇总时返回空列表，由调用方按每个房间的最新读数计算。
+        """
+        try:
+            conn = pymysql.connect(
+                host=self.db_host, 
+                user=self.db_user, 
+                password=self.db_password,
+                database='electricity_data'
+            )
+            cursor = conn.cursor()
+            
+            latest = latest_crawl_if_complete(cursor)
+            if latest is None:
+                cursor.close()
+                conn.close()
+                return [], "最新查询未覆盖所有房间"
+            
+            crawl_id, latest_time = latest
+            rollups = load_crawl_rollups(cursor, crawl_id)
+            
+            cursor.close()
+            conn.close()
+            return rollups, latest_time.strftime('%Y-%m-%d %H:%M:%S')
+        except Exception as e:
+            print(f"获取汇总数据失败: {str(e)}")
+            return [], f"查询汇总失败: {str(e)}"
+    
+    def _latest_rollups_or_compute(self) -> Tuple[List[Dict[str, Any]], str]:
+        """优先读取入库时写入的汇总；不能代表当前状态时由每个房间的最新读数现场计算"""
+        rollups, query_time = self.get_latest_rollups()
+        if rollups:
+            return rollups, query_time
+        data, query_time = self.get_latest_data()
+        readings = ((building, room, electricity, None) for building, rooms in data.items()
+                    for room, electricity in rooms.items())
+        return compute_rollups(readings), query_time
+    
+    def get_building_stats(self) -> Tuple[List[Dict[str, Any]], str]:
+        """最新一次查询各楼栋的房间数、平均、最低和最高电量"""
+        rollups, query_time = self._latest_rollups_or_compute()
+        building_stats = []
+        for row in rollups:
+            if row['floor'] != BUILDING_FLOOR or not row['room_count']:
+                continue
+            building_stats.append({
+                'building': row['building'],
+                'count': row['room_count'],
+                'average': row['electricity_sum'] / row['room_count'],
+                'min': row['electricity_min'],
+                'max': row['electricity_max']
+            })
+        return building_stats, query_time
+    
+    def get_building_trend(self, days: int = 30) -> List[Dict[str, Any]]:
+        """最近days天各楼栋的每日汇总，读取daily_rollups"""
+        try:
+            conn = pymysql.connect(
+                host=self.db_host, 
+                user=self.db_user, 
+                password=self.db_password,
+                database='electricity_data'
+            )
+            cursor = conn.cursor()
+            
+            start_day = datetime.date.today() - datetime.timedelta(days=days - 1)
+            cursor.execute("""
+                SELECT day, building, crawl_count, reading_count, electricity_sum,
+                       electricity_min, electricity_max, consumption_sum
+                FROM daily_rollups
+                WHERE day >= %s AND floor = %s
+                ORDER BY day, building
+            """, (start_day, BUILDING_FLOOR))
+            rows = cursor.fetchall()
+            
+            cursor.close()
+            conn.close()
+            
+            trend = []
+            for day, building, crawl_count, reading_count, total, minimum, maximum, consumption in rows:
+                trend.append({
+                    'day': day.strftime('%Y-%m-%d'),
+                    'building': building,
+                    'crawl_count': crawl_count,
+                    'average': total / reading_count if reading_count else None,
+                    'min': minimum,
+                    'max': maximum,
+                    'consumption': consumption
+                })
+            return trend
+        except Exception as e:
+            print(f"获取每日汇总失败: {str(e)}")
+            return []
+    
     def analyze_data(self) -> str:
         """分析电量数据并返回分析结果文本"""
-        data, query_time = self.get_latest_data()
+        rollups, query_time = self._latest_rollups_or_compute()
         
-        if not data:
+        if not rollups:
             return f"分析失败: {query_time}"
         
         analysis_result = [f"电量数据分析 (查询时间: {query_time})\n"]
         
-        # 计算总体数据
-        all_values = []
-        for building in data:
-            all_values.extend(data[building].values())
+        # 整栋楼的汇总行
+        buildings = [row for row in rollups if row['floor'] == BUILDING_FLOOR and row['room_count']]
+        total_count = sum(row['room_count'] for row in buildings)
         
-        if not all_values:
+        if not total_count:
             return "分析失败: 没有有效的电量数据"
         
         # 1. 总体分析
-        avg_electricity = sum(all_values) / len(all_values)
-        min_electricity = min(all_values)
-        max_electricity = max(all_values)
-        
-        # 查找最低和最高电量的房间
-        min_room = None
-        max_room = None
+        avg_electricity = sum(row['electricity_sum'] for row in buildings) / total_count
         
-        for building in data:
-            for room, electricity in data[building].items():
-                if electricity == min_electricity and not min_room:
-                    min_room = f"{building}-{room}"
-                if electricity == max_electricity and not max_room:
-                    max_room = f"{building}-{room}"
+        # 最低和最高电量的房间
+        min_row = min(buildings, key=lambda row: row['electricity_min'])
+        max_row = max(buildings, key=lambda row: row['electricity_max'])
+        min_room = f"{min_row['building']}-{min_row['min_room']}"
+        max_room = f"{max_row['building']}-{max_row['max_room']}"
         
         analysis_result.append("总体数据:")
-        analysis_result.append(f"- 平均电量: {avg_electricity:.2f}度     总共 {len(all_values)} 个房间有数据")
-        analysis_result.append(f"- 最低电量: {min_electricity:.2f}度 (房间: {min_room})")
-        analysis_result.append(f"- 最高电量: {max_electricity:.2f}度 (房间: {max_room})")
+        analysis_result.append(f"- 平均电量: {avg_electricity:.2f}度     总共 {total_count} 个房间有数据")
+        analysis_result.append(f"- 最低电量: {min_row['electricity_min']:.2f}度 (房间: {min_room})")
+        analysis_result.append(f"- 最高电量: {max_row['electricity_max']:.2f}度 (房间: {max_room})")
         
         # 2. 按楼栋分析
         analysis_result.append("\n各楼栋数据:")
         
-        # 按楼栋排序
-        sorted_buildings = sorted(data.keys())
-        
-        # 两列布局处理
-        for i in range(0, len(sorted_buildings), 2):
-            building = sorted_buildings[i]
-            building_values = list(data[building].values())
-            
-            if not building_values:
-                continue
-                
-            building_avg = sum(building_values) / len(building_values)
-            building_min = min(building_values)
-            building_max = max(building_values)
-            
-            # 准备左侧楼栋信息
-            left_info = f"新苑{building}号楼: 平均 {building_avg:.2f}度, 最低 {building_min:.2f}度, 最高 {building_max:.2f}度, {len(building_values)}个房间"
-            
-            # 如果有右侧楼栋，添加右侧信息
-            if i + 1 < len(sorted_buildings):
-                building2 = sorted_buildings[i + 1]
-                building_values2 = list(data[building2].values())
-                
-                if building_values2:
-                    building_avg2 = sum(building_values2) / len(building_values2)
-                    building_min2 = min(building_values2)
-                    building_max2 = max(building_values2)
-                    
-                    # 右侧楼栋信息
-                    right_info = f"新苑{building2}号楼: 平均 {building_avg2:.2f}度, 最低 {building_min2:.2f}度, 最高 {building_max2:.2f}度, {len(building_values2)}个房间"
-                    
-                    # 合并一行显示 - 使用空格代替"|"分隔符
-                    analysis_result.append(f"- {left_info}")
-                    analysis_result.append(f"- {right_info}")
-                else:
-                    # 只有左侧信息
-                    analysis_result.append(f"- {left_info}")
-            else:
-                # 只有左侧信息
-                analysis_result.append(f"- {left_info}")
+        for row in buildings:
+            building_avg = row['electricity_sum'] / row['room_count']
+            analysis_result.append(
+                f"- 新苑{row['building']}号楼: 平均 {building_avg:.2f}度, 最低 {row['electricity_min']:.2f}度, "
+                f"最高 {row['electricity_max']:.2f}度, {row['room_count']}个房间")
         
         # 3. 电量区间分布
-        low_threshold = 10  # 低于10度视为电量紧张
-        high_threshold = 100  # 高于100度视为电量充足
-        
-        low_count = sum(1 for e in all_values if e < low_threshold)
-        medium_count = sum(1 for e in all_values if low_threshold <= e < high_threshold)
-        high_count = sum(1 for e in all_values if e >= high_threshold)
-        
-        total_count = len(all_values)
+        low_count = sum(row['low_count'] for row in buildings)
+        medium_count = sum(row['medium_count'] for row in buildings)
+        high_count = sum(row['high_count'] for row in buildings)
         
         analysis_result.append("\n电量区间分布:")
-        analysis_result.append(f"- 电量紧张 (<{low_threshold}度): {low_count}个房间 ({low_count/total_count*100:.1f}%)")
-        analysis_result.append(f"- 电量一般 ({low_threshold}-{high_threshold}度): {medium_count}个房间 ({medium_count/total_count*100:.1f}%)")
-        analysis_result.append(f"- 电量充足 (>{high_threshold}度): {high_count}个房间 ({high_count/total_count*100:.1f}%)")
+        analysis_result.append(f"- 电量紧张 (<{LOW_THRESHOLD}度): {low_count}个房间 ({low_count/total_count*100:.1f}%)")
+        analysis_result.append(f"- 电量一般 ({LOW_THRESHOLD}-{HIGH_THRESHOLD}度): {medium_count}个房间 ({medium_count/total_count*100:.1f}%)")
+        analysis_result.append(f"- 电量充足 (>{HIGH_THRESHOLD}度): {high_count}个房间 ({high_count/total_count*100:.1f}%)")
         
-        # 4. 楼层分析
-        try:
-            floor_data = {}
-            for building in data:
-                for room in data[building]:
-                    # 从房间号提取楼层
-                    if '-' in room:
-                        floor = room.split('-')[0]
-                        if floor not in floor_data:
-                            floor_data[floor] = []
-                        floor_data[floor].append(data[building][room])
-            
-            # 如果有楼层数据，添加到分析结果
-            if floor_data:
-                analysis_result.append("\n各楼层平均电量:")
-                
-                # 对楼层排序
-                sorted_floors = sorted(floor_data.keys())
-                
-                # 每楼层一行
-                for floor in sorted_floors:
-                    floor_avg = sum(floor_data[floor]) / len(floor_data[floor])
-                    analysis_result.append(f"- {floor}楼: {floor_avg:.2f}度 ({len(floor_data[floor])}个房间)")
-        except Exception as e:
-            analysis_result.append(f"\n楼层分析失败: {str(e)}")
+        # 4. 楼层分析：合并各楼栋同一楼层的汇总
+        floor_data = {}
+        for row in rollups:
+            if row['floor'] == BUILDING_FLOOR:
+                continue
+            totals = floor_data.setdefault(row['floor'], [0.0, 0])
+            totals[0] += row['electricity_sum']
+            totals[1] += row['room_count']
+        
+        if floor_data:
+            analysis_result.append("\n各楼层平均电量:")
+            for floor in sorted(floor_data):
+                floor_sum, floor_count = floor_data[floor]
+                analysis_result.append(f"- {floor}楼: {floor_sum / floor_count:.2f}度 ({floor_count}个房间)")
         
-        return "\n".join(analysis_result) 
\ No newline at end of file
+        return "\n".join(analysis_result)
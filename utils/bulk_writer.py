@@ -0,0 +1,123 @@
+import time
+import pymysql
+
+
+class AllRoomBulkWriter:
+    """批量查询结果的缓冲写入器
+
+    收集每个房间的查询结果，攒满flush_size条后用多行INSERT一次写入all_room表。
+    整次批量查询只使用一个连接、一个事务，在close时统一提交；
+    作为上下文管理器使用时，查询因异常（包括KeyboardInterrupt）中断则回滚，不提交已写入的部分，
+    续查时由查询日志重新写入，all_room中不会出现重复行。
+    """
+
+    INSERT_SQL = "INSERT INTO all_room (query_time, building, room, electricity) VALUES (%s, %s, %s, %s)"
+
+    def __init__(self, host, user, password, database='electricity_data', flush_size=500, enabled=True):
+        self.db_host = host
+        self.db_user = user
+        self.db_password = password
+        self.database = database
+        self.flush_size = flush_size
+        # 关闭时add为空操作，便于在无数据库环境下复用同一流程
+        self.enabled = enabled
+
+        self.conn = None
+        self.buffer = []
+        self.rows_written = 0
+        self.flush_count = 0
+        # 写入和提交累计耗时（秒）
+        self.write_seconds = 0.0
+        self.failed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+        return False
+
+    def add(self, query_time, building, room, electricity):
+        """加入一条结果，缓冲区满时自动写入"""
+        if not self.enabled:
+            return
+        # 将电量转换为数字格式保存（去掉"度"字）
+        clean_electricity = electricity.replace('度', '').strip()
+        self.buffer.append((query_time, building, room, clean_electricity))
+        if len(self.buffer) >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        """将缓冲区内的结果用一条多行INSERT发送到数据库（尚未提交）"""
+        if not self.buffer or self.failed:
+            return False
+
+        rows, self.buffer = self.buffer, []
+        started = time.monotonic()
+        try:
+            if self.conn is None:
+                self.conn = pymysql.connect(host=self.db_host, user=self.db_user,
+                                            password=self.db_password, database=self.database)
+            with self.conn.cursor() as cursor:
+                # pymysql会把executemany改写为多行VALUES语句
+                cursor.executemany(self.INSERT_SQL, rows)
+            self.rows_written += len(rows)
+            self.flush_count += 1
+            return True
+        except Exception as e:
+            # 一次失败即放弃本次事务，避免只写入部分数据
+            print(f"批量保存到数据库失败: {str(e)}")
+            self.failed = True
+            self._rollback()
+            return False
+        finally:
+            self.write_seconds += time.monotonic() - started
+
+    def close(self):
+        """写入剩余结果并提交事务"""
+        try:
+            self.flush()
+            if self.conn is not None and not self.failed:
+                started = time.monotonic()
+                self.conn.commit()
+                self.write_seconds += time.monotonic() - started
+        except Exception as e:
+            print(f"提交批量写入失败: {str(e)}")
+            self.failed = True
+            self._rollback()
+        finally:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def abort(self):
+        """放弃本次事务：丢弃缓冲区、回滚已发送的结果并关闭连接"""
+        self.buffer = []
+        self.failed = True
+        self._rollback()
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
+
+    def stats(self):
+        """返回写入统计"""
+        return {
+            'rows_written': 0 if self.failed else self.rows_written,
+            'flushes': self.flush_count,
+            'write_seconds': round(self.write_seconds, 3),
+            'failed': self.failed
+        }
+
+    def _rollback(self):
+        if self.conn is None:
+            return
+        try:
+            self.conn.rollback()
+        except Exception:
+            pass
@@ -0,0 +1,140 @@
+import time
+import threading
+from collections import deque
+
+
+class CircuitBreakerOpen(Exception):
+    """熔断器打开时拒绝请求"""
+
+
+class CircuitBreaker:
+    """上游服务熔断器
+
+    关闭状态下统计最近window个请求的错误率，达到阈值后打开：此后的请求立即失败，不再等待超时。
+    打开open_seconds秒后进入半开状态，放行少量探测请求；探测全部成功则关闭并恢复查询，任一失败则重新打开。
+    批量查询中被拒绝的请求按retry_after等到半开探测有结果再决定重试还是失败，而不是立即失败；
+    同一次批量查询中只要有一轮半开探测失败，此后被拒绝的请求都直接失败，不再各自等待新的冷却期，
+    直到之后的探测成功、熔断器关闭为止。
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window=50, error_threshold=0.5, min_requests=20, open_seconds=15, half_open_probes=3,
+                 probe_poll=0.5):
+        """初始化熔断器
+
+        Args:
+            window (int): 统计错误率的最近请求数
+            error_threshold (float): 打开熔断的错误率
+            min_requests (int): 窗口内请求数达到该值才判断错误率
+            open_seconds (float): 打开后多久进入半开状态
+            half_open_probes (int): 半开状态下放行的探测请求数
+            probe_poll (float): 半开状态下等待探测结果的轮询间隔(秒)
+        """
+        self.window = window
+        self.error_threshold = error_threshold
+        self.min_requests = min_requests
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.probe_poll = probe_poll
+
+        self._lock = threading.Lock()
+        self._results = deque(maxlen=window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes_sent = 0
+        self._probes_succeeded = 0
+        self._open_count = 0
+        self._rejected = 0
+        self._probe_failed = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now):
+        if self._state == self.OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._probes_sent = 0
+            self._probes_succeeded = 0
+        return self._state
+
+    def _open(self, now):
+        self._state = self.OPEN
+        self._opened_at = now
+        self._open_count += 1
+
+    def allow(self):
+        """是否放行一个请求；放行后必须调用record记录结果"""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and self._probes_sent < self.half_open_probes:
+                self._probes_sent += 1
+                return True
+            self._rejected += 1
+            return False
+
+    def begin(self):
+        """开始新的一次批量查询，清除上一次查询中的半开探测失败标记"""
+        with self._lock:
+            self._probe_failed = False
+
+    def retry_after(self):
+        """被拒绝的请求应等待多少秒后再调用allow()
+
+        Returns:
+            打开状态下为距半开的剩余时间，半开状态下为探测结果的轮询间隔；
+            本次批量查询中已有一轮半开探测失败（上游仍未恢复）时返回None，请求应直接失败
+        """
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if self._probe_failed:
+                return None
+            if state == self.OPEN:
+                return max(0.0, self.open_seconds - (now - self._opened_at))
+            if state == self.HALF_OPEN:
+                return self.probe_poll
+            return 0.0
+
+    def record(self, success):
+        """记录一个已放行请求的结果，success为False表示超时、连接错误或5xx"""
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == self.HALF_OPEN:
+                if not success:
+                    self._probe_failed = True
+                    self._open(now)
+                    return
+                self._probes_succeeded += 1
+                if self._probes_succeeded >= self.half_open_probes:
+                    # 上游恢复，清空窗口重新统计
+                    self._state = self.CLOSED
+                    self._results.clear()
+                    self._probe_failed = False
+                return
+            if state == self.OPEN:
+                # 打开前已发出的请求，结果不再影响状态
+                return
+
+            self._results.append(success)
+            if len(self._results) >= self.min_requests:
+                errors = self._results.count(False)
+                if errors / len(self._results) >= self.error_threshold:
+                    self._open(now)
+
+    def snapshot(self):
+        """返回熔断器状态"""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            return {
+                'state': state,
+                'open_count': self._open_count,
+                'rejected': self._rejected
+            }
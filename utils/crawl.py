@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""无界面的批量电费查询入口，供服务器定时任务使用
+
+只加载ElectricityQuery和存储层，不依赖PySide6。结束时向标准输出打印一行JSON统计。
+
+用法:
+    python -m utils.crawl [--buildings 1,2] [--engine async|thread|shard] [--concurrency 80]
+                          [--output db|json|none] [--output-file results.json]
+                          [--resume [CRAWL_ID]] [--no-journal] [--incremental]
+                          [--shards 4] [--shard-threads 16] [--redis-url redis://host:6379/0]
+                          [--include-dead]
+
+    探测所有roomid并登记持续没有读数的房间:
+    python -m utils.crawl --validate-rooms [--validate-rounds 3]
+
+    分片查询的远程工作进程（可运行在其他主机上）:
+    python -m utils.crawl --worker --redis-url redis://host:6379/0
+
+退出码:
+    0 查询成功且结果已写入目标
+    1 没有任何房间查询成功
+    2 查询成功但写入数据库失败
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+# 房间数据使用相对项目根目录的路径
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from utils.query_electricity import ElectricityQuery
+from utils.crawl_journal import CrawlJournal
+from utils.crawl_scheduler import IncrementalScheduler
+from utils.crawl_shard import ShardCoordinator, LocalWorkQueue, RedisWorkQueue, run_worker
+
+
+def get_db_password(default="123456"):
+    """从config/db_password.txt读取数据库密码，与Web后端保持一致"""
+    password_file = os.path.join(ROOT_DIR, "config", "db_password.txt")
+    try:
+        if os.path.exists(password_file):
+            with open(password_file, "r") as f:
+                return f.read().strip()
+    except Exception as e:
+        print(f"读取密码文件出错: {str(e)}", file=sys.stderr)
+    return default
+
+
+def parse_buildings(value):
+    """解析逗号分隔的楼栋编号"""
+    if not value:
+        return None
+    try:
+        return [int(item) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"楼栋编号格式错误: {value}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='批量查询所有宿舍电量')
+    parser.add_argument('--buildings', type=parse_buildings, default=None,
+                        help='只查询指定楼栋，逗号分隔，如 1,2,3')
+    parser.add_argument('--engine', choices=['async', 'thread', 'shard'], default=None,
+                        help='查询引擎，默认在安装了aiohttp时使用async；shard为多进程分片查询')
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help='并发上限（async为在途请求数，thread为线程数）')
+    parser.add_argument('--output', choices=['db', 'json', 'none'], default='db',
+                        help='结果写入目标：db写入MySQL，json写入文件或标准输出，none只输出统计')
+    parser.add_argument('--output-file', default=None, help='--output json时的结果文件，默认写到标准输出')
+    parser.add_argument('--db-host', default='localhost', help='数据库地址')
+    parser.add_argument('--db-user', default='elecuser', help='数据库用户名')
+    parser.add_argument('--db-password', default=None, help='数据库密码，默认读取config/db_password.txt')
+    parser.add_argument('--resume', nargs='?', const='latest', default=None,
+                        help='续查中断的查询，可指定crawl_id，默认续查最近一次未完成的查询')
+    parser.add_argument('--incremental', action='store_true',
+                        help='增量查询：只查询按剩余电量和用电速率到期的房间')
+    parser.add_argument('--no-journal', action='store_true', help='不记录断点续查日志')
+    parser.add_argument('--shards', type=int, default=4, help='shard引擎在本机启动的工作进程数')
+    parser.add_argument('--shard-threads', type=int, default=16, help='每个分片工作进程的线程数')
+    parser.add_argument('--redis-url', default=None,
+                        help='分片任务队列使用的Redis地址，不指定时使用本机进程间队列')
+    parser.add_argument('--worker', action='store_true', help='作为分片工作进程运行，从Redis队列领取任务')
+    parser.add_argument('--worker-idle-timeout', type=float, default=None,
+                        help='工作进程空闲超过该秒数后退出，默认常驻')
+    parser.add_argument('--include-dead', action='store_true',
+                        help='不跳过也不登记持续没有读数的房间')
+    parser.add_argument('--validate-rooms', action='store_true',
+                        help='探测所有roomid，登记持续返回查询失败的房间后退出')
+    parser.add_argument('--validate-rounds', type=int, default=3, help='探测轮数，每轮只重试上一轮失败的房间')
+    parser.add_argument('--progress', action='store_true', help='在标准错误输出打印进度')
+    return parser
+
+
+def print_progress(message, total, current):
+    print(f"[{current}/{total}] {message}", file=sys.stderr)
+
+
+def open_journal(args, rooms=None):
+    """按参数创建或恢复查询日志，仅写入数据库时启用"""
+    if args.output != 'db' or args.no_journal:
+        return None
+    if args.resume:
+        journal = CrawlJournal.latest_incomplete() if args.resume == 'latest' else CrawlJournal.open(args.resume)
+        if journal is not None:
+            return journal
+        print("没有可续查的查询，开始新的查询", file=sys.stderr)
+    return CrawlJournal.start(args.buildings, rooms, source='cli')
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    output_file = os.path.abspath(args.output_file) if args.output_file else None
+    os.chdir(ROOT_DIR)
+
+    if args.worker:
+        if not args.redis_url:
+            print("工作进程模式需要指定 --redis-url", file=sys.stderr)
+            return 1
+        processed = run_worker(RedisWorkQueue(args.redis_url), threads=args.shard_threads,
+                               idle_timeout=args.worker_idle_timeout, honor_stop=False)
+        print(json.dumps({'worker': True, 'processed': processed}, ensure_ascii=False))
+        return 0
+
+    query = ElectricityQuery()
+    query.db_host = args.db_host
+    query.db_user = args.db_user
+    query.db_password = args.db_password if args.db_password is not None else get_db_password()
+    query.write_all_room = args.output == 'db'
+    query.write_snapshot = args.output == 'db'
+    query.prune_dead_rooms = not args.include_dead
+
+    callback = print_progress if args.progress else None
+    if args.validate_rooms:
+        summary = query.dead_rooms.validate(query, rounds=args.validate_rounds,
+                                            buildings=args.buildings, callback=callback)
+        print(json.dumps({'validate': summary}, ensure_ascii=False))
+        return 0
+
+    engine = args.engine or ('async' if query.async_engine_available() else 'thread')
+    if args.concurrency:
+        if engine == 'async':
+            query.async_concurrency = args.concurrency
+        else:
+            query.max_workers = args.concurrency
+
+    # 增量查询只查询到期的房间
+    scheduler = IncrementalScheduler(query) if args.incremental else None
+    rooms = None
+    if scheduler:
+        rooms = scheduler.due_rooms()
+        if args.buildings:
+            rooms = [item for item in rooms if item[0] in args.buildings]
+        if not rooms and not args.resume:
+            print(json.dumps({'total_count': 0, 'success_count': 0, 'engine': engine,
+                              'incremental': scheduler.stats(), 'exit_code': 0}, ensure_ascii=False))
+            return 0
+
+    journal = open_journal(args, rooms)
+    buildings = args.buildings
+    if journal and args.resume:
+        buildings, rooms = journal.buildings, journal.rooms
+    resumed_count = len(journal.completed) if journal else 0
+
+    started = time.monotonic()
+    if engine == 'shard':
+        work_queue = RedisWorkQueue(args.redis_url) if args.redis_url else LocalWorkQueue()
+        # 本机队列没有外部工作进程，至少启动一个
+        local_workers = args.shards if args.redis_url else max(args.shards, 1)
+        coordinator = ShardCoordinator(query, work_queue)
+        results, query_time = coordinator.run(callback, buildings=buildings, journal=journal, rooms=rooms,
+                                              local_workers=local_workers, threads=args.shard_threads)
+    elif engine == 'async':
+        results, query_time = query.query_all_rooms_async(callback, buildings=buildings, journal=journal, rooms=rooms)
+    else:
+        results, query_time = query.query_all_rooms(callback, buildings=buildings, journal=journal, rooms=rooms)
+    crawl_seconds = time.monotonic() - started
+
+    # 调度状态先只更新内存，结果保存成功后再写入文件
+    if scheduler and results:
+        scheduler.update(results, query_time)
+
+    stats = dict(results.get('stats', {})) if results else {'total_count': 0, 'success_count': 0}
+    stats.update({
+        'query_time': query_time,
+        'engine': engine,
+        'output': args.output,
+        'crawl_seconds': round(crawl_seconds, 3),
+        'crawl_id': journal.crawl_id if journal else None,
+        'resumed_count': resumed_count
+    })
+    if scheduler:
+        stats['incremental'] = scheduler.stats()
+
+    exit_code = 0 if stats.get('success_count') else 1
+    saved = False
+    if exit_code == 0 and args.output == 'db':
+        saved = query.save_batch_to_history_database(query_time, results, journal=journal,
+                                                     incremental=scheduler is not None)
+        stats['history_saved'] = saved
+        if not saved or stats.get('db_write', {}).get('failed'):
+            exit_code = 2
+    elif args.output == 'json' and results:
+        payload = json.dumps({'query_time': query_time, 'data': results['data'].to_dict()}, ensure_ascii=False)
+        if output_file:
+            with open(output_file, "w", encoding="utf-8") as f:
+                f.write(payload)
+            stats['output_file'] = output_file
+        else:
+            print(payload)
+        saved = True
+    elif args.output == 'none' and results:
+        saved = True
+
+    # 入库失败时不保存调度状态，这些房间下次仍然到期
+    if scheduler and saved:
+        scheduler.save_state()
+
+    if journal:
+        journal.close()
+    stats['exit_code'] = exit_code
+    print(json.dumps(stats, ensure_ascii=False))
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+import os
+import json
+import datetime
+import threading
+from config.config import Config
+
+
+class CrawlJournal:
+    """批量查询的断点续查日志
+
+    每次批量查询对应一个只追加的jsonl文件，逐行记录已完成的房间。
+    查询中断后可以用同一个crawl_id重新打开，只查询缺失的房间，并沿用原来的query_time。
+
+    文件格式（每行一个JSON对象）:
+        {"type": "start", "crawl_id": ..., "query_time": ..., "buildings": ..., "rooms": ..., "source": ...}
+        {"type": "room", "building": 1, "room": "1-101", "electricity": "12.3", "status": "success"}
+        {"type": "all_room"}   all_room表已提交
+        {"type": "history"}    electricity_records已提交，本次查询结束
+    """
+
+    def __init__(self, path, crawl_id, query_time, buildings=None, rooms=None, source=None):
+        self.path = path
+        self.crawl_id = crawl_id
+        self.query_time = query_time
+        self.buildings = buildings
+        # 增量查询时只包含到期的房间
+        self.rooms = rooms
+        # 创建日志的入口，如'gui'、'cli'；各入口只自动续查自己创建的查询
+        self.source = source
+        # {(楼栋, 房间): (电量, 状态)}
+        self.completed = {}
+        self.all_room_committed = False
+        self.history_committed = False
+        self._lock = threading.Lock()
+        self._file = None
+
+    @staticmethod
+    def journal_dir():
+        return Config.CRAWL_JOURNAL_DIR
+
+    @classmethod
+    def _path_for(cls, crawl_id):
+        return os.path.join(cls.journal_dir(), f"{crawl_id}.jsonl")
+
+    @classmethod
+    def start(cls, buildings=None, rooms=None, source=None):
+        """开始一次新的批量查询并创建日志"""
+        os.makedirs(cls.journal_dir(), exist_ok=True)
+        cls.prune()
+
+        now = datetime.datetime.now()
+        crawl_id = now.strftime("%Y%m%d%H%M%S")
+        query_time = now.strftime("%Y-%m-%d %H:%M:%S")
+        rooms = [tuple(item) for item in rooms] if rooms is not None else None
+        journal = cls(cls._path_for(crawl_id), crawl_id, query_time, buildings, rooms, source)
+        journal._append({
+            'type': 'start',
+            'crawl_id': crawl_id,
+            'query_time': query_time,
+            'buildings': buildings,
+            'rooms': rooms,
+            'source': source
+        })
+        return journal
+
+    @classmethod
+    def open(cls, crawl_id):
+        """重新打开已有的日志，恢复已完成的房间"""
+        path = cls._path_for(crawl_id)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"未找到查询日志: {crawl_id}")
+
+        journal = None
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 进程中断时最后一行可能只写了一半
+                    continue
+
+                entry_type = entry.get('type')
+                if entry_type == 'start':
+                    rooms = entry.get('rooms')
+                    journal = cls(path, entry['crawl_id'], entry['query_time'], entry.get('buildings'),
+                                  [tuple(item) for item in rooms] if rooms is not None else None,
+                                  entry.get('source'))
+                elif journal is None:
+                    continue
+                elif entry_type == 'room':
+                    # 查询异常（网络错误等）不算完成，续查时重新查询
+                    if entry['status'] == 'error':
+                        journal.completed.pop((entry['building'], entry['room']), None)
+                    else:
+                        journal.completed[(entry['building'], entry['room'])] = (entry['electricity'], entry['status'])
+                elif entry_type == 'all_room':
+                    journal.all_room_committed = True
+                elif entry_type == 'history':
+                    journal.history_committed = True
+
+        if journal is None:
+            raise ValueError(f"查询日志缺少开始记录: {crawl_id}")
+        return journal
+
+    @classmethod
+    def latest_incomplete(cls, max_age_hours=6, source=None):
+        """返回最近一次未完成的查询日志，没有或已过期时返回None
+
+        Args:
+            max_age_hours: 超过该时长的日志不再续查
+            source: 只返回该入口创建的日志，默认不限
+        """
+        if not os.path.isdir(cls.journal_dir()):
+            return None
+
+        crawl_ids = sorted(
+            (name[:-len(".jsonl")] for name in os.listdir(cls.journal_dir()) if name.endswith(".jsonl")),
+            reverse=True
+        )
+        deadline = datetime.datetime.now() - datetime.timedelta(hours=max_age_hours)
+        for crawl_id in crawl_ids:
+            try:
+                if datetime.datetime.strptime(crawl_id, "%Y%m%d%H%M%S") < deadline:
+                    break
+                journal = cls.open(crawl_id)
+            except (ValueError, OSError):
+                continue
+            if not journal.history_committed and (source is None or journal.source == source):
+                return journal
+        return None
+
+    @classmethod
+    def prune(cls):
+        """删除已经结束的查询日志"""
+        if not os.path.isdir(cls.journal_dir()):
+            return
+        for name in os.listdir(cls.journal_dir()):
+            if not name.endswith(".jsonl"):
+                continue
+            try:
+                if cls.open(name[:-len(".jsonl")]).history_committed:
+                    os.remove(os.path.join(cls.journal_dir(), name))
+            except (ValueError, OSError):
+                continue
+
+    def discard(self):
+        """放弃这次查询并删除日志，之后不会再被续查"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def record(self, building, room, electricity, status):
+        """记录一个房间的查询结果"""
+        self._append({
+            'type': 'room',
+            'building': building,
+            'room': room,
+            'electricity': electricity,
+            'status': status
+        })
+        if status != 'error':
+            self.completed[(building, room)] = (electricity, status)
+
+    def mark_all_room_committed(self):
+        self._append({'type': 'all_room'})
+        self.all_room_committed = True
+
+    def mark_history_committed(self):
+        self._append({'type': 'history'})
+        self.history_committed = True
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+
+    def _ends_with_newline(self):
+        with open(self.path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _append(self, entry):
+        line = json.dumps(entry, ensure_ascii=False)
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+                # 中断时写了一半的行单独成行，避免与新记录粘连
+                if self._file.tell() > 0 and not self._ends_with_newline():
+                    self._file.write("\n")
+            self._file.write(line + "\n")
+            self._file.flush()
@@ -0,0 +1,164 @@
+import array
+from collections.abc import Mapping
+from utils.room_index import get_room_index
+
+# 房间状态码
+STATUS_PENDING = 0  # 未查询或不在本次查询范围内
+STATUS_SUCCESS = 1
+STATUS_FAILED = 2  # 上游返回"查询失败"，没有该房间的读数
+STATUS_ERROR = 3  # 超时、连接错误、熔断等临时故障
+
+STATUS_CODES = {'success': STATUS_SUCCESS, 'failed': STATUS_FAILED, 'error': STATUS_ERROR}
+FAILED_TEXT = "查询失败"
+# 成功但文本不是数字的房间在电量数组中的值
+NO_VALUE = float("nan")
+
+
+class CrawlResults(Mapping):
+    """批量查询结果的紧凑存储
+
+    按房间索引顺序保存float64电量数组和每个房间1字节的状态码，只有异常房间另存错误文本。
+    成功房间的文本由电量还原；上游文本与还原结果不同（如"42.30"、"100"）时另存原文，
+    保证写入all_room和electricity_records的是同一个字符串。调用方判为成功但文本不是数字的房间
+    仍记为成功并保存原文，电量数组中对应位置为NaN，success_items和快照不包含这些房间。
+    作为Mapping使用时与原来的嵌套字典相同：{楼栋: {房间: 电量或错误文本}}，只包含已有结果的房间，
+    楼栋和房间的视图都是按需生成的，不复制数据。
+    """
+
+    def __init__(self, room_index=None):
+        self.room_index = room_index or get_room_index()
+        self.keys_list = self.room_index.ordered_keys()
+        self._positions = self.room_index.positions()
+        self._ranges = self.room_index.building_ranges()
+        self.values = array.array("d", bytes(8 * len(self.keys_list)))
+        self.status = bytearray(len(self.keys_list))
+        # 位置 -> 错误文本，只有STATUS_ERROR的房间
+        self.errors = {}
+        # 位置 -> 上游原文，只有文本无法由电量还原（或不是数字）的成功房间
+        self.texts = {}
+
+    def set(self, building, room, electricity, status):
+        """记录一个房间的结果，status为'success'、'failed'或'error'"""
+        position = self._positions.get((building, room))
+        if position is None:
+            return
+        code = STATUS_CODES.get(status, STATUS_ERROR)
+        self.texts.pop(position, None)
+        if code == STATUS_SUCCESS:
+            text = str(electricity).replace('度', '').strip()
+            try:
+                value = float(text)
+            except ValueError:
+                value = NO_VALUE
+            self.values[position] = value
+            if repr(value) != text:
+                self.texts[position] = text
+        self.status[position] = code
+        if code == STATUS_ERROR:
+            self.errors[position] = electricity
+        else:
+            self.errors.pop(position, None)
+
+    def text_at(self, position):
+        """位置上的结果文本，与原嵌套字典中的值一致"""
+        code = self.status[position]
+        if code == STATUS_SUCCESS:
+            text = self.texts.get(position)
+            return text if text is not None else repr(self.values[position])
+        if code == STATUS_FAILED:
+            return FAILED_TEXT
+        if code == STATUS_ERROR:
+            return self.errors.get(position, "查询异常")
+        return None
+
+    def counts(self):
+        """各状态的房间数，直接在状态数组上计数"""
+        return {
+            'success': self.status.count(STATUS_SUCCESS),
+            'failed': self.status.count(STATUS_FAILED),
+            'error': self.status.count(STATUS_ERROR),
+            'total': len(self.status) - self.status.count(STATUS_PENDING),
+        }
+
+    def _success_positions(self):
+        position = self.status.find(STATUS_SUCCESS)
+        while position != -1:
+            yield position
+            position = self.status.find(STATUS_SUCCESS, position + 1)
+
+    def has_value(self, position):
+        """位置上是否有数值电量（查询成功且文本是数字）"""
+        value = self.values[position]
+        return self.status[position] == STATUS_SUCCESS and value == value
+
+    def success_items(self):
+        """依次返回查询成功且电量是数字的 (楼栋, 房间, 电量float)"""
+        values = self.values
+        for position in self._success_positions():
+            value = values[position]
+            if value != value:
+                continue
+            building, room = self.keys_list[position]
+            yield building, room, value
+
+    def success_texts(self):
+        """依次返回查询成功的 (楼栋, 房间, 电量文本)，与写入all_room的文本相同"""
+        for position in self._success_positions():
+            building, room = self.keys_list[position]
+            yield building, room, self.text_at(position)
+
+    def status_items(self):
+        """依次返回已有结果的 (楼栋, 房间, 状态码)"""
+        for position, code in enumerate(self.status):
+            if code != STATUS_PENDING:
+                building, room = self.keys_list[position]
+                yield building, room, code
+
+    def to_dict(self):
+        """转换为普通的嵌套字典，用于JSON输出等需要真实字典的场合"""
+        return {building: dict(rooms) for building, rooms in self.items()}
+
+    # Mapping接口：{楼栋: BuildingResults}
+    def __getitem__(self, building):
+        if building not in self._ranges:
+            raise KeyError(building)
+        view = BuildingResults(self, building)
+        if not len(view):
+            raise KeyError(building)
+        return view
+
+    def __iter__(self):
+        for building, (start, end) in self._ranges.items():
+            if self.status.count(STATUS_PENDING, start, end) < end - start:
+                yield building
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class BuildingResults(Mapping):
+    """单栋楼结果的只读视图 {房间: 电量或错误文本}"""
+
+    __slots__ = ('results', 'building', 'start', 'end')
+
+    def __init__(self, results, building):
+        self.results = results
+        self.building = building
+        self.start, self.end = results._ranges[building]
+
+    def __getitem__(self, room):
+        position = self.results._positions.get((self.building, room))
+        text = self.results.text_at(position) if position is not None else None
+        if text is None:
+            raise KeyError(room)
+        return text
+
+    def __iter__(self):
+        status = self.results.status
+        keys = self.results.keys_list
+        for position in range(self.start, self.end):
+            if status[position] != STATUS_PENDING:
+                yield keys[position][1]
+
+    def __len__(self):
+        return (self.end - self.start) - self.results.status.count(STATUS_PENDING, self.start, self.end)
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import datetime
+from config.config import Config
+
+
+class IncrementalScheduler:
+    """基于剩余电量和用电速率的增量查询调度器
+
+    为每个房间计算刷新间隔：电量低或消耗快的房间频繁刷新，电量充足且几乎不用电的房间很少刷新。
+    每次调度只查询到期的房间，首次运行（没有状态）时所有房间都到期。
+    """
+
+    STATE_FILE = "scheduler_state.json"
+
+    def __init__(self, query, min_interval=1800, max_interval=6 * 3600,
+                 low_balance=10.0, horizon_fraction=0.25, smoothing=0.5):
+        """初始化调度器
+
+        Args:
+            query (ElectricityQuery): 执行查询的实例
+            min_interval (int): 最短刷新间隔(秒)，低电量、新房间和失败房间使用
+            max_interval (int): 最长刷新间隔(秒)
+            low_balance (float): 低于该电量(度)的房间始终按最短间隔刷新
+            horizon_fraction (float): 按当前速率预计用完电量所需时间的该比例作为刷新间隔
+            smoothing (float): 用电速率指数平滑系数，越大越偏向最新观测
+        """
+        self.query = query
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.low_balance = low_balance
+        self.horizon_fraction = horizon_fraction
+        self.smoothing = smoothing
+        self.state_path = os.path.join(Config.CRAWL_STATE_DIR, self.STATE_FILE)
+        # {"楼栋-房间": {"balance", "rate", "last_query", "next_due"}}
+        self.state = self._load_state()
+
+    @staticmethod
+    def _key(building, room):
+        return f"{building}-{room}"
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"读取调度状态失败，将重新全量查询: {str(e)}")
+            return {}
+
+    def save_state(self):
+        """原子地写入调度状态"""
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(temp_path, self.state_path)
+
+    def interval_for(self, balance, rate):
+        """根据剩余电量(度)和用电速率(度/小时)计算刷新间隔(秒)"""
+        if balance is None or balance <= self.low_balance:
+            return self.min_interval
+        if rate and rate > 0:
+            interval = balance / rate * 3600 * self.horizon_fraction
+        else:
+            interval = self.max_interval
+        return int(max(self.min_interval, min(self.max_interval, interval)))
+
+    def due_rooms(self, now=None):
+        """返回当前到期需要查询的(楼栋, 房间)列表，最早到期的在前"""
+        now = now if now is not None else time.time()
+        due = []
+        for building, rooms in self.query.room_mappings.items():
+            for room in rooms:
+                entry = self.state.get(self._key(building, room))
+                next_due = entry['next_due'] if entry else 0
+                if next_due <= now:
+                    due.append((next_due, building, room))
+        due.sort()
+        return [(building, room) for _, building, room in due]
+
+    def update(self, results, query_time):
+        """根据一次查询的结果更新每个房间的电量、速率和下次到期时间"""
+        data = results.get('data', {}) if isinstance(results, dict) and 'data' in results else results
+        now = datetime.datetime.strptime(query_time, "%Y-%m-%d %H:%M:%S").timestamp()
+
+        for building, rooms in data.items():
+            for room, electricity in rooms.items():
+                key = self._key(building, room)
+                entry = self.state.get(key, {'balance': None, 'rate': None, 'last_query': None})
+                try:
+                    balance = float(str(electricity).replace('度', '').strip())
+                except ValueError:
+                    # 查询失败的房间尽快重试，保留已有的电量和速率
+                    entry['next_due'] = now + self.min_interval
+                    self.state[key] = entry
+                    continue
+
+                prev_balance, prev_time = entry.get('balance'), entry.get('last_query')
+                if prev_balance is not None and prev_time and now > prev_time and balance <= prev_balance:
+                    # 电量增加说明充值，不更新用电速率
+                    observed = (prev_balance - balance) / ((now - prev_time) / 3600)
+                    rate = entry.get('rate')
+                    entry['rate'] = observed if rate is None else (
+                        self.smoothing * observed + (1 - self.smoothing) * rate)
+
+                entry['balance'] = balance
+                entry['last_query'] = now
+                entry['next_due'] = now + self.interval_for(balance, entry.get('rate'))
+                self.state[key] = entry
+
+    def tick(self, callback=None, journal=None, rooms=None, engine=None):
+        """执行一次调度：只查询到期的房间
+
+        Args:
+            callback: 进度回调，与query_all_rooms相同
+            journal: 断点续查日志，续查时沿用其中记录的房间
+            rooms: 指定要查询的房间，默认取当前到期的房间
+            engine: 'async'或'thread'，默认在安装了aiohttp时使用async
+
+        Returns:
+            (结果, 查询时间)；没有到期房间时返回(None, None)
+
+        调度状态只在内存中更新，调用方保存结果成功后再调用save_state()，
+        入库失败时这些房间下次仍然到期。
+        """
+        if rooms is None:
+            rooms = journal.rooms if journal and journal.rooms is not None else self.due_rooms()
+        if not rooms:
+            return None, None
+
+        engine = engine or ('async' if self.query.async_engine_available() else 'thread')
+        if engine == 'async':
+            results, query_time = self.query.query_all_rooms_async(callback, journal=journal, rooms=rooms)
+        else:
+            results, query_time = self.query.query_all_rooms(callback, journal=journal, rooms=rooms)
+
+        if results:
+            self.update(results, query_time)
+        return results, query_time
+
+    def stats(self):
+        """返回调度概况"""
+        now = time.time()
+        total = sum(len(rooms) for rooms in self.query.room_mappings.values())
+        intervals = [entry['next_due'] - entry['last_query'] for entry in self.state.values()
+                     if entry.get('last_query') and entry.get('next_due')]
+        return {
+            'tracked_rooms': len(self.state),
+            'total_rooms': total,
+            'due_rooms': len(self.due_rooms(now)),
+            'avg_interval_seconds': round(sum(intervals) / len(intervals), 1) if intervals else None
+        }
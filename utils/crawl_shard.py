@@ -0,0 +1,268 @@
+import os
+import json
+import time
+import queue
+import socket
+import datetime
+import threading
+import multiprocessing
+from utils.progress import ProgressThrottle
+
+
+class LocalWorkQueue:
+    """基于multiprocessing队列的本地任务队列，用于单机多进程和测试"""
+
+    def __init__(self):
+        self._tasks = multiprocessing.Queue()
+        self._results = multiprocessing.Queue()
+        self._stop = multiprocessing.Event()
+
+    def put_tasks(self, tasks):
+        self._stop.clear()
+        for task in tasks:
+            self._tasks.put(task)
+
+    def get_task(self, timeout=1.0):
+        try:
+            return self._tasks.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def put_result(self, result):
+        self._results.put(result)
+
+    def get_result(self, timeout=1.0):
+        try:
+            return self._results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def request_stop(self):
+        self._stop.set()
+
+    def stopped(self):
+        return self._stop.is_set()
+
+
+class RedisWorkQueue:
+    """基于Redis列表的任务队列，工作进程可以运行在不同主机上"""
+
+    def __init__(self, redis_url="redis://localhost:6379/0", prefix="lixin:crawl"):
+        import redis
+
+        self.redis_url = redis_url
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(redis_url)
+
+    def __getstate__(self):
+        # 传给子进程时只传连接地址，由子进程重新建立连接
+        return {'redis_url': self.redis_url, 'prefix': self.prefix}
+
+    def __setstate__(self, state):
+        self.__init__(state['redis_url'], state['prefix'])
+
+    def put_tasks(self, tasks):
+        # 新一轮查询开始，清除上一轮的停止标记
+        self.client.delete(f"{self.prefix}:stop")
+        payloads = [json.dumps(task, ensure_ascii=False) for task in tasks]
+        for i in range(0, len(payloads), 500):
+            self.client.lpush(f"{self.prefix}:tasks", *payloads[i:i + 500])
+
+    def get_task(self, timeout=1.0):
+        item = self.client.brpop(f"{self.prefix}:tasks", timeout=max(1, int(timeout)))
+        return json.loads(item[1]) if item else None
+
+    def put_result(self, result):
+        key = f"{self.prefix}:results:{result['crawl_id']}"
+        self.client.lpush(key, json.dumps(result, ensure_ascii=False))
+        # 协调者放弃的查询，其结果在过期后自动清除
+        self.client.expire(key, 3600)
+
+    def get_result(self, timeout=1.0, crawl_id=None):
+        item = self.client.brpop(f"{self.prefix}:results:{crawl_id}", timeout=max(1, int(timeout)))
+        return json.loads(item[1]) if item else None
+
+    def request_stop(self):
+        self.client.set(f"{self.prefix}:stop", 1, ex=3600)
+        # 丢弃未被领取的任务（同一时间只应有一个协调者）
+        self.client.delete(f"{self.prefix}:tasks")
+
+    def stopped(self):
+        return bool(self.client.exists(f"{self.prefix}:stop"))
+
+
+def run_worker(work_queue, threads=16, idle_timeout=None, query=None, honor_stop=True):
+    """工作进程：从队列取房间任务查询，并把结果写回队列
+
+    Args:
+        work_queue: LocalWorkQueue或RedisWorkQueue
+        threads (int): 本进程内并发查询的线程数
+        idle_timeout (float): 连续空闲超过该秒数后退出，None表示直到收到停止信号
+        query (ElectricityQuery): 执行查询的实例，默认新建
+        honor_stop (bool): 是否在协调者发出停止信号后退出；常驻的远程工作进程应设为False
+
+    Returns:
+        int: 本进程处理的任务数
+    """
+    if query is None:
+        from utils.query_electricity import ElectricityQuery
+        query = ElectricityQuery()
+    query.rate_controller.begin(max_limit=threads)
+    query.circuit_breaker.begin()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    processed = [0]
+    lock = threading.Lock()
+
+    def loop():
+        idle_since = time.monotonic()
+        while not (honor_stop and work_queue.stopped()):
+            task = work_queue.get_task(timeout=1.0)
+            if task is None:
+                if idle_timeout is not None and time.monotonic() - idle_since > idle_timeout:
+                    return
+                continue
+
+            idle_since = time.monotonic()
+            result = query._process_room((task['building'], task['room'], task['roomid']))
+            result['crawl_id'] = task['crawl_id']
+            result['worker'] = worker_id
+            work_queue.put_result(result)
+            with lock:
+                processed[0] += 1
+
+    workers = [threading.Thread(target=loop, daemon=True) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return processed[0]
+
+
+def _local_worker_main(work_queue, threads):
+    """本地子进程入口（须为模块级函数，Windows下spawn方式才能导入）"""
+    run_worker(work_queue, threads=threads)
+
+
+class ShardCoordinator:
+    """分片查询的协调者
+
+    把房间任务放入队列，由多个工作进程（可在不同主机）查询，再把结果合并为一次查询，
+    所有房间共用同一个query_time，返回格式与query_all_rooms一致。
+    """
+
+    def __init__(self, query, work_queue, result_timeout=None):
+        """初始化协调者
+
+        Args:
+            query (ElectricityQuery): 提供房间映射和数据库写入
+            work_queue: LocalWorkQueue或RedisWorkQueue
+            result_timeout (float): 超过该秒数没有收到任何结果时放弃剩余任务，默认为查询超时的3倍
+        """
+        self.query = query
+        self.work_queue = work_queue
+        self.result_timeout = result_timeout or query.query_timeout * 3
+
+    def _get_result(self, crawl_id):
+        if isinstance(self.work_queue, RedisWorkQueue):
+            return self.work_queue.get_result(timeout=1.0, crawl_id=crawl_id)
+        return self.work_queue.get_result(timeout=1.0)
+
+    def run(self, callback=None, buildings=None, journal=None, rooms=None, local_workers=0, threads=16):
+        """执行一次分片查询
+
+        Args:
+            callback: 进度回调，与query_all_rooms相同
+            buildings / journal / rooms: 与query_all_rooms相同
+            local_workers (int): 在本机启动的工作进程数，0表示只依赖外部工作进程
+            threads (int): 每个本地工作进程的线程数
+        """
+        query = self.query
+        current_time = journal.query_time if journal else datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        crawl_id = journal.crawl_id if journal else datetime.datetime.strptime(
+            current_time, "%Y-%m-%d %H:%M:%S").strftime("%Y%m%d%H%M%S")
+        callback = ProgressThrottle.wrap(callback)
+
+        if query.write_all_room:
+            query.init_database()
+
+        results, total_count, room_tasks, resumed = query._prepare_tasks(buildings, journal, rooms)
+        if total_count == 0:
+            if callback:
+                callback.emit("未找到有效的宿舍数据，请检查配置", 1, 0)
+            return {}, current_time
+
+        self.work_queue.put_tasks([
+            {'crawl_id': crawl_id, 'building': building, 'room': room, 'roomid': roomid}
+            for building, room, roomid in room_tasks
+        ])
+
+        processes = [
+            multiprocessing.Process(target=_local_worker_main, args=(self.work_queue, threads), daemon=True)
+            for _ in range(local_workers)
+        ]
+        for process in processes:
+            process.start()
+
+        success_count = len(resumed)
+        processed_count = total_count - len(room_tasks)
+        pending = {(building, room) for building, room, _ in room_tasks}
+        worker_counts = {}
+        writer = query._open_bulk_writer()
+        query._start_writer(writer, journal, current_time, resumed)
+
+        try:
+            with writer:
+                last_result = time.monotonic()
+                while pending:
+                    result = self._get_result(crawl_id)
+                    if result is None:
+                        if time.monotonic() - last_result > self.result_timeout:
+                            break
+                        continue
+                    key = (result['building'], result['room'])
+                    # 忽略其他查询或重复投递的结果
+                    if result.get('crawl_id') != crawl_id or key not in pending:
+                        continue
+
+                    last_result = time.monotonic()
+                    pending.discard(key)
+                    processed_count += 1
+                    building, room = key
+                    results.set(building, room, result['electricity'], result['status'])
+                    worker_counts[result.get('worker', '未知')] = worker_counts.get(result.get('worker', '未知'), 0) + 1
+                    if journal:
+                        journal.record(building, room, result['electricity'], result['status'])
+                    if result['status'] == 'success':
+                        success_count += 1
+                        writer.add(current_time, building, room, result['electricity'])
+                        query.result_cache.put(building, room, result['electricity'])
+
+                    if callback:
+                        callback(f"已处理: {processed_count}/{total_count} (工作进程 {len(worker_counts)})",
+                                 total_count, processed_count)
+            query._finish_writer(writer, journal)
+        finally:
+            self.work_queue.request_stop()
+            for process in processes:
+                process.join(timeout=query.query_timeout + 5)
+
+        # 超时未返回的房间记为错误，续查时会重新查询
+        for building, room in pending:
+            results.set(building, room, "查询异常: 分片查询超时", 'error')
+        sweep_stats = query._finish_sweep(current_time, results, partial=bool(buildings) or rooms is not None)
+
+        if callback:
+            callback(f"查询完成，共查询{total_count}个房间，成功{success_count}个", total_count, total_count)
+
+        result_with_stats = {
+            'data': results,
+            'stats': {
+                'total_count': total_count,
+                'success_count': success_count,
+                'timed_out_count': len(pending),
+                'workers': worker_counts,
+                'db_write': writer.stats(),
+                **sweep_stats
+            }
+        }
+        return result_with_stats, current_time
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""electricity_data库的结构迁移
+
+迁移按版本号顺序执行，已执行的版本记录在schema_migrations表中，重复运行只执行新的迁移。
+ElectricityQuery.init_database会自动执行迁移；Web服务器所用的库也可以单独执行:
+
+    python -m utils.db_migrations [--db-host localhost] [--db-user elecuser] [--db-password ...]
+
+MySQL的DDL会隐式提交，每个迁移都写成可重复执行的形式（先检查列和索引是否存在），
+中途失败后重新运行即可从断点继续。
+"""
+import os
+import sys
+import json
+import argparse
+import datetime
+
+# 数据回填每批更新的行数，避免长事务锁住整张表
+BACKFILL_BATCH_SIZE = 20000
+
+
+def crawl_id_of(query_time):
+    """查询时间对应的crawl_id，如 '2025-01-01 08:30:00' -> 20250101083000"""
+    if isinstance(query_time, str):
+        query_time = datetime.datetime.strptime(query_time, "%Y-%m-%d %H:%M:%S")
+    return int(query_time.strftime("%Y%m%d%H%M%S"))
+
+
+def crawl_id_range(time_id):
+    """把时间ID转换为crawl_id闭区间，用于索引范围扫描
+
+    支持 YYYYMMDD（整天）、YYYYMMDDHHmm（整分钟）和 YYYYMMDDHHmmss（单次查询）。
+    """
+    if not time_id.isdigit() or len(time_id) not in (8, 12, 14):
+        raise ValueError(f"时间ID格式不正确: {time_id}")
+    padding = 14 - len(time_id)
+    start = int(time_id + "0" * padding)
+    end = int(time_id + "235959"[6 - padding:]) if padding else start
+    return start, end
+
+
+def column_exists(cursor, table, column):
+    cursor.execute(f"SHOW COLUMNS FROM {table} LIKE %s", (column,))
+    return cursor.fetchone() is not None
+
+
+def index_exists(cursor, table, index_name):
+    cursor.execute(f"SHOW INDEX FROM {table} WHERE Key_name = %s", (index_name,))
+    return cursor.fetchone() is not None
+
+
+def table_exists(cursor, table):
+    cursor.execute("SHOW TABLES LIKE %s", (table,))
+    return cursor.fetchone() is not None
+
+
+def _m001_records_crawl_id(conn, cursor):
+    """electricity_records增加crawl_id列和(crawl_id, building, room)索引，回填已有数据"""
+    if not column_exists(cursor, 'electricity_records', 'crawl_id'):
+        cursor.execute("ALTER TABLE electricity_records ADD COLUMN crawl_id BIGINT NULL AFTER query_time")
+    if not index_exists(cursor, 'electricity_records', 'idx_crawl'):
+        cursor.execute("ALTER TABLE electricity_records ADD INDEX idx_crawl (crawl_id, building, room)")
+    # 按批回填，crawl_id IS NULL可以走idx_crawl
+    while True:
+        cursor.execute(f"""
+            UPDATE electricity_records
+            SET crawl_id = CAST(DATE_FORMAT(query_time, '%Y%m%d%H%i%S') AS UNSIGNED)
+            WHERE crawl_id IS NULL
+            LIMIT {BACKFILL_BATCH_SIZE}
+        """)
+        conn.commit()
+        if cursor.rowcount < BACKFILL_BATCH_SIZE:
+            break
+
+
+def _m002_history_record_count(conn, cursor):
+    """query_history增加record_count列，历史时间点列表不再扫描electricity_records"""
+    if not column_exists(cursor, 'query_history', 'record_count'):
+        cursor.execute("ALTER TABLE query_history ADD COLUMN record_count INT NULL")
+    cursor.execute("""
+        UPDATE query_history qh
+        JOIN (
+            SELECT crawl_id, COUNT(*) AS record_count
+            FROM electricity_records
+            GROUP BY crawl_id
+        ) t ON t.crawl_id = CAST(DATE_FORMAT(qh.query_time, '%Y%m%d%H%i%S') AS UNSIGNED)
+        SET qh.record_count = t.record_count
+        WHERE qh.record_count IS NULL
+    """)
+    conn.commit()
+
+
+def _m003_migration_state(conn, cursor):
+    """数据迁移进度表，长时间运行的数据迁移按批记录游标，中断后从断点继续"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS migration_state (
+            name VARCHAR(64) PRIMARY KEY,
+            cursor_id INT NOT NULL DEFAULT 0,
+            rows_copied INT NOT NULL DEFAULT 0,
+            done TINYINT NOT NULL DEFAULT 0,
+            updated_at DATETIME NOT NULL
+        )
+    """)
+
+
+def _m004_rollup_tables(conn, cursor):
+    """按楼栋、楼层预聚合的汇总表，floor为0的行是整栋楼（utils/rollups.py）"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS crawl_rollups (
+            crawl_id BIGINT NOT NULL,
+            building VARCHAR(10) NOT NULL,
+            floor SMALLINT NOT NULL,
+            room_count INT NOT NULL,
+            electricity_sum DOUBLE NOT NULL,
+            electricity_min DOUBLE,
+            electricity_max DOUBLE,
+            min_room VARCHAR(20),
+            max_room VARCHAR(20),
+            low_count INT NOT NULL DEFAULT 0,
+            medium_count INT NOT NULL DEFAULT 0,
+            high_count INT NOT NULL DEFAULT 0,
+            consumption_sum DOUBLE NOT NULL DEFAULT 0,
+            PRIMARY KEY (crawl_id, building, floor)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS daily_rollups (
+            day DATE NOT NULL,
+            building VARCHAR(10) NOT NULL,
+            floor SMALLINT NOT NULL,
+            crawl_count INT NOT NULL,
+            reading_count INT NOT NULL,
+            electricity_sum DOUBLE NOT NULL,
+            electricity_min DOUBLE,
+            electricity_max DOUBLE,
+            consumption_sum DOUBLE NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, building, floor)
+        )
+    """)
+
+
+def _m005_latest_readings(conn, cursor):
+    """每个房间最新读数的物化表和带版本号的状态行，由已有记录回填（utils/latest_readings.py）"""
+    from utils.latest_readings import rebuild_latest_readings
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS latest_readings (
+            building VARCHAR(10) NOT NULL,
+            room VARCHAR(20) NOT NULL,
+            electricity VARCHAR(50),
+            query_time DATETIME NOT NULL,
+            crawl_id BIGINT NOT NULL,
+            version BIGINT NOT NULL,
+            PRIMARY KEY (building, room)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS latest_state (
+            id TINYINT PRIMARY KEY,
+            version BIGINT NOT NULL,
+            crawl_id BIGINT NOT NULL,
+            query_time DATETIME NOT NULL,
+            room_count INT NOT NULL,
+            updated_at DATETIME NOT NULL
+        )
+    """)
+    rebuild_latest_readings(cursor)
+    conn.commit()
+
+
+def _m006_electricity_daily(conn, cursor):
+    """超出完整精度保留期的记录降采样后的每房间每日表（utils/retention.py）"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS electricity_daily (
+            building VARCHAR(10) NOT NULL,
+            room VARCHAR(20) NOT NULL,
+            day DATE NOT NULL,
+            min_electricity DOUBLE,
+            max_electricity DOUBLE,
+            last_electricity DOUBLE,
+            last_time DATETIME NOT NULL,
+            reading_count INT NOT NULL,
+            consumption_sum DOUBLE NOT NULL DEFAULT 0,
+            PRIMARY KEY (building, room, day)
+        )
+    """)
+
+
+# (版本号, 说明, 迁移函数)，只能追加，不能修改已发布的版本
+MIGRATIONS = [
+    (1, "electricity_records增加crawl_id列和索引", _m001_records_crawl_id),
+    (2, "query_history增加record_count列", _m002_history_record_count),
+    (3, "增加数据迁移进度表migration_state", _m003_migration_state),
+    (4, "增加汇总表crawl_rollups和daily_rollups", _m004_rollup_tables),
+    (5, "增加最新读数表latest_readings和latest_state", _m005_latest_readings),
+    (6, "增加降采样表electricity_daily", _m006_electricity_daily),
+]
+
+
+def applied_versions(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(200),
+            applied_at DATETIME NOT NULL
+        )
+    """)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def apply_migrations(conn, target=None):
+    """执行所有未执行的迁移
+
+    Args:
+        conn: 已选定electricity_data库的pymysql连接，基础表须已存在
+        target: 只执行到该版本，默认全部
+
+    Returns:
+        本次执行的版本号列表
+    """
+    cursor = conn.cursor()
+    try:
+        done = applied_versions(cursor)
+        applied = []
+        for version, description, migration in MIGRATIONS:
+            if version in done or (target is not None and version > target):
+                continue
+            print(f"执行数据库迁移 {version}: {description}")
+            migration(conn, cursor)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description, applied_at) VALUES (%s, %s, %s)",
+                (version, description, datetime.datetime.now()))
+            conn.commit()
+            applied.append(version)
+        return applied
+    finally:
+        cursor.close()
+
+
+def main(argv=None):
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root_dir not in sys.path:
+        sys.path.insert(0, root_dir)
+    from utils.crawl import get_db_password
+    from utils.query_electricity import ElectricityQuery
+
+    parser = argparse.ArgumentParser(description='执行electricity_data库的结构迁移')
+    parser.add_argument('--db-host', default='localhost', help='数据库地址')
+    parser.add_argument('--db-user', default='elecuser', help='数据库用户名')
+    parser.add_argument('--db-password', default=None, help='数据库密码，默认读取config/db_password.txt')
+    parser.add_argument('--db-name', default='electricity_data', help='数据库名')
+    args = parser.parse_args(argv)
+
+    # init_database建立基础表后执行所有未执行的迁移
+    query = ElectricityQuery()
+    query.db_host = args.db_host
+    query.db_user = args.db_user
+    query.db_password = args.db_password if args.db_password is not None else get_db_password()
+    query.db_name = args.db_name
+    if not query.init_database():
+        return 1
+    print(json.dumps({'schema_version': MIGRATIONS[-1][0]}, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
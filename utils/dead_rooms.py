@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import concurrent.futures
+from config.config import Config
+from utils.progress import ProgressThrottle
+from utils.crawl_results import CrawlResults, STATUS_SUCCESS, STATUS_FAILED
+
+
+class DeadRoomRegistry:
+    """持续没有读数的房间登记表
+
+    房间连续failure_threshold次返回"查询失败"页面（上游没有该房间的读数）后记为失效，
+    批量查询跳过失效房间；失效房间每隔recheck_interval秒随批量查询重新检查一次，查询成功即恢复。
+    超时、连接错误和熔断属于临时故障，不计入失败次数。
+    """
+
+    STATE_FILE = "dead_rooms.json"
+    FAILED_TEXT = "查询失败"
+
+    def __init__(self, failure_threshold=3, recheck_interval=24 * 3600):
+        """初始化登记表
+
+        Args:
+            failure_threshold (int): 连续失败多少次后记为失效
+            recheck_interval (int): 失效房间重新检查的间隔(秒)
+        """
+        self.failure_threshold = failure_threshold
+        self.recheck_interval = recheck_interval
+        self.state_path = os.path.join(Config.CRAWL_STATE_DIR, self.STATE_FILE)
+        # {"楼栋-房间": {"building", "room", "failures", "dead_since", "last_checked"}}
+        self.state = self._load_state()
+
+    @staticmethod
+    def _key(building, room):
+        return f"{building}-{room}"
+
+    def _load_state(self):
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"读取失效房间记录失败，将重新检查所有房间: {str(e)}")
+            return {}
+
+    def save_state(self):
+        """原子地写入登记表"""
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False)
+        os.replace(temp_path, self.state_path)
+
+    def is_dead(self, building, room):
+        entry = self.state.get(self._key(building, room))
+        return bool(entry and entry.get('dead_since'))
+
+    def dead_rooms(self):
+        """所有失效房间 [(楼栋, 房间), ...]"""
+        return [(entry['building'], entry['room']) for entry in self.state.values() if entry.get('dead_since')]
+
+    def skip_set(self, now=None):
+        """本次批量查询应跳过的房间：已失效且未到重新检查时间"""
+        now = now or time.time()
+        return {
+            (entry['building'], entry['room'])
+            for entry in self.state.values()
+            if entry.get('dead_since') and now - entry.get('last_checked', 0) < self.recheck_interval
+        }
+
+    def record(self, building, room, status, now=None):
+        """记录一个房间的查询结果，status为'success'、'failed'或其他（临时故障，忽略）
+
+        Returns:
+            'dead' 新记为失效, 'revived' 失效房间恢复, 其他情况返回None
+        """
+        now = now or time.time()
+        key = self._key(building, room)
+        entry = self.state.get(key)
+        if status == 'success':
+            if entry is None:
+                return None
+            del self.state[key]
+            return 'revived' if entry.get('dead_since') else None
+        if status != 'failed':
+            return None
+
+        if entry is None:
+            entry = self.state[key] = {'building': building, 'room': room, 'failures': 0, 'dead_since': None}
+        entry['failures'] += 1
+        entry['last_checked'] = now
+        if entry['dead_since'] is None and entry['failures'] >= self.failure_threshold:
+            entry['dead_since'] = now
+            return 'dead'
+        return None
+
+    @classmethod
+    def status_of(cls, electricity):
+        """从批量查询结果文本推断状态"""
+        if electricity == cls.FAILED_TEXT:
+            return 'failed'
+        try:
+            float(str(electricity).replace('度', '').strip())
+            return 'success'
+        except ValueError:
+            return 'error'
+
+    def update(self, results):
+        """用一次批量查询的结果（CrawlResults或 {楼栋: {房间: 电量}}）更新登记表
+
+        Returns:
+            {'newly_dead': 新失效数, 'revived': 恢复数}
+        """
+        now = time.time()
+        changes = {'newly_dead': 0, 'revived': 0}
+        for building, room, status in self._statuses(results):
+            change = self.record(building, room, status, now)
+            if change == 'dead':
+                changes['newly_dead'] += 1
+            elif change == 'revived':
+                changes['revived'] += 1
+        return changes
+
+    def _statuses(self, results):
+        """依次返回 (楼栋, 房间, 状态)；CrawlResults直接使用状态码，不再解析文本"""
+        if isinstance(results, CrawlResults):
+            names = {STATUS_SUCCESS: 'success', STATUS_FAILED: 'failed'}
+            for building, room, code in results.status_items():
+                yield building, room, names.get(code, 'error')
+            return
+        for building, rooms in results.items():
+            for room, electricity in rooms.items():
+                yield building, room, self.status_of(electricity)
+
+    def validate(self, query, rounds=3, buildings=None, callback=None):
+        """并行探测所有roomid，连续rounds轮都返回"查询失败"的房间直接记为失效
+
+        第一轮探测全部房间，之后每轮只重试上一轮失败的房间；查询成功的失效房间恢复。
+
+        Args:
+            query (ElectricityQuery): 执行查询的实例
+            rounds (int): 探测轮数
+            buildings: 只探测这些楼栋，默认全部
+            callback: 进度回调 callback(消息, 总数, 已处理数)
+
+        Returns:
+            {'probed', 'dead', 'revived', 'errors', 'round_errors'} 探测统计；
+            errors为各轮临时错误（超时、5xx等）的总数，round_errors为每轮的错误数
+        """
+        callback = ProgressThrottle.wrap(callback)
+        tasks = [
+            (building, room, roomid)
+            for building, building_rooms in query.room_mappings.items()
+            if not buildings or building in buildings
+            for room, roomid in building_rooms.items()
+        ]
+        summary = {'probed': len(tasks), 'dead': 0, 'revived': 0, 'errors': 0, 'round_errors': []}
+        now = time.time()
+
+        candidates = tasks
+        for round_no in range(1, rounds + 1):
+            query.rate_controller.begin(query.max_workers)
+            query.circuit_breaker.begin()
+            failing = []
+            errors = 0
+            with concurrent.futures.ThreadPoolExecutor(max_workers=query.max_workers) as executor:
+                futures = {executor.submit(query._process_room, task): task for task in candidates}
+                for processed, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                    task = futures[future]
+                    status = future.result()['status']
+                    if status == 'success':
+                        if self.record(task[0], task[1], 'success', now) == 'revived':
+                            summary['revived'] += 1
+                    elif status == 'failed':
+                        failing.append(task)
+                    else:
+                        errors += 1
+                    if callback:
+                        callback(f"第{round_no}/{rounds}轮探测: {processed}/{len(candidates)}，失败 {len(failing)}",
+                                 len(candidates), processed)
+            summary['errors'] += errors
+            summary['round_errors'].append(errors)
+            candidates = failing
+            if not candidates:
+                break
+
+        for building, room, _ in candidates:
+            key = self._key(building, room)
+            entry = self.state.setdefault(key, {'building': building, 'room': room, 'failures': 0, 'dead_since': None})
+            entry['failures'] = max(entry['failures'], self.failure_threshold)
+            entry['last_checked'] = now
+            if entry['dead_since'] is None:
+                entry['dead_since'] = now
+                summary['dead'] += 1
+        self.save_state()
+        summary['dead_total'] = len(self.dead_rooms())
+        return summary
+
+    def stats(self):
+        """登记表概况"""
+        now = time.time()
+        dead = [entry for entry in self.state.values() if entry.get('dead_since')]
+        return {
+            'dead': len(dead),
+            'suspect': len(self.state) - len(dead),
+            'recheck_due': sum(1 for entry in dead if now - entry.get('last_checked', 0) >= self.recheck_interval),
+        }
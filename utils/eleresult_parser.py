@@ -0,0 +1,54 @@
+import re
+import html as html_lib
+
+# 剩余电量标签所在的div，以及紧跟其后（中间只允许空白）的div中的纯文本值；
+# 值div内含嵌套标签时不匹配，交给BeautifulSoup处理
+_LABEL = "剩余电量"
+_VALUE_PATTERN = re.compile(
+    r'<div\b[^>]*>' + _LABEL + r'</div>\s*<div\b[^>]*>([^<]*)</div>'
+)
+
+
+def clean_electricity(text):
+    """清洗电量文本 - 移除"度"字和空白"""
+    return text.replace('度', '').strip()
+
+
+def extract_remaining_electricity_fast(html):
+    """快速路径：用正则直接定位剩余电量，不构建DOM
+
+    Returns:
+        str: 清洗后的电量；无法用快速路径确定时返回None
+    """
+    match = _VALUE_PATTERN.search(html)
+    if match:
+        # 与BeautifulSoup一致地解码实体（如&nbsp;）
+        return clean_electricity(html_lib.unescape(match.group(1)))
+    return None
+
+
+def extract_remaining_electricity_soup(html):
+    """兼容路径：与原实现一致的BeautifulSoup解析"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    if elem := soup.find("div", string=_LABEL):
+        value_elem = elem.find_next('div')
+        if value_elem is not None:
+            return clean_electricity(value_elem.text)
+    return None
+
+
+def extract_remaining_electricity(html):
+    """从eleresult页面提取剩余电量，快速路径失败时才回退到BeautifulSoup
+
+    Returns:
+        str: 清洗后的电量；页面中没有剩余电量时返回None
+    """
+    if _LABEL not in html:
+        # 页面中根本没有标签，DOM解析也不可能找到
+        return None
+    electricity = extract_remaining_electricity_fast(html)
+    if electricity is not None:
+        return electricity
+    return extract_remaining_electricity_soup(html)
@@ -0,0 +1,93 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from config.config import Config
+
+
+class PooledTransport:
+    """基于连接池的HTTP传输层，多线程共享同一组keep-alive连接"""
+
+    def __init__(self, pool_size=None, pool_block=False):
+        """初始化传输层
+
+        Args:
+            pool_size (int): 每个主机保持的最大连接数，默认取Config.HTTP_POOL_SIZE
+            pool_block (bool): 连接池耗尽时是否阻塞等待，而不是临时新建连接
+        """
+        self.pool_size = pool_size or Config.HTTP_POOL_SIZE
+        self.session = requests.Session()
+        self.session.headers.update({
+            "User-Agent": Config.USER_AGENT,
+            "Connection": "keep-alive"
+        })
+
+        self._adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=self.pool_size,
+            pool_block=pool_block
+        )
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._request_count = 0
+        self._error_count = 0
+
+    def get(self, url, **kwargs):
+        """发送GET请求，复用连接池中的空闲连接"""
+        try:
+            resp = self.session.get(url, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self._request_count += 1
+                self._error_count += 1
+            raise
+
+        with self._lock:
+            self._request_count += 1
+        return resp
+
+    def stats(self):
+        """返回连接复用统计"""
+        connections_opened = 0
+        pool_requests = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            connections_opened += pool.num_connections
+            pool_requests += pool.num_requests
+
+        with self._lock:
+            request_count = self._request_count
+            error_count = self._error_count
+
+        reused = max(pool_requests - connections_opened, 0)
+        return {
+            'pool_size': self.pool_size,
+            'requests': request_count,
+            'errors': error_count,
+            'connections_opened': connections_opened,
+            'connections_reused': reused,
+            'reuse_rate': round(reused / pool_requests, 4) if pool_requests else 0.0
+        }
+
+    def close(self):
+        """关闭所有连接"""
+        self.session.close()
+
+
+# 进程内共享的传输层实例
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport(pool_size=None):
+    """获取进程内共享的传输层，首次调用时按pool_size创建"""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = PooledTransport(pool_size=pool_size)
+    return _transport
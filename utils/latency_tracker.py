@@ -0,0 +1,90 @@
+import threading
+
+
+class LatencyTracker:
+    """记录一次批量查询中的请求延迟，提供分位数和对冲(hedge)阈值"""
+
+    def __init__(self, hedge_percentile=95, min_samples=50, refresh_every=20, max_hedge_rate=0.1):
+        """初始化
+
+        Args:
+            hedge_percentile (float): 请求耗时超过本次查询该分位数时发出对冲请求
+            min_samples (int): 样本数不足时不对冲，避免阈值不稳定
+            refresh_every (int): 每新增多少个样本重新计算一次阈值
+            max_hedge_rate (float): 对冲请求占比的上限，上游整体变慢时不再成倍放大请求量
+        """
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.refresh_every = refresh_every
+        self.max_hedge_rate = max_hedge_rate
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """开始新的一次批量查询"""
+        with self._lock:
+            self._samples = []
+            self._threshold = None
+            self._threshold_at = 0
+            self._requests = 0
+            self._hedges = 0
+            self._hedge_wins = 0
+            self._hedges_skipped = 0
+
+    def record(self, latency):
+        """记录一个房间从发出请求到拿到响应的耗时(秒)"""
+        with self._lock:
+            self._samples.append(latency)
+            self._requests += 1
+
+    def record_hedge(self, won=False):
+        """记录一次对冲请求，won表示对冲请求先返回"""
+        with self._lock:
+            if won:
+                self._hedge_wins += 1
+            else:
+                self._hedges += 1
+
+    def record_hedge_skipped(self):
+        """记录一次因对冲名额用完而没有发出的对冲请求"""
+        with self._lock:
+            self._hedges_skipped += 1
+
+    @staticmethod
+    def _percentile(sorted_samples, percentile):
+        if not sorted_samples:
+            return None
+        index = min(len(sorted_samples) - 1, int(round(percentile / 100 * (len(sorted_samples) - 1))))
+        return sorted_samples[index]
+
+    def hedge_delay(self):
+        """返回当前的对冲等待时间(秒)，样本不足时返回None"""
+        with self._lock:
+            count = len(self._samples)
+            if count < self.min_samples or self._hedges >= self.max_hedge_rate * count:
+                return None
+            if self._threshold is None or count - self._threshold_at >= self.refresh_every:
+                self._threshold = self._percentile(sorted(self._samples), self.hedge_percentile)
+                self._threshold_at = count
+            return self._threshold
+
+    def snapshot(self):
+        """返回延迟分位数和对冲统计"""
+        with self._lock:
+            samples = sorted(self._samples)
+            requests, hedges, hedge_wins = self._requests, self._hedges, self._hedge_wins
+            hedges_skipped = self._hedges_skipped
+
+        def rounded(value):
+            return round(value, 3) if value is not None else None
+
+        return {
+            'samples': len(samples),
+            'p50': rounded(self._percentile(samples, 50)),
+            'p95': rounded(self._percentile(samples, 95)),
+            'p99': rounded(self._percentile(samples, 99)),
+            'hedges': hedges,
+            'hedge_wins': hedge_wins,
+            'hedges_skipped': hedges_skipped,
+            'hedge_rate': round(hedges / requests, 4) if requests else 0.0
+        }
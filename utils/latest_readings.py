@@ -0,0 +1,142 @@
+import datetime
+import pymysql
+from utils.db_migrations import crawl_id_of
+
+# latest_state只有一行，主键固定为1
+STATE_ID = 1
+
+
+def _advance_state(cursor, crawl_id, query_time, room_count):
+    """版本号加1，查询更新时记录为最新查询，返回新版本号"""
+    # MySQL按顺序执行赋值，crawl_id须最后更新，前面的条件才能与旧值比较
+    cursor.execute("""
+        INSERT INTO latest_state (id, version, crawl_id, query_time, room_count, updated_at)
+        VALUES (%s, 1, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            version = version + 1,
+            room_count = IF(VALUES(crawl_id) >= crawl_id, VALUES(room_count), room_count),
+            query_time = IF(VALUES(crawl_id) >= crawl_id, VALUES(query_time), query_time),
+            updated_at = VALUES(updated_at),
+            crawl_id = GREATEST(crawl_id, VALUES(crawl_id))
+    """, (STATE_ID, crawl_id, query_time, room_count, datetime.datetime.now()))
+    cursor.execute("SELECT version FROM latest_state WHERE id = %s", (STATE_ID,))
+    return cursor.fetchone()[0]
+
+
+def update_latest_readings(cursor, query_time, readings):
+    """在入库事务中更新每个房间的最新读数，由调用方提交事务
+
+    先更新latest_state（行锁使并发入库串行化），版本号每次入库加1；
+    晚到的旧查询（如续查的中断查询）只增加版本号，不覆盖更新的读数。
+
+    Args:
+        cursor: 入库事务的游标
+        query_time: 查询时间
+        readings: [(楼栋, 房间, 电量文本), ...]
+
+    Returns:
+        本次入库后的版本号
+    """
+    crawl_id = crawl_id_of(query_time)
+    version = _advance_state(cursor, crawl_id, query_time, len(readings))
+
+    if readings:
+        cursor.executemany("""
+            INSERT INTO latest_readings (building, room, electricity, query_time, crawl_id, version)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                electricity = IF(VALUES(crawl_id) >= crawl_id, VALUES(electricity), electricity),
+                query_time = IF(VALUES(crawl_id) >= crawl_id, VALUES(query_time), query_time),
+                version = IF(VALUES(crawl_id) >= crawl_id, VALUES(version), version),
+                crawl_id = GREATEST(crawl_id, VALUES(crawl_id))
+        """, [(building, room, electricity, query_time, crawl_id, version) for building, room, electricity in readings])
+    return version
+
+
+def latest_version(cursor):
+    """当前版本号，latest_state还没有数据时返回None"""
+    cursor.execute("SELECT version FROM latest_state WHERE id = %s", (STATE_ID,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def load_latest_snapshot(cursor):
+    """一条按主键顺序的查询读出每个房间的最新读数
+
+    增量查询只刷新到期的房间，其余房间的最新读数来自更早的查询，因此按房间读取整张表，
+    而不是只读最新一次查询的房间。
+
+    Returns:
+        ([(楼栋, 房间, 电量文本), ...], 最新一次查询的时间, 版本号)；表不存在或没有数据时返回None
+    """
+    try:
+        cursor.execute("""
+            SELECT r.building, r.room, r.electricity, s.query_time, s.version
+            FROM latest_readings r
+            CROSS JOIN latest_state s
+            WHERE s.id = %s
+            ORDER BY r.building, r.room
+        """, (STATE_ID,))
+    except pymysql.err.ProgrammingError:
+        # 尚未执行结构迁移的库
+        return None
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    return [row[:3] for row in rows], rows[0][3], rows[0][4]
+
+
+def latest_crawl_if_complete(cursor):
+    """最新一次查询刷新了所有房间时返回(crawl_id, 查询时间)，否则返回None
+
+    只有这种情况下该次查询的汇总（crawl_rollups）才代表当前状态；增量查询或部分房间失败时
+    应由load_latest_snapshot的逐房间读数计算。
+    """
+    try:
+        cursor.execute("""
+            SELECT s.crawl_id, s.query_time, s.room_count, (SELECT COUNT(*) FROM latest_readings)
+            FROM latest_state s
+            WHERE s.id = %s
+        """, (STATE_ID,))
+    except pymysql.err.ProgrammingError:
+        return None
+    row = cursor.fetchone()
+    if row is None or row[2] < row[3]:
+        return None
+    return row[0], row[1]
+
+
+def rebuild_latest_readings(cursor):
+    """由electricity_records重建最新读数表，用于结构迁移和宽表迁移之后；由调用方提交事务
+
+    Returns:
+        最新读数表中的房间数
+    """
+    # 外层派生表避免ON DUPLICATE KEY UPDATE中的列名与联结的表冲突
+    cursor.execute("""
+        INSERT INTO latest_readings (building, room, electricity, query_time, crawl_id, version)
+        SELECT * FROM (
+            SELECT r.building, r.room, r.electricity, r.query_time, r.crawl_id, 1 AS version
+            FROM electricity_records r
+            JOIN (
+                SELECT building, room, MAX(query_time) AS query_time
+                FROM electricity_records
+                GROUP BY building, room
+            ) latest
+              ON r.building = latest.building
+             AND r.room = latest.room
+             AND r.query_time = latest.query_time
+        ) t
+        ON DUPLICATE KEY UPDATE
+            electricity = IF(t.crawl_id >= latest_readings.crawl_id, t.electricity, latest_readings.electricity),
+            query_time = IF(t.crawl_id >= latest_readings.crawl_id, t.query_time, latest_readings.query_time),
+            crawl_id = GREATEST(latest_readings.crawl_id, t.crawl_id)
+    """)
+    cursor.execute("SELECT COUNT(*), MAX(crawl_id) FROM latest_readings")
+    room_count, crawl_id = cursor.fetchone()
+    if crawl_id:
+        cursor.execute("SELECT COUNT(*) FROM latest_readings WHERE crawl_id = %s", (crawl_id,))
+        latest_count = cursor.fetchone()[0]
+        query_time = datetime.datetime.strptime(str(crawl_id), "%Y%m%d%H%M%S")
+        _advance_state(cursor, crawl_id, query_time, latest_count)
+    return room_count
@@ -0,0 +1,68 @@
+import time
+import threading
+from config.config import Config
+
+
+class ProgressThrottle:
+    """合并批量查询的进度回调
+
+    包装callback(消息, 总数, 已处理数)，每秒最多转发max_rate次，并在消息后附加速率和预计剩余时间。
+    第一次和最后一次（已处理数达到总数）的进度总是转发，中间被合并的进度直接丢弃。
+    错误消息等不能丢弃的消息用emit()转发，不受合并限制。
+    """
+
+    def __init__(self, callback, max_rate=None):
+        self.callback = callback
+        self.max_rate = max_rate or Config.PROGRESS_MAX_UPDATES
+        self._interval = 1.0 / self.max_rate
+        self._lock = threading.Lock()
+        self._started = None
+        self._start_count = 0
+        self._last_emit = None
+        self.emitted = 0
+        self.dropped = 0
+
+    @classmethod
+    def wrap(cls, callback, max_rate=None):
+        """包装回调；callback为None或已经包装过时原样返回"""
+        if callback is None or isinstance(callback, cls):
+            return callback
+        return cls(callback, max_rate)
+
+    @staticmethod
+    def _format_eta(seconds):
+        minutes, seconds = divmod(int(seconds), 60)
+        return f"{minutes}分{seconds:02d}秒" if minutes else f"{seconds}秒"
+
+    def _decorate(self, message, total, current, now):
+        """在消息后附加从开始到现在的平均速率和预计剩余时间"""
+        elapsed = now - self._started
+        done = current - self._start_count
+        if elapsed <= 0 or done <= 0 or current >= total:
+            return message
+        rate = done / elapsed
+        return f"{message}，平均 {rate:.1f} 间/秒，预计剩余 {self._format_eta((total - current) / rate)}"
+
+    def emit(self, message, total, current):
+        """不经合并直接转发一条消息，不附加速率，也不推迟下一次进度的转发"""
+        with self._lock:
+            if self._started is None:
+                self._started = time.monotonic()
+                self._start_count = current
+            self.emitted += 1
+        self.callback(message, total, current)
+
+    def __call__(self, message, total, current):
+        now = time.monotonic()
+        with self._lock:
+            if self._started is None:
+                self._started = now
+                self._start_count = current
+            final = current >= total
+            if not final and self._last_emit is not None and now - self._last_emit < self._interval:
+                self.dropped += 1
+                return
+            self._last_emit = now
+            self.emitted += 1
+            message = self._decorate(message, total, current, now)
+        self.callback(message, total, current)
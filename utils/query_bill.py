@@ -23,13 +23,13 @@ class BillQuery:
         for retry in range(self.retry_count):
             try:
                 headers = {
-                    "Referer": "https://yktepay.lixin.edu.cn/ykt/h5/bill",
+                    "Referer": f"{Config.YKT_BASE_URL}/ykt/h5/bill",
                     "X-Requested-With": "XMLHttpRequest",
                     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.127 Safari/537.36"
                 }
 
                 resp = self.session.get(
-                    f"https://yktepay.lixin.edu.cn/ykt/h5/loadbill.json?pageno={page_no}",
+                    f"{Config.YKT_BASE_URL}/ykt/h5/loadbill.json?pageno={page_no}",
                     headers=headers,
                     timeout=Config.TIMEOUT
                 )
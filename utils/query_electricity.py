@@ -1,28 +1,76 @@
 import os
 import sys
-import csv
-import requests
 import pymysql
 import datetime
 import concurrent.futures
 import time
-from bs4 import BeautifulSoup
+import asyncio
+import requests
 from config.config import Config
+from utils.http_transport import get_transport
+from utils.room_index import get_room_index
+from utils.result_cache import get_result_cache
+from utils.progress import ProgressThrottle
+from utils.rate_controller import AIMDController
+from utils.latency_tracker import LatencyTracker
+from utils.circuit_breaker import CircuitBreaker
+from utils.eleresult_parser import extract_remaining_electricity
+from utils.bulk_writer import AllRoomBulkWriter
+from utils.snapshot_store import write_snapshot
+from utils.dead_rooms import DeadRoomRegistry
+from utils.crawl_results import CrawlResults
+from utils.db_migrations import apply_migrations, crawl_id_of
+from utils.rollups import compute_rollups, write_rollups
+from utils.latest_readings import update_latest_readings, latest_version
+from utils.retention import maintain_partitions
+
+# aiohttp 仅异步查询引擎需要，未安装时仍可使用线程池引擎
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
 
 class ElectricityQuery:
     def __init__(self):
         self.room_mappings = self.load_room_mappings()
-        # 用于控制查询速度的延迟
-        self.query_delay = 0.2  # 查询间隔时间(秒)，适当减少
-        # 默认并发线程数调整为较高值，提高查询速度
-        self.max_workers = 60  # 提高到60个并发线程
+        # 线程池引擎的线程数，也是线程模式下并发上限的上界
+        self.max_workers = 60
         # 查询超时参数
         self.query_timeout = 8  # 保持8秒查询超时
+        # 异步引擎同时在途请求数的上界
+        self.async_concurrency = 100
+        # 自适应并发控制器，取代固定的查询间隔和批次等待
+        self.rate_controller = AIMDController(max_limit=self.max_workers, hedge_slots=Config.HEDGE_SLOTS)
+        # 对冲请求：耗时超过本次查询延迟分位数的房间再发一次请求，先返回者胜出
+        self.hedge_requests = True
+        self.latency_tracker = LatencyTracker(hedge_percentile=95)
+        self._hedge_executor = None
+        # 上游故障时熔断，剩余请求立即失败而不是逐个等待超时
+        self.circuit_breaker = CircuitBreaker()
+        # 共享的keep-alive连接池，避免每次请求重新握手
+        self.transport = get_transport(pool_size=max(self.max_workers + Config.HEDGE_SLOTS, Config.HTTP_POOL_SIZE))
+        # 进程内共享的房间结果缓存，批量查询写入，单个房间查询读取
+        self.result_cache = get_result_cache()
         
         # 数据库连接参数，默认值
         self.db_host = 'localhost'
         self.db_user = 'root'
         self.db_password = '123456'
+        # 数据库名，基准测试等场景可指向独立的数据库
+        self.db_name = 'electricity_data'
+        # 批量写入all_room时每条多行INSERT包含的行数
+        self.db_flush_size = 500
+        # 批量查询时是否写入all_room表，无数据库环境下可关闭
+        self.write_all_room = True
+        # 批量查询结束后是否写入列式快照（Config.SNAPSHOT_DIR）
+        self.write_snapshot = True
+        # 持续没有读数的房间，批量查询时跳过，到期后随批量查询重新检查；关闭时既不跳过也不记录
+        self.dead_rooms = DeadRoomRegistry()
+        self.prune_dead_rooms = True
+        self._skipped_dead_count = 0
+        # 每个房间最近一次读数的内存索引，用于计算消耗量
+        self._last_readings = None
+        self._last_readings_version = None
 
     @staticmethod
     def resource_path(relative_path):
@@ -30,68 +78,148 @@ class ElectricityQuery:
         return os.path.join(base_path, relative_path)
 
     def load_room_mappings(self):
-        mappings = {}
-        for num, chinese in Config.BUILDING_NAME_MAP.items():
-            try:
-                file_path = os.path.join(Config.get_room_data_folder(), f"新苑{chinese}号楼房间数据.csv")
-                if os.path.exists(file_path):
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        reader = csv.DictReader(f)
-                        mappings[num] = {row["实际房间"]: row["roomid"] for row in reader}
-            except Exception as e:
-                print(f"加载 {chinese} 号楼数据失败: {str(e)}")
-        return mappings
+        """返回进程内共享的房间索引，{楼栋: {房间: roomid}}，各楼栋首次访问时加载"""
+        return get_room_index()
+
+    @staticmethod
+    def _build_url(building, roomid):
+        """构造宿舍电量查询地址"""
+        buildid, sysid, areaid = Config.BUILDING_MAP[building]
+        return f"{Config.YKT_BASE_URL}/ykt/h5/eleresult?sysid={sysid}&roomid={roomid}&areaid={areaid}&buildid={buildid}"
+
+    @staticmethod
+    def _parse_electricity(html):
+        """从查询结果页面中提取剩余电量，未找到时返回None"""
+        return extract_remaining_electricity(html)
+
+    def query(self, building, room, force_refresh=False):
+        """查询单个宿舍的剩余电量
 
-    def query(self, building, room):
+        缓存中有未过期的结果时直接返回，force_refresh为True时跳过缓存重新查询。
+        """
         try:
             roomid = self.room_mappings.get(building, {}).get(room)
             if not roomid:
                 return f"未找到宿舍 {room} 的配置信息"
             
-            buildid, sysid, areaid = Config.BUILDING_MAP[building]
-            url = f"https://yktepay.lixin.edu.cn/ykt/h5/eleresult?sysid={sysid}&roomid={roomid}&areaid={areaid}&buildid={buildid}"
-            resp = requests.get(url, timeout=Config.TIMEOUT)
+            if not force_refresh:
+                electricity = self.result_cache.get(building, room)
+                if electricity is not None:
+                    return f"宿舍 {room} 剩余电量: {electricity}"
+            
+            if not self.circuit_breaker.allow():
+                return "电费查询服务暂时不可用，请稍后重试"
+            
+            url = self._build_url(building, roomid)
+            try:
+                resp = self.transport.get(url, timeout=Config.TIMEOUT)
+            except Exception:
+                self.circuit_breaker.record(False)
+                raise
+            self.circuit_breaker.record(resp.status_code < 500)
             
             if resp.ok:
-                soup = BeautifulSoup(resp.text, 'html.parser')
-                if elem := soup.find("div", string="剩余电量"):
-                    electricity_text = elem.find_next('div').text.strip()
-                    # 清洗数据 - 移除"度"字
-                    electricity = electricity_text.replace('度', '').strip()
+                electricity = self._parse_electricity(resp.text)
+                if electricity is not None:
+                    self.result_cache.put(building, room, electricity)
                     return f"宿舍 {room} 剩余电量: {electricity}"
             return "查询失败，请稍后重试"
         except Exception as e:
             return f"查询异常: {str(e)}"
             
+    @staticmethod
+    def _circuit_open_result(building, room):
+        """等到半开探测仍失败而被拒绝的房间，记为异常以便续查时重新查询"""
+        return {
+            'building': building,
+            'room': room,
+            'electricity': "查询异常: 上游服务熔断中",
+            'status': 'error'
+        }
+
+    def _get_hedged(self, url):
+        """发出请求；超过对冲阈值仍未返回时再发一次相同请求，取先返回的响应
+
+        对冲请求占用速率控制器中并发上限之外的对冲名额，名额用完时不对冲；名额在对冲请求结束时归还。
+        """
+        delay = self.latency_tracker.hedge_delay() if self.hedge_requests else None
+        executor = self._hedge_executor
+        if delay is None or executor is None:
+            return self.transport.get(url, timeout=self.query_timeout)
+
+        primary = executor.submit(self.transport.get, url, timeout=self.query_timeout)
+        try:
+            return primary.result(timeout=delay)
+        except concurrent.futures.TimeoutError:
+            pass
+
+        if not self.rate_controller.try_acquire_hedge():
+            # 对冲名额已用完，不再额外发请求
+            self.latency_tracker.record_hedge_skipped()
+            return primary.result()
+        self.latency_tracker.record_hedge()
+        hedge = executor.submit(self.transport.get, url, timeout=self.query_timeout)
+        hedge.add_done_callback(lambda _: self.rate_controller.release_hedge())
+        done, _ = concurrent.futures.wait([primary, hedge], return_when=concurrent.futures.FIRST_COMPLETED)
+        winner = done.pop()
+        if winner.exception() is not None:
+            # 先返回的请求失败时等待另一个请求
+            winner = hedge if winner is primary else primary
+        if winner is hedge:
+            self.latency_tracker.record_hedge(won=True)
+        return winner.result()
+
     def _process_room(self, args):
         """处理单个房间查询的工作函数"""
-        building, room, roomid, callback, total_count, processed_count = args
+        building, room, roomid = args
         
         try:
-            # 添加随机延迟，避免请求过于集中
-            time.sleep(self.query_delay)
+            url = self._build_url(building, roomid)
             
-            buildid, sysid, areaid = Config.BUILDING_MAP[building]
-            url = f"https://yktepay.lixin.edu.cn/ykt/h5/eleresult?sysid={sysid}&roomid={roomid}&areaid={areaid}&buildid={buildid}"
+            # 由控制器决定何时发出请求；拿到名额时再检查熔断器，等待期间上游可能已经故障
+            while True:
+                self.rate_controller.acquire()
+                if self.circuit_breaker.allow():
+                    break
+                self.rate_controller.cancel()
+                # 熔断期间不占名额，等到半开探测有结果：上游恢复则继续查询，本次查询中探测失败过则记为异常
+                delay = self.circuit_breaker.retry_after()
+                if delay is None:
+                    return self._circuit_open_result(building, room)
+                time.sleep(delay)
             
-            # 调用回调函数更新进度
-            if callback:
-                callback(f"正在查询: {building}-{room}", total_count, processed_count)
-                
-            resp = requests.get(url, timeout=self.query_timeout)
+            started = time.monotonic()
+            try:
+                resp = self._get_hedged(url)
+            except Exception as e:
+                # 超时和连接错误视为拥塞信号；超时按超时时间计入延迟样本，否则对冲阈值会被低估
+                if isinstance(e, requests.exceptions.Timeout):
+                    self.latency_tracker.record(self.query_timeout)
+                self.rate_controller.release(time.monotonic() - started, congested=True)
+                self.circuit_breaker.record(False)
+                raise
+            latency = time.monotonic() - started
+            self.latency_tracker.record(latency)
+            self.rate_controller.release(latency, congested=resp.status_code >= 500)
+            self.circuit_breaker.record(resp.status_code < 500)
             
             if resp.ok:
-                soup = BeautifulSoup(resp.text, 'html.parser')
-                if elem := soup.find("div", string="剩余电量"):
-                    electricity_text = elem.find_next('div').text.strip()
-                    # 清洗数据 - 移除"度"字
-                    electricity = electricity_text.replace('度', '').strip()
+                electricity = self._parse_electricity(resp.text)
+                if electricity is not None:
                     return {
                         'building': building,
                         'room': room,
                         'electricity': electricity,
                         'status': 'success'
                     }
+            elif resp.status_code >= 500:
+                # 上游服务故障属于临时错误，不能当作该房间没有读数
+                return {
+                    'building': building,
+                    'room': room,
+                    'electricity': f"查询异常: HTTP {resp.status_code}",
+                    'status': 'error'
+                }
             
             return {
                 'building': building,
@@ -107,50 +235,121 @@ class ElectricityQuery:
                 'status': 'error'
             }
 
-    def query_all_rooms(self, callback=None):
-        """查询所有宿舍的电费并保存到数据库，使用并发提高速度"""
-        results = {}
-        current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    def _prepare_tasks(self, buildings=None, journal=None, rooms=None):
+        """准备批量查询任务
+
+        传入查询日志时，日志中已完成的房间直接填入结果，不再生成任务。
+        传入rooms（(楼栋, 房间)集合）时只查询其中的房间。
+        prune_dead_rooms为True时跳过未到重新检查时间的失效房间，这些房间不计入总数。
+
+        Returns:
+            (CrawlResults, 房间总数, [(楼栋, 房间, roomid), ...], [(楼栋, 房间, 电量), ...]已恢复的成功结果)
+        """
+        results = CrawlResults(self.room_mappings)
+        tasks = []
+        resumed = []
+        total_count = 0
+        completed = journal.completed if journal else {}
+        selected = set(rooms) if rooms is not None else None
+        skipped = self.dead_rooms.skip_set() if self.prune_dead_rooms else set()
+        self._skipped_dead_count = 0
+        for building, building_rooms in self.room_mappings.items():
+            if buildings and building not in buildings:
+                continue
+            for room, roomid in building_rooms.items():
+                if selected is not None and (building, room) not in selected:
+                    continue
+                if (building, room) in skipped and (building, room) not in completed:
+                    self._skipped_dead_count += 1
+                    continue
+                total_count += 1
+                if (building, room) in completed:
+                    electricity, status = completed[(building, room)]
+                    results.set(building, room, electricity, status)
+                    if status == 'success':
+                        resumed.append((building, room, electricity))
+                else:
+                    tasks.append((building, room, roomid))
+        return results, total_count, tasks, resumed
+
+    @staticmethod
+    def _start_writer(writer, journal, query_time, resumed):
+        """中断前的成功结果若尚未提交到all_room，随本次写入一起补写"""
+        if journal and not journal.all_room_committed:
+            for building, room, electricity in resumed:
+                writer.add(query_time, building, room, electricity)
+
+    def _finish_sweep(self, query_time, results, partial=False):
+        """批量查询结束后的收尾：写入列式快照、更新失效房间记录，失败不影响查询结果
+
+        只查询部分楼栋或部分房间（partial为True，如--buildings、增量查询）时不写快照，
+        否则这份大部分房间无读数的快照会成为最新快照。
+
+        Returns:
+            合并到结果stats中的统计
+        """
+        snapshot = None
+        if self.write_snapshot and not partial:
+            try:
+                snapshot = write_snapshot(query_time, results)
+            except Exception as e:
+                print(f"写入查询快照失败: {str(e)}")
+
+        if not self.prune_dead_rooms:
+            return {'snapshot': snapshot}
+        dead_rooms = self.dead_rooms.update(results)
+        try:
+            self.dead_rooms.save_state()
+        except Exception as e:
+            print(f"保存失效房间记录失败: {str(e)}")
+        dead_rooms['skipped'] = self._skipped_dead_count
+        dead_rooms.update(self.dead_rooms.stats())
+        return {'snapshot': snapshot, 'dead_rooms': dead_rooms}
+
+    def _finish_writer(self, writer, journal):
+        """all_room写入提交后在日志中标记"""
+        if journal and self.write_all_room and not writer.failed and not journal.all_room_committed:
+            journal.mark_all_room_committed()
+
+    def query_all_rooms(self, callback=None, buildings=None, journal=None, rooms=None):
+        """查询所有宿舍的电费并保存到数据库，使用并发提高速度
+
+        Args:
+            callback: 进度回调 callback(消息, 总数, 已处理数)，按Config.PROGRESS_MAX_UPDATES合并后调用
+            buildings: 只查询这些楼栋，默认查询全部
+            journal: CrawlJournal断点续查日志，传入时沿用其query_time并跳过已完成的房间
+            rooms: 只查询这些(楼栋, 房间)，用于增量查询
+        """
+        current_time = journal.query_time if journal else datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        callback = ProgressThrottle.wrap(callback)
         
         # 确保数据库存在
-        self.init_database()
+        if self.write_all_room:
+            self.init_database()
         
         # 准备所有查询任务
-        all_tasks = []
-        total_count = 0
-        
-        for building, rooms in self.room_mappings.items():
-            results[building] = {}
-            for room, roomid in rooms.items():
-                all_tasks.append((building, room, roomid, callback, total_count + 1, 0))
-                total_count += 1
+        results, total_count, all_tasks, resumed = self._prepare_tasks(buildings, journal, rooms)
         
         # 确保任务数量合理
         if total_count == 0:
             if callback:
-                callback("未找到有效的宿舍数据，请检查配置", 1, 0)
+                callback.emit("未找到有效的宿舍数据，请检查配置", 1, 0)
             return {}, current_time
             
-        success_count = 0
-        processed_count = 0
+        success_count = len(resumed)
+        processed_count = total_count - len(all_tasks)
+        self.rate_controller.begin(max_limit=self.max_workers)
+        self.circuit_breaker.begin()
+        self.latency_tracker.reset()
+        writer = self._open_bulk_writer()
+        self._start_writer(writer, journal, current_time, resumed)
+        # 对冲模式下请求在独立线程池中发出，工作线程只负责等待先返回的结果
+        hedge_executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers * 2) if self.hedge_requests else None
+        self._hedge_executor = hedge_executor
         
-        # 使用线程池执行查询，使用成员变量控制并发数
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # 将任务分批次提交，避免一次性创建过多线程
-            batch_size = 50  # 每批50个任务
-            
-            # 创建统一的结果字典
-            all_futures = {}
-            
-            # 分批提交任务
-            for i in range(0, len(all_tasks), batch_size):
-                # 每批任务之间增加延迟，避免过度请求
-                if i > 0:
-                    time.sleep(1.5)  # 批次间隔1.5秒
-                    
-                batch_tasks = all_tasks[i:i+batch_size]
-                batch_futures = {executor.submit(self._process_room, task): task for task in batch_tasks}
-                all_futures.update(batch_futures)
+        # 使用线程池执行查询，实际在途请求数由自适应控制器限制
+        with writer, concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            all_futures = {executor.submit(self._process_room, task): task for task in all_tasks}
             
             # 统一处理所有任务完成的结果
             for future in concurrent.futures.as_completed(all_futures):
@@ -163,24 +362,29 @@ class ElectricityQuery:
                 
                 try:
                     result = future.result()
-                    results[building][room] = result['electricity']
+                    results.set(building, room, result['electricity'], result['status'])
+                    if journal:
+                        journal.record(building, room, result['electricity'], result['status'])
                     
-                    # 如果查询成功，保存到数据库
+                    # 如果查询成功，加入批量写入缓冲区
                     if result['status'] == 'success':
                         success_count += 1
-                        try:
-                            self.save_to_database(current_time, building, room, result['electricity'])
-                        except Exception as db_error:
-                            print(f"保存到数据库失败: {str(db_error)}")
+                        writer.add(current_time, building, room, result['electricity'])
+                        self.result_cache.put(building, room, result['electricity'])
                     
-                    # 更新进度
+                    # 更新进度，附带控制器当前的并发和速率
                     if callback:
-                        callback(f"已处理: {progress}/{total_count}", total_count, progress)
+                        callback(self._progress_message(progress, total_count), total_count, progress)
                         
                 except Exception as e:
-                    results[building][room] = f"处理错误: {str(e)}"
+                    results.set(building, room, f"处理错误: {str(e)}", 'error')
                     if callback:
-                        callback(f"处理房间 {building}-{room} 时出错: {str(e)}", total_count, progress)
+                        callback.emit(f"处理房间 {building}-{room} 时出错: {str(e)}", total_count, progress)
+        self._finish_writer(writer, journal)
+        sweep_stats = self._finish_sweep(current_time, results, partial=bool(buildings) or rooms is not None)
+        if hedge_executor:
+            self._hedge_executor = None
+            hedge_executor.shutdown(wait=False)
         
         # 完成回调
         if callback:
@@ -191,11 +395,224 @@ class ElectricityQuery:
             'data': results,
             'stats': {
                 'total_count': total_count,
-                'success_count': success_count
+                'success_count': success_count,
+                'transport': self.transport.stats(),
+                'rate_controller': self.rate_controller.snapshot(),
+                'latency': self.latency_tracker.snapshot(),
+                'circuit_breaker': self.circuit_breaker.snapshot(),
+                'db_write': writer.stats(),
+                **sweep_stats
             }
         }
             
         return result_with_stats, current_time
+
+    def _progress_message(self, processed_count, total_count):
+        """生成带有当前并发上限和查询速率的进度消息"""
+        controller = self.rate_controller
+        return (f"已处理: {processed_count}/{total_count} "
+                f"(并发 {controller.current_limit()}, 速率 {controller.current_rate():.1f} 间/秒)")
+
+    @staticmethod
+    async def _fetch_async(session, url):
+        """发出一次请求，返回(状态码, 页面文本)；出错状态码不读取正文"""
+        async with session.get(url) as resp:
+            text = await resp.text() if resp.status < 400 else None
+            return resp.status, text
+
+    async def _fetch_hedged_async(self, session, url):
+        """异步版对冲请求：超过阈值仍未返回时再发一次，取先成功返回的结果
+
+        与线程版相同，对冲请求须拿到对冲名额才发出。
+        """
+        delay = self.latency_tracker.hedge_delay() if self.hedge_requests else None
+        if delay is None:
+            return await self._fetch_async(session, url)
+
+        primary = asyncio.ensure_future(self._fetch_async(session, url))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+
+        if not self.rate_controller.try_acquire_hedge():
+            # 对冲名额已用完，不再额外发请求
+            self.latency_tracker.record_hedge_skipped()
+            return await primary
+        self.latency_tracker.record_hedge()
+        hedge = asyncio.ensure_future(self._fetch_async(session, url))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = [task for task in done if task.exception() is None]
+                if succeeded:
+                    if hedge in succeeded and primary not in succeeded:
+                        self.latency_tracker.record_hedge(won=True)
+                    return succeeded[0].result()
+                # 先返回的请求失败时，另一个仍在进行就继续等待
+                if not pending:
+                    return done.pop().result()
+        finally:
+            for task in pending:
+                task.cancel()
+            # 对冲请求已结束或已取消，归还其名额
+            self.rate_controller.release_hedge()
+
+    async def _process_room_async(self, session, building, room, roomid):
+        """异步引擎中处理单个房间查询的协程"""
+        controller = self.rate_controller
+        try:
+            url = self._build_url(building, roomid)
+            # 拿到名额时再检查熔断器，等待期间上游可能已经故障
+            while True:
+                await controller.acquire_async()
+                if self.circuit_breaker.allow():
+                    break
+                await controller.cancel_async()
+                # 与线程版相同，等到半开探测有结果再决定继续查询还是记为异常
+                delay = self.circuit_breaker.retry_after()
+                if delay is None:
+                    return self._circuit_open_result(building, room)
+                await asyncio.sleep(delay)
+            started = time.monotonic()
+            try:
+                status, text = await self._fetch_hedged_async(session, url)
+            except Exception as e:
+                # 超时和连接错误视为拥塞信号；超时按超时时间计入延迟样本，否则对冲阈值会被低估
+                if isinstance(e, asyncio.TimeoutError):
+                    self.latency_tracker.record(self.query_timeout)
+                await controller.release_async(time.monotonic() - started, congested=True)
+                self.circuit_breaker.record(False)
+                raise
+            latency = time.monotonic() - started
+            self.latency_tracker.record(latency)
+            await controller.release_async(latency, congested=status >= 500)
+            self.circuit_breaker.record(status < 500)
+
+            if text is not None:
+                electricity = self._parse_electricity(text)
+                if electricity is not None:
+                    return {
+                        'building': building,
+                        'room': room,
+                        'electricity': electricity,
+                        'status': 'success'
+                    }
+            elif status >= 500:
+                # 上游服务故障属于临时错误，不能当作该房间没有读数
+                return {
+                    'building': building,
+                    'room': room,
+                    'electricity': f"查询异常: HTTP {status}",
+                    'status': 'error'
+                }
+
+            return {
+                'building': building,
+                'room': room,
+                'electricity': "查询失败",
+                'status': 'failed'
+            }
+        except Exception as e:
+            return {
+                'building': building,
+                'room': room,
+                'electricity': f"查询异常: {str(e) or type(e).__name__}",
+                'status': 'error'
+            }
+
+    async def _crawl_async(self, all_tasks, results, callback, total_count, journal=None):
+        """在单个事件循环中并发执行所有房间查询，返回(成功数, 成功结果列表)"""
+        success_count = 0
+        processed_count = total_count - len(all_tasks)
+        success_rows = []
+
+        # 控制器限制在途请求数，连接器复用连接
+        self.rate_controller.begin(max_limit=self.async_concurrency)
+        self.circuit_breaker.begin()
+        self.latency_tracker.reset()
+        timeout = aiohttp.ClientTimeout(total=self.query_timeout)
+        connector = aiohttp.TCPConnector(limit=self.async_concurrency + Config.HEDGE_SLOTS, ttl_dns_cache=300)
+
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector,
+                                         headers={"User-Agent": Config.USER_AGENT}) as session:
+            pending = [
+                asyncio.ensure_future(self._process_room_async(session, building, room, roomid))
+                for building, room, roomid in all_tasks
+            ]
+
+            for next_done in asyncio.as_completed(pending):
+                result = await next_done
+                building, room = result['building'], result['room']
+                processed_count += 1
+
+                results.set(building, room, result['electricity'], result['status'])
+                if journal:
+                    journal.record(building, room, result['electricity'], result['status'])
+                if result['status'] == 'success':
+                    success_count += 1
+                    success_rows.append((building, room, result['electricity']))
+                    self.result_cache.put(building, room, result['electricity'])
+
+                if callback:
+                    callback(self._progress_message(processed_count, total_count), total_count, processed_count)
+
+        return success_count, success_rows
+
+    @staticmethod
+    def async_engine_available():
+        """异步查询引擎是否可用（需要aiohttp）"""
+        return aiohttp is not None
+
+    def query_all_rooms_async(self, callback=None, buildings=None, journal=None, rooms=None):
+        """使用asyncio在单线程内查询所有宿舍的电费，参数和返回格式与query_all_rooms一致"""
+        if aiohttp is None:
+            raise RuntimeError("异步查询引擎需要安装aiohttp: pip install aiohttp")
+
+        current_time = journal.query_time if journal else datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        callback = ProgressThrottle.wrap(callback)
+
+        # 确保数据库存在
+        if self.write_all_room:
+            self.init_database()
+
+        # 准备所有查询任务
+        results, total_count, all_tasks, resumed = self._prepare_tasks(buildings, journal, rooms)
+        if total_count == 0:
+            if callback:
+                callback.emit("未找到有效的宿舍数据，请检查配置", 1, 0)
+            return {}, current_time
+
+        success_count, success_rows = asyncio.run(
+            self._crawl_async(all_tasks, results, callback, total_count, journal))
+        success_count += len(resumed)
+
+        # 查询结束后再批量写入数据库，避免阻塞事件循环
+        with self._open_bulk_writer() as writer:
+            self._start_writer(writer, journal, current_time, resumed)
+            for building, room, electricity in success_rows:
+                writer.add(current_time, building, room, electricity)
+        self._finish_writer(writer, journal)
+        sweep_stats = self._finish_sweep(current_time, results, partial=bool(buildings) or rooms is not None)
+
+        # 完成回调
+        if callback:
+            callback(f"查询完成，共查询{total_count}个房间，成功{success_count}个", total_count, total_count)
+
+        result_with_stats = {
+            'data': results,
+            'stats': {
+                'total_count': total_count,
+                'success_count': success_count,
+                'rate_controller': self.rate_controller.snapshot(),
+                'latency': self.latency_tracker.snapshot(),
+                'circuit_breaker': self.circuit_breaker.snapshot(),
+                'db_write': writer.stats(),
+                **sweep_stats
+            }
+        }
+
+        return result_with_stats, current_time
     
     def init_database(self):
         """初始化数据库和表"""
@@ -205,10 +622,10 @@ class ElectricityQuery:
             cursor = conn.cursor()
             
             # 创建数据库（如果不存在）
-            cursor.execute("CREATE DATABASE IF NOT EXISTS electricity_data")
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{self.db_name}`")
             
             # 使用数据库
-            cursor.execute("USE electricity_data")
+            cursor.execute(f"USE `{self.db_name}`")
             
             # 创建原有的表（如果不存在）- 保留向后兼容性
             cursor.execute("""
@@ -241,7 +658,26 @@ class ElectricityQuery:
             )
             """)
             
+            # 创建长表格式的电量记录表 - 每个房间每次查询一行
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS electricity_records (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                building VARCHAR(10) NOT NULL,
+                room VARCHAR(20) NOT NULL,
+                query_time DATETIME NOT NULL,
+                electricity VARCHAR(50),
+                consumption FLOAT,
+                KEY idx_room_time (building, room, query_time)
+            )
+            """)
+            # 旧版本创建的表可能缺少该索引，按房间取最新读数依赖它
+            self._ensure_index(cursor, 'electricity_records', 'idx_room_time', '(building, room, query_time)')
             conn.commit()
+            
+            # 在基础表上执行未执行的结构迁移，已分区的表补齐未来月份的分区
+            apply_migrations(conn)
+            maintain_partitions(conn)
+            
             cursor.close()
             conn.close()
             return True
@@ -249,13 +685,25 @@ class ElectricityQuery:
             print(f"初始化数据库失败: {str(e)}")
             return False
     
+    @staticmethod
+    def _ensure_index(cursor, table, index_name, columns):
+        """索引不存在时创建索引（MySQL不支持CREATE INDEX IF NOT EXISTS）"""
+        cursor.execute(f"SHOW INDEX FROM {table} WHERE Key_name = %s", (index_name,))
+        if not cursor.fetchone():
+            cursor.execute(f"ALTER TABLE {table} ADD INDEX {index_name} {columns}")
+
+    def _open_bulk_writer(self):
+        """创建写入all_room表的批量写入器"""
+        return AllRoomBulkWriter(self.db_host, self.db_user, self.db_password, database=self.db_name,
+                                 flush_size=self.db_flush_size, enabled=self.write_all_room)
+
     def save_to_database(self, query_time, building, room, electricity):
         """保存查询结果到数据库"""
         try:
             # 尝试将电量转换为数字格式保存（去掉"度"字）
             clean_electricity = electricity.replace('度', '').strip()
             
-            conn = pymysql.connect(host=self.db_host, user=self.db_user, password=self.db_password, database='electricity_data')
+            conn = pymysql.connect(host=self.db_host, user=self.db_user, password=self.db_password, database=self.db_name)
             cursor = conn.cursor()
             
             # 旧方式: 插入数据到原有表
@@ -270,62 +718,123 @@ class ElectricityQuery:
             print(f"保存到数据库失败: {str(e)}")
             return False
             
-    def save_batch_to_history_database(self, query_time, results):
-        """将批量查询结果保存到历史数据库"""
+    def _load_last_readings(self, cursor):
+        """获取每个房间最近一次的电量读数，返回{(楼栋, 房间): 电量}
+
+        读取入库时维护的latest_readings表；结果缓存在内存中，
+        只有latest_state的版本号变化（本进程之外有新的入库）时才重新加载。
+        """
+        version = latest_version(cursor)
+        if self._last_readings is not None and self._last_readings_version == version:
+            return self._last_readings
+
+        cursor.execute("SELECT building, room, electricity FROM latest_readings")
+        readings = {}
+        for building, room, electricity in cursor.fetchall():
+            readings[(str(building), room)] = electricity
+
+        self._last_readings = readings
+        self._last_readings_version = version
+        return readings
+
+    @staticmethod
+    def _successful_readings(data):
+        """依次返回查询成功的 (楼栋, 房间, 电量文本)
+
+        CrawlResults直接按状态码取成功的房间，文本与写入all_room的相同；旧格式的嵌套字典按文本跳过错误消息。
+        """
+        if isinstance(data, CrawlResults):
+            yield from data.success_texts()
+            return
+        for building, rooms in data.items():
+            for room, electricity in rooms.items():
+                if not isinstance(electricity, str):
+                    continue
+                clean_electricity = electricity.replace('度', '').strip()
+                # 跳过错误消息
+                if "查询失败" in clean_electricity or "查询异常" in clean_electricity or "处理错误" in clean_electricity:
+                    continue
+                yield building, room, clean_electricity
+
+    def save_batch_to_history_database(self, query_time, results, journal=None, incremental=False):
+        """将批量查询结果保存到历史数据库
+
+        传入查询日志时保证同一次查询只写入一次：日志已标记提交，
+        或query_history中已存在该查询时间（提交后、标记前中断）时直接返回成功。
+        incremental为True表示只查询了到期房间的增量查询，在query_history中标记为增量查询；
+        其余房间的最新读数保留在latest_readings中，读取当前状态应按房间读取该表。
+        """
+        if journal and journal.history_committed:
+            return True
         try:
-            conn = pymysql.connect(host=self.db_host, user=self.db_user, password=self.db_password, database='electricity_data')
+            conn = pymysql.connect(host=self.db_host, user=self.db_user, password=self.db_password, database=self.db_name)
             cursor = conn.cursor()
             
-            # 1. 将查询时间添加到查询历史表
-            description = f"批量查询 {datetime.datetime.strptime(query_time, '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M')}"
-            cursor.execute("INSERT INTO query_history (query_time, description) VALUES (%s, %s)", 
-                          (query_time, description))
+            if journal:
+                cursor.execute("SELECT 1 FROM query_history WHERE query_time = %s", (query_time,))
+                if cursor.fetchone():
+                    journal.mark_history_committed()
+                    return True
             
-            # 2. 处理结果并插入新表
+            # 先取出所有房间的上次电量（须在写入本次查询历史之前）
+            last_readings = self._load_last_readings(cursor)
+            
+            # 1. 在内存中计算消耗量
             if isinstance(results, dict) and 'data' in results:
                 data = results['data']
             else:
                 data = results
                 
-            for building, rooms in data.items():
-                for room, electricity in rooms.items():
-                    # 清洗电量数据
-                    if isinstance(electricity, str):
-                        clean_electricity = electricity.replace('度', '').strip()
-                        # 检查是否为错误消息
-                        if "查询失败" in clean_electricity or "查询异常" in clean_electricity or "处理错误" in clean_electricity:
-                            continue  # 跳过保存错误数据
-                    else:
-                        continue
+            crawl_id = crawl_id_of(query_time)
+            rows = []
+            readings = []
+            for building, room, clean_electricity in self._successful_readings(data):
+                consumption = None
+                prev_value = last_readings.get((str(building), room))
+                if prev_value:
+                    try:
+                        prev_electricity = float(prev_value)
+                        curr_electricity = float(clean_electricity)
                         
-                    # 获取上次电量值以计算消耗量
-                    cursor.execute("""
-                        SELECT electricity FROM electricity_records 
-                        WHERE building = %s AND room = %s
-                        ORDER BY query_time DESC LIMIT 1
-                    """, (building, room))
-                    
-                    consumption = None
-                    last_record = cursor.fetchone()
-                    if last_record and last_record[0]:
-                        try:
-                            prev_electricity = float(last_record[0])
-                            curr_electricity = float(clean_electricity)
-                            
-                            # 只在前一个电量值大于当前电量值时才计算消耗
-                            if prev_electricity > curr_electricity:
-                                consumption = prev_electricity - curr_electricity
-                        except:
-                            pass
-                    
-                    # 插入新记录
-                    cursor.execute("""
-                        INSERT INTO electricity_records 
-                        (building, room, query_time, electricity, consumption)
-                        VALUES (%s, %s, %s, %s, %s)
-                    """, (building, room, query_time, clean_electricity, consumption))
+                        # 只在前一个电量值大于当前电量值时才计算消耗
+                        if prev_electricity > curr_electricity:
+                            consumption = prev_electricity - curr_electricity
+                    except (ValueError, TypeError):
+                        pass
+                
+                rows.append((building, room, query_time, crawl_id, clean_electricity, consumption))
+                try:
+                    readings.append((building, room, float(clean_electricity), consumption))
+                except ValueError:
+                    pass
+            
+            # 2. 将查询时间和记录数添加到查询历史表
+            kind = "增量查询" if incremental else "批量查询"
+            description = f"{kind} {datetime.datetime.strptime(query_time, '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M')}"
+            cursor.execute("INSERT INTO query_history (query_time, description, record_count) VALUES (%s, %s, %s)", 
+                          (query_time, description, len(rows)))
+            
+            # 3. 一条多行INSERT写入所有记录
+            if rows:
+                cursor.executemany("""
+                    INSERT INTO electricity_records 
+                    (building, room, query_time, crawl_id, electricity, consumption)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, rows)
+            
+            # 4. 在同一事务中写入按楼栋、楼层的汇总和每个房间的最新读数
+            write_rollups(cursor, query_time, compute_rollups(readings))
+            version = update_latest_readings(cursor, query_time,
+                                             [(building, room, electricity) for building, room, _, _, electricity, _ in rows])
                     
             conn.commit()
+            
+            # 提交成功后更新内存索引
+            for building, room, _, _, clean_electricity, _ in rows:
+                last_readings[(str(building), room)] = clean_electricity
+            self._last_readings_version = version
+            if journal:
+                journal.mark_history_committed()
             return True
         except Exception as e:
             print(f"保存批量查询结果到历史数据库失败: {str(e)}")
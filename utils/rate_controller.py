@@ -0,0 +1,172 @@
+import time
+import asyncio
+import threading
+from collections import deque
+
+
+class AIMDController:
+    """加性增、乘性减(AIMD)的自适应并发控制器
+
+    查询健康（无超时、无5xx、延迟低于目标）时逐步放大并发上限，
+    遇到拥塞信号时按比例收缩，使批量查询速度贴合上游实际承受能力。
+    """
+
+    def __init__(self, initial_limit=8, min_limit=2, max_limit=60,
+                 decrease_factor=0.5, latency_target=2.0, cooldown=1.0, hedge_slots=0):
+        """初始化控制器
+
+        Args:
+            initial_limit (int): 初始并发上限
+            min_limit (int): 并发上限的下界
+            max_limit (int): 并发上限的上界
+            decrease_factor (float): 拥塞时的收缩比例
+            latency_target (float): 健康请求的延迟上限(秒)，超过则不再加速
+            cooldown (float): 两次收缩之间的最短间隔(秒)，避免一批超时把并发压到底
+            hedge_slots (int): 并发上限之外留给对冲请求的名额数
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.hedge_slots = hedge_slots
+        self.limit = float(max(min_limit, min(initial_limit, max_limit)))
+
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._async_cond = None
+        self._inflight = 0
+        # 对冲名额不随begin()清零，上一次查询遗留的对冲请求结束时仍会归还
+        self._hedge_inflight = 0
+        self._slow_start = True
+        self._last_decrease = 0.0
+        self._completions = deque(maxlen=200)
+        self._success = 0
+        self._congested = 0
+        self._decreases = 0
+
+    def begin(self, max_limit=None):
+        """开始一次新的批量查询，保留已学到的并发上限"""
+        with self._lock:
+            if max_limit:
+                self.max_limit = max_limit
+                self.limit = min(self.limit, float(max_limit))
+            self._inflight = 0
+            self._async_cond = None
+            self._completions.clear()
+            self._success = 0
+            self._congested = 0
+            self._decreases = 0
+
+    def current_limit(self):
+        """当前允许的在途请求数"""
+        return max(self.min_limit, int(self.limit))
+
+    def record(self, latency, congested=False):
+        """记录一次请求结果并调整并发上限
+
+        Args:
+            latency (float): 请求耗时(秒)
+            congested (bool): 是否为拥塞信号（超时、连接错误、5xx）
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._completions.append(now)
+            if congested:
+                self._congested += 1
+                self._slow_start = False
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(float(self.min_limit), self.limit * self.decrease_factor)
+                    self._last_decrease = now
+                    self._decreases += 1
+                return
+
+            self._success += 1
+            if latency > self.latency_target:
+                # 延迟升高但未出错，保持当前速度
+                return
+            if self._slow_start:
+                # 首次拥塞之前每个成功请求加1，快速找到上限
+                self.limit = min(float(self.max_limit), self.limit + 1)
+            else:
+                # 拥塞之后每完成约limit个请求加1
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+    def current_rate(self):
+        """最近完成请求的速率(次/秒)"""
+        with self._lock:
+            if len(self._completions) < 2:
+                return 0.0
+            elapsed = self._completions[-1] - self._completions[0]
+            return (len(self._completions) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def acquire(self):
+        """线程模式：等待直到在途请求数低于当前上限"""
+        with self._cond:
+            while self._inflight >= self.current_limit():
+                self._cond.wait()
+            self._inflight += 1
+
+    def try_acquire_hedge(self):
+        """不等待地占用一个对冲名额，对冲名额用完时返回False
+
+        对冲请求使用并发上限之外的hedge_slots个独立名额：上限用满时（正是尾延迟最高的时候）对冲仍能发出，
+        同时额外的请求量有固定上界。线程和协程模式都用release_hedge()归还。
+        """
+        with self._lock:
+            if self._hedge_inflight >= self.hedge_slots:
+                return False
+            self._hedge_inflight += 1
+            return True
+
+    def release_hedge(self):
+        """归还对冲名额"""
+        with self._lock:
+            self._hedge_inflight -= 1
+
+    def release(self, latency, congested=False):
+        """线程模式：归还名额并记录结果"""
+        self.record(latency, congested)
+        with self._cond:
+            self._inflight -= 1
+            self._cond.notify_all()
+
+    def cancel(self):
+        """线程模式：归还名额但不记录结果（请求未发出）"""
+        with self._cond:
+            self._inflight -= 1
+            self._cond.notify_all()
+
+    async def acquire_async(self):
+        """协程模式：等待直到在途请求数低于当前上限"""
+        if self._async_cond is None:
+            self._async_cond = asyncio.Condition()
+        async with self._async_cond:
+            await self._async_cond.wait_for(lambda: self._inflight < self.current_limit())
+            self._inflight += 1
+
+    async def release_async(self, latency, congested=False):
+        """协程模式：归还名额并记录结果"""
+        self.record(latency, congested)
+        async with self._async_cond:
+            self._inflight -= 1
+            self._async_cond.notify_all()
+
+    async def cancel_async(self):
+        """协程模式：归还名额但不记录结果（请求未发出）"""
+        async with self._async_cond:
+            self._inflight -= 1
+            self._async_cond.notify_all()
+
+    def snapshot(self):
+        """返回控制器当前状态"""
+        rate = self.current_rate()
+        with self._lock:
+            return {
+                'limit': self.current_limit(),
+                'max_limit': self.max_limit,
+                'rate': round(rate, 2),
+                'success': self._success,
+                'congested': self._congested,
+                'decreases': self._decreases
+            }
@@ -0,0 +1,79 @@
+import time
+import threading
+from collections import OrderedDict
+from config.config import Config
+
+
+class ResultCache:
+    """单个房间电量结果的进程内TTL缓存
+
+    键为(楼栋, 房间)，批量查询的成功结果也会写入，单个房间查询优先读取。
+    超过max_age秒的结果视为过期，条目数超过max_entries时淘汰最久未使用的条目。
+    """
+
+    def __init__(self, max_age=300, max_entries=4096):
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(building, room):
+        return (str(building), room)
+
+    def get(self, building, room, max_age=None):
+        """返回未过期的电量，没有或已过期时返回None"""
+        max_age = self.max_age if max_age is None else max_age
+        key = self._key(building, room)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > max_age:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, building, room, electricity):
+        """记录一个房间的最新电量"""
+        key = self._key(building, room)
+        with self._lock:
+            self._entries[key] = (electricity, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, building=None, room=None):
+        """删除一个房间的缓存；不传参数时清空全部"""
+        with self._lock:
+            if building is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._key(building, room), None)
+
+    def stats(self):
+        """缓存条目数和命中情况"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'max_age': self.max_age,
+            }
+
+
+# 进程内共享的结果缓存
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """获取进程内共享的结果缓存"""
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                _result_cache = ResultCache(Config.RESULT_CACHE_MAX_AGE, Config.RESULT_CACHE_MAX_ENTRIES)
+    return _result_cache
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""electricity_records和all_room的按月分区、数据保留和降采样
+
+electricity_records按crawl_id分区（与按crawl_id的查询一致，可以只扫描相关分区），
+all_room按TO_DAYS(query_time)分区；每月一个分区，另有pmax分区兜底。
+保留任务建议每天由cron执行一次:
+  1. 预先创建未来Config.PARTITION_MONTHS_AHEAD个月的分区；
+  2. 超出Config.RECORDS_FULL_RESOLUTION_MONTHS的electricity_records按月降采样到electricity_daily
+     （每房间每天的最低、最高和最后读数），随后删除该月的数据；
+  3. 超出Config.ALL_ROOM_RETENTION_MONTHS的all_room数据直接删除。
+已分区的表按分区删除，未分区的表按主键分批删除。降采样完成的月份记录在migration_state中，
+删除中途中断后重新运行不会用残缺的数据覆盖已降采样的结果。
+
+用法:
+    python -m utils.retention [--partition] [--full-months 6] [--all-room-months 3]
+
+--partition 把现有的表转换为分区表，需要复制整张表，只需执行一次。
+"""
+import os
+import sys
+import json
+import argparse
+import datetime
+import pymysql
+from config.config import Config
+
+PARTITION_MAX = "pmax"
+# 未分区时每批删除的行数
+DELETE_BATCH_SIZE = 20000
+
+# 分区表的定义：分区表达式、某月1日对应的分区边界，以及分区键须包含在主键中
+PARTITIONED_TABLES = {
+    'electricity_records': {
+        'expression': 'crawl_id',
+        'bound': lambda month: str(month_crawl_id(month)),
+        'primary_key': '(id, crawl_id)',
+        'prepare': 'MODIFY crawl_id BIGINT NOT NULL',
+    },
+    'all_room': {
+        'expression': 'TO_DAYS(query_time)',
+        'bound': lambda month: f"TO_DAYS('{month:%Y-%m-%d}')",
+        'primary_key': '(id, query_time)',
+        'prepare': None,
+    },
+}
+
+
+def month_start(day):
+    return datetime.date(day.year, day.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def month_crawl_id(month):
+    """某月1日0点的crawl_id"""
+    return int(month.strftime("%Y%m%d")) * 1000000
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+def partition_names(cursor, table):
+    """表的分区名，按分区顺序排列；未分区时返回空列表"""
+    cursor.execute("""
+        SELECT PARTITION_NAME
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """, (table,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _partition_definitions(table, months):
+    """months中每月一个分区，最后是pmax"""
+    bound = PARTITIONED_TABLES[table]['bound']
+    definitions = [f"PARTITION {partition_name(month)} VALUES LESS THAN ({bound(add_months(month, 1))})"
+                   for month in months]
+    definitions.append(f"PARTITION {PARTITION_MAX} VALUES LESS THAN MAXVALUE")
+    return ", ".join(definitions)
+
+
+def _months_between(first, last):
+    """从first到last（含）的每个月1日"""
+    months = []
+    month = first
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def partition_table(cursor, table, months_ahead=None):
+    """把未分区的表转换为按月分区，返回是否执行了转换；会复制整张表"""
+    if partition_names(cursor, table):
+        return False
+    months_ahead = Config.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    spec = PARTITIONED_TABLES[table]
+    this_month = month_start(datetime.date.today())
+    cursor.execute(f"SELECT MIN(query_time) FROM {table}")
+    first = cursor.fetchone()[0]
+    months = _months_between(month_start(first) if first else this_month, add_months(this_month, months_ahead))
+
+    # 分区键须包含在每个唯一键中
+    changes = [spec['prepare']] if spec['prepare'] else []
+    changes += ["DROP PRIMARY KEY", f"ADD PRIMARY KEY {spec['primary_key']}"]
+    cursor.execute(f"ALTER TABLE {table} {', '.join(changes)}")
+    cursor.execute(f"ALTER TABLE {table} PARTITION BY RANGE ({spec['expression']}) "
+                   f"({_partition_definitions(table, months)})")
+    return True
+
+
+def ensure_future_partitions(cursor, table, months_ahead=None):
+    """从pmax中拆出到未来months_ahead个月为止的分区，返回新增分区数；未分区的表不处理"""
+    existing = [name for name in partition_names(cursor, table) if name != PARTITION_MAX]
+    if not existing:
+        return 0
+    months_ahead = Config.PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    last = datetime.datetime.strptime(existing[-1][1:], "%Y%m").date()
+    months = _months_between(add_months(last, 1), add_months(month_start(datetime.date.today()), months_ahead))
+    if not months:
+        return 0
+    cursor.execute(f"ALTER TABLE {table} REORGANIZE PARTITION {PARTITION_MAX} INTO "
+                   f"({_partition_definitions(table, months)})")
+    return len(months)
+
+
+def maintain_partitions(conn):
+    """为已分区的表补齐未来的分区，由init_database在每次初始化时调用"""
+    cursor = conn.cursor()
+    try:
+        return {table: ensure_future_partitions(cursor, table) for table in PARTITIONED_TABLES}
+    finally:
+        cursor.close()
+
+
+class RetentionJob:
+    """按保留期降采样并删除旧数据"""
+
+    def __init__(self, conn, full_months=None, all_room_months=None):
+        """初始化保留任务
+
+        Args:
+            conn: 已选定electricity_data库的pymysql连接，须已执行db_migrations
+            full_months (int): electricity_records保留完整精度的月数，默认Config.RECORDS_FULL_RESOLUTION_MONTHS
+            all_room_months (int): all_room保留的月数，默认Config.ALL_ROOM_RETENTION_MONTHS
+        """
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.full_months = Config.RECORDS_FULL_RESOLUTION_MONTHS if full_months is None else full_months
+        self.all_room_months = Config.ALL_ROOM_RETENTION_MONTHS if all_room_months is None else all_room_months
+
+    def _downsampled(self, month):
+        self.cursor.execute("SELECT done FROM migration_state WHERE name = %s", (f"downsample:{month:%Y%m}",))
+        row = self.cursor.fetchone()
+        return bool(row and row[0])
+
+    def downsample_month(self, month):
+        """把一个月的完整记录降采样为每房间每天一行，可重复执行；返回写入的行数"""
+        start = month_crawl_id(month)
+        end = month_crawl_id(add_months(month, 1)) - 1
+        # 最后读数：按时间倒序拼接后取第一个
+        self.cursor.execute("""
+            INSERT INTO electricity_daily
+                (building, room, day, min_electricity, max_electricity, last_electricity,
+                 last_time, reading_count, consumption_sum)
+            SELECT * FROM (
+                SELECT building, room, DATE(query_time) AS day,
+                       MIN(CAST(electricity AS DECIMAL(10, 2))) AS min_electricity,
+                       MAX(CAST(electricity AS DECIMAL(10, 2))) AS max_electricity,
+                       CAST(SUBSTRING_INDEX(GROUP_CONCAT(electricity ORDER BY query_time DESC), ',', 1)
+                            AS DECIMAL(10, 2)) AS last_electricity,
+                       MAX(query_time) AS last_time,
+                       COUNT(*) AS reading_count,
+                       COALESCE(SUM(consumption), 0) AS consumption_sum
+                FROM electricity_records
+                WHERE crawl_id BETWEEN %s AND %s
+                GROUP BY building, room, DATE(query_time)
+            ) t
+            ON DUPLICATE KEY UPDATE
+                min_electricity = t.min_electricity, max_electricity = t.max_electricity,
+                last_electricity = t.last_electricity, last_time = t.last_time,
+                reading_count = t.reading_count, consumption_sum = t.consumption_sum
+        """, (start, end))
+        return self.cursor.rowcount
+
+    def _delete_batched(self, sql, args):
+        """按批执行带LIMIT的DELETE直到删完，每批单独提交，返回删除的行数"""
+        deleted = 0
+        while True:
+            self.cursor.execute(f"{sql} LIMIT {DELETE_BATCH_SIZE}", args)
+            self.conn.commit()
+            deleted += self.cursor.rowcount
+            if self.cursor.rowcount < DELETE_BATCH_SIZE:
+                return deleted
+
+    def _drop_partition(self, table, month):
+        """删除某月的分区，分区不存在时返回False"""
+        name = partition_name(month)
+        if name not in partition_names(self.cursor, table):
+            return False
+        self.cursor.execute(f"ALTER TABLE {table} DROP PARTITION {name}")
+        return True
+
+    def expire_records(self, cutoff):
+        """cutoff之前的electricity_records逐月降采样后删除，返回处理的月数"""
+        self.cursor.execute("SELECT MIN(crawl_id) FROM electricity_records")
+        oldest = self.cursor.fetchone()[0]
+        if not oldest:
+            return 0
+        month = month_start(datetime.datetime.strptime(str(oldest), "%Y%m%d%H%M%S").date())
+        expired = 0
+        while month < cutoff:
+            if not self._downsampled(month):
+                self.downsample_month(month)
+                self.cursor.execute("""
+                    INSERT INTO migration_state (name, done, updated_at) VALUES (%s, 1, %s)
+                    ON DUPLICATE KEY UPDATE done = 1, updated_at = VALUES(updated_at)
+                """, (f"downsample:{month:%Y%m}", datetime.datetime.now()))
+                self.conn.commit()
+
+            # 分区缺失（如数据落在pmax中）时按crawl_id范围分批删除
+            if not self._drop_partition('electricity_records', month):
+                self._delete_batched("DELETE FROM electricity_records WHERE crawl_id BETWEEN %s AND %s",
+                                     (month_crawl_id(month), month_crawl_id(add_months(month, 1)) - 1))
+            # 完整记录已删除的查询不再出现在历史时间点列表中
+            self.cursor.execute("""
+                UPDATE query_history SET record_count = 0
+                WHERE query_time >= %s AND query_time < %s
+            """, (month, add_months(month, 1)))
+            self.conn.commit()
+            expired += 1
+            month = add_months(month, 1)
+        return expired
+
+    def expire_all_room(self, cutoff):
+        """删除cutoff之前的all_room数据，返回删除的分区数或行数"""
+        names = partition_names(self.cursor, 'all_room')
+        if names:
+            dropped = 0
+            for name in names:
+                if name != PARTITION_MAX and datetime.datetime.strptime(name[1:], "%Y%m").date() < cutoff:
+                    self.cursor.execute(f"ALTER TABLE all_room DROP PARTITION {name}")
+                    dropped += 1
+            return dropped
+
+        # all_room没有query_time索引：按插入顺序id随时间递增，找出边界后按主键删除
+        self.cursor.execute("SELECT MIN(id) FROM all_room WHERE query_time >= %s", (cutoff,))
+        boundary = self.cursor.fetchone()[0]
+        if boundary is None:
+            self.cursor.execute("SELECT MAX(id) FROM all_room")
+            last_id = self.cursor.fetchone()[0]
+            if last_id is None:
+                return 0
+            boundary = last_id + 1
+        return self._delete_batched("DELETE FROM all_room WHERE id < %s", (boundary,))
+
+    def run(self):
+        """执行一次保留任务
+
+        Returns:
+            {'new_partitions', 'records_cutoff', 'expired_months', 'all_room_cutoff', 'all_room_removed'}
+        """
+        this_month = month_start(datetime.date.today())
+        records_cutoff = add_months(this_month, -self.full_months)
+        all_room_cutoff = add_months(this_month, -self.all_room_months)
+        summary = {'new_partitions': maintain_partitions(self.conn)}
+        summary['records_cutoff'] = records_cutoff.isoformat()
+        summary['expired_months'] = self.expire_records(records_cutoff)
+        summary['all_room_cutoff'] = all_room_cutoff.isoformat()
+        summary['all_room_removed'] = self.expire_all_room(all_room_cutoff)
+        self.conn.commit()
+        return summary
+
+    def close(self):
+        self.cursor.close()
+
+
+def main(argv=None):
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root_dir not in sys.path:
+        sys.path.insert(0, root_dir)
+    from utils.crawl import get_db_password
+    from utils.query_electricity import ElectricityQuery
+
+    parser = argparse.ArgumentParser(description='electricity_records和all_room的分区维护、降采样和数据保留')
+    parser.add_argument('--db-host', default='localhost', help='数据库地址')
+    parser.add_argument('--db-user', default='elecuser', help='数据库用户名')
+    parser.add_argument('--db-password', default=None, help='数据库密码，默认读取config/db_password.txt')
+    parser.add_argument('--db-name', default='electricity_data', help='数据库名')
+    parser.add_argument('--partition', action='store_true', help='把未分区的表转换为按月分区（复制整张表，只需执行一次）')
+    parser.add_argument('--full-months', type=int, default=None, help='electricity_records保留完整精度的月数')
+    parser.add_argument('--all-room-months', type=int, default=None, help='all_room保留的月数')
+    args = parser.parse_args(argv)
+    password = args.db_password if args.db_password is not None else get_db_password()
+
+    # 先执行结构迁移，确保electricity_daily和migration_state存在
+    query = ElectricityQuery()
+    query.db_host = args.db_host
+    query.db_user = args.db_user
+    query.db_password = password
+    query.db_name = args.db_name
+    if not query.init_database():
+        return 1
+
+    conn = pymysql.connect(host=args.db_host, user=args.db_user, password=password, database=args.db_name)
+    job = RetentionJob(conn, full_months=args.full_months, all_room_months=args.all_room_months)
+    try:
+        summary = {}
+        if args.partition:
+            cursor = conn.cursor()
+            try:
+                summary['partitioned'] = [table for table in PARTITIONED_TABLES if partition_table(cursor, table)]
+            finally:
+                cursor.close()
+        summary.update(job.run())
+    finally:
+        job.close()
+        conn.close()
+    print(json.dumps(summary, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""按楼栋、楼层预聚合的电量汇总
+
+每次批量查询入库时在同一个事务中写入crawl_rollups（每次查询×楼栋×楼层一行），
+并按crawl_rollups重算当天的daily_rollups，看板和趋势查询只读取几百行汇总而不扫描原始记录。
+floor为0的行是整栋楼的汇总。
+
+旧数据（升级前入库或由宽表迁移而来）可用以下命令补算:
+    python -m utils.rollups
+"""
+import os
+import sys
+import json
+import argparse
+import datetime
+from utils.room_index import RoomIndex
+from utils.db_migrations import crawl_id_of, table_exists
+
+# 电量区间阈值：低于LOW_THRESHOLD视为电量紧张，不低于HIGH_THRESHOLD视为电量充足
+LOW_THRESHOLD = 10
+HIGH_THRESHOLD = 100
+# floor列为该值的行是整栋楼的汇总
+BUILDING_FLOOR = 0
+
+ROLLUP_COLUMNS = ('building', 'floor', 'room_count', 'electricity_sum', 'electricity_min', 'electricity_max',
+                  'min_room', 'max_room', 'low_count', 'medium_count', 'high_count', 'consumption_sum')
+
+
+class RollupAccumulator:
+    """一个楼栋或楼层的累加器"""
+
+    __slots__ = ROLLUP_COLUMNS
+
+    def __init__(self, building, floor):
+        self.building = building
+        self.floor = floor
+        self.room_count = 0
+        self.electricity_sum = 0.0
+        self.electricity_min = None
+        self.electricity_max = None
+        self.min_room = None
+        self.max_room = None
+        self.low_count = 0
+        self.medium_count = 0
+        self.high_count = 0
+        self.consumption_sum = 0.0
+
+    def add(self, room, value, consumption=None):
+        self.room_count += 1
+        self.electricity_sum += value
+        # 相同电量保留先出现的房间，与逐行分析的结果一致
+        if self.electricity_min is None or value < self.electricity_min:
+            self.electricity_min, self.min_room = value, room
+        if self.electricity_max is None or value > self.electricity_max:
+            self.electricity_max, self.max_room = value, room
+        if value < LOW_THRESHOLD:
+            self.low_count += 1
+        elif value < HIGH_THRESHOLD:
+            self.medium_count += 1
+        else:
+            self.high_count += 1
+        if consumption:
+            self.consumption_sum += consumption
+
+    def as_dict(self):
+        return {column: getattr(self, column) for column in ROLLUP_COLUMNS}
+
+
+def compute_rollups(readings):
+    """由一次查询的读数计算汇总
+
+    Args:
+        readings: 可迭代的 (楼栋, 房间, 电量, 消耗量或None)
+
+    Returns:
+        汇总行列表 [{building, floor, room_count, ...}]，按楼栋、楼层排序
+    """
+    accumulators = {}
+    for building, room, value, consumption in readings:
+        building = str(building)
+        for floor in (BUILDING_FLOOR, RoomIndex.floor_of(room)):
+            if floor is None:
+                continue
+            key = (building, floor)
+            accumulator = accumulators.get(key)
+            if accumulator is None:
+                accumulator = accumulators[key] = RollupAccumulator(building, floor)
+            accumulator.add(room, value, consumption)
+    return [accumulators[key].as_dict() for key in sorted(accumulators)]
+
+
+def write_rollups(cursor, query_time, rollups):
+    """写入一次查询的汇总并重算当天的日汇总，由调用方提交事务"""
+    crawl_id = crawl_id_of(query_time)
+    if rollups:
+        cursor.executemany(f"""
+            INSERT INTO crawl_rollups (crawl_id, {', '.join(ROLLUP_COLUMNS)})
+            VALUES (%s, {', '.join(['%s'] * len(ROLLUP_COLUMNS))})
+            ON DUPLICATE KEY UPDATE {', '.join(f'{column} = VALUES({column})' for column in ROLLUP_COLUMNS[2:])}
+        """, [(crawl_id, *(row[column] for column in ROLLUP_COLUMNS)) for row in rollups])
+    refresh_daily_rollups(cursor, crawl_id // 1000000)
+
+
+def refresh_daily_rollups(cursor, day):
+    """由当天各次查询的汇总重算daily_rollups，day为YYYYMMDD整数；主键范围读取，可重复执行"""
+    start = day * 1000000
+    cursor.execute("""
+        INSERT INTO daily_rollups
+            (day, building, floor, crawl_count, reading_count, electricity_sum,
+             electricity_min, electricity_max, consumption_sum)
+        SELECT %s, building, floor, COUNT(*), SUM(room_count), SUM(electricity_sum),
+               MIN(electricity_min), MAX(electricity_max), SUM(consumption_sum)
+        FROM crawl_rollups
+        WHERE crawl_id BETWEEN %s AND %s
+        GROUP BY building, floor
+        ON DUPLICATE KEY UPDATE crawl_count = VALUES(crawl_count), reading_count = VALUES(reading_count),
+                                electricity_sum = VALUES(electricity_sum), electricity_min = VALUES(electricity_min),
+                                electricity_max = VALUES(electricity_max), consumption_sum = VALUES(consumption_sum)
+    """, (datetime.datetime.strptime(str(day), "%Y%m%d").date(), start, start + 235959))
+
+
+def load_crawl_rollups(cursor, crawl_id):
+    """读取一次查询的汇总，没有汇总（旧数据未补算）时返回空列表"""
+    if not table_exists(cursor, 'crawl_rollups'):
+        return []
+    cursor.execute(f"""
+        SELECT {', '.join(ROLLUP_COLUMNS)}
+        FROM crawl_rollups
+        WHERE crawl_id = %s
+        ORDER BY building, floor
+    """, (crawl_id,))
+    return [row if isinstance(row, dict) else dict(zip(ROLLUP_COLUMNS, row)) for row in cursor.fetchall()]
+
+
+def rebuild_rollups(conn, callback=None):
+    """为还没有汇总的查询补算汇总，每次查询一个事务
+
+    Returns:
+        补算的查询次数
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT qh.query_time
+            FROM query_history qh
+            LEFT JOIN (SELECT DISTINCT crawl_id FROM crawl_rollups) r
+              ON r.crawl_id = CAST(DATE_FORMAT(qh.query_time, '%Y%m%d%H%i%S') AS UNSIGNED)
+            WHERE r.crawl_id IS NULL
+            ORDER BY qh.query_time
+        """)
+        pending = [row[0] for row in cursor.fetchall()]
+        for index, query_time in enumerate(pending, 1):
+            cursor.execute("SELECT building, room, electricity, consumption FROM electricity_records WHERE crawl_id = %s",
+                           (crawl_id_of(query_time),))
+            readings = []
+            for building, room, electricity, consumption in cursor.fetchall():
+                try:
+                    readings.append((building, room, float(electricity), consumption))
+                except (ValueError, TypeError):
+                    continue
+            write_rollups(cursor, query_time, compute_rollups(readings))
+            conn.commit()
+            if callback:
+                callback(f"补算汇总 {query_time}: {index}/{len(pending)}", len(pending), index)
+        return len(pending)
+    finally:
+        cursor.close()
+
+
+def main(argv=None):
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root_dir not in sys.path:
+        sys.path.insert(0, root_dir)
+    import pymysql
+    from utils.crawl import get_db_password
+    from utils.query_electricity import ElectricityQuery
+
+    parser = argparse.ArgumentParser(description='为旧数据补算按楼栋、楼层的电量汇总')
+    parser.add_argument('--db-host', default='localhost', help='数据库地址')
+    parser.add_argument('--db-user', default='elecuser', help='数据库用户名')
+    parser.add_argument('--db-password', default=None, help='数据库密码，默认读取config/db_password.txt')
+    parser.add_argument('--db-name', default='electricity_data', help='数据库名')
+    args = parser.parse_args(argv)
+    password = args.db_password if args.db_password is not None else get_db_password()
+
+    # 先执行结构迁移，确保汇总表存在
+    query = ElectricityQuery()
+    query.db_host = args.db_host
+    query.db_user = args.db_user
+    query.db_password = password
+    query.db_name = args.db_name
+    if not query.init_database():
+        return 1
+
+    conn = pymysql.connect(host=args.db_host, user=args.db_user, password=password, database=args.db_name)
+    try:
+        rebuilt = rebuild_rollups(conn, callback=lambda message, total, current: print(message, file=sys.stderr))
+    finally:
+        conn.close()
+    print(json.dumps({'rebuilt': rebuilt}, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
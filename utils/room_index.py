@@ -0,0 +1,167 @@
+import os
+import csv
+import pickle
+import threading
+from collections.abc import Mapping
+from config.config import Config
+
+
+class BuildingRooms:
+    """单栋楼的房间索引：房间与roomid双向查找、按楼层列出房间"""
+
+    __slots__ = ('building', 'room_to_id', 'id_to_room', 'floors')
+
+    def __init__(self, building, room_to_id):
+        self.building = building
+        self.room_to_id = room_to_id
+        self.id_to_room = {roomid: room for room, roomid in room_to_id.items()}
+        self.floors = {}
+        for room in room_to_id:
+            self.floors.setdefault(RoomIndex.floor_of(room), []).append(room)
+
+
+class RoomIndex(Mapping):
+    """编译后的房间索引，按楼栋懒加载
+
+    作为Mapping使用时与原来的room_mappings相同：{楼栋: {房间: roomid}}。
+    每栋楼首次访问时才加载，优先读取由CSV编译的pickle缓存，CSV的修改时间或大小变化时重新编译。
+    """
+
+    CACHE_VERSION = 1
+
+    def __init__(self, data_folder=None, cache_dir=None):
+        self.data_folder = data_folder or Config.get_room_data_folder()
+        self.cache_dir = cache_dir or Config.ROOM_INDEX_CACHE_DIR
+        self._buildings = {}
+        self._lock = threading.Lock()
+        self._ordered_keys = None
+        self._positions = None
+
+    @staticmethod
+    def floor_of(room):
+        """从房间号提取楼层，如 5-115 -> 1, 5-1012 -> 10；无法识别时返回None"""
+        number = room.rsplit('-', 1)[-1]
+        return int(number) // 100 if number.isdigit() else None
+
+    def _csv_path(self, building):
+        chinese = Config.BUILDING_NAME_MAP[building]
+        return os.path.join(self.data_folder, f"新苑{chinese}号楼房间数据.csv")
+
+    def _cache_path(self, building):
+        return os.path.join(self.cache_dir, f"building_{building}.pkl")
+
+    def _load_building(self, building):
+        """读取缓存或编译CSV，返回BuildingRooms；CSV不存在时返回None"""
+        csv_path = self._csv_path(building)
+        if not os.path.exists(csv_path):
+            return None
+        stat = os.stat(csv_path)
+        signature = (self.CACHE_VERSION, stat.st_mtime_ns, stat.st_size)
+
+        cache_path = self._cache_path(building)
+        try:
+            with open(cache_path, "rb") as f:
+                cached = pickle.load(f)
+            if cached.get('signature') == signature:
+                return BuildingRooms(building, cached['rooms'])
+        except Exception:
+            # 缓存不存在或已损坏，重新编译
+            pass
+
+        with open(csv_path, "r", encoding="utf-8") as f:
+            rooms = {row["实际房间"]: row["roomid"] for row in csv.DictReader(f)}
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = cache_path + ".tmp"
+            with open(temp_path, "wb") as f:
+                pickle.dump({'signature': signature, 'rooms': rooms}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, cache_path)
+        except OSError as e:
+            # 缓存目录不可写时只影响下次启动速度
+            print(f"写入房间索引缓存失败: {str(e)}")
+        return BuildingRooms(building, rooms)
+
+    def building(self, building):
+        """返回一栋楼的BuildingRooms，楼栋不存在时返回None"""
+        if isinstance(building, str) and building.isdigit():
+            building = int(building)
+        if building not in self._buildings:
+            with self._lock:
+                if building not in self._buildings:
+                    try:
+                        self._buildings[building] = self._load_building(building) if building in Config.BUILDING_NAME_MAP else None
+                    except Exception as e:
+                        print(f"加载 {Config.BUILDING_NAME_MAP.get(building, building)} 号楼数据失败: {str(e)}")
+                        self._buildings[building] = None
+        return self._buildings[building]
+
+    # Mapping接口：{楼栋: {房间: roomid}}
+    def __getitem__(self, building):
+        rooms = self.building(building)
+        if rooms is None:
+            raise KeyError(building)
+        return rooms.room_to_id
+
+    def __iter__(self):
+        for building in Config.BUILDING_NAME_MAP:
+            if self.building(building) is not None:
+                yield building
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def room_id(self, building, room):
+        """房间 -> roomid"""
+        rooms = self.building(building)
+        return rooms.room_to_id.get(room) if rooms else None
+
+    def room_for_id(self, building, roomid):
+        """roomid -> 房间"""
+        rooms = self.building(building)
+        return rooms.id_to_room.get(str(roomid)) if rooms else None
+
+    def floors(self, building):
+        """一栋楼的所有楼层"""
+        rooms = self.building(building)
+        return sorted(floor for floor in rooms.floors if floor is not None) if rooms else []
+
+    def rooms_on_floor(self, building, floor):
+        """一栋楼某层的所有房间"""
+        rooms = self.building(building)
+        return list(rooms.floors.get(floor, [])) if rooms else []
+
+    def ordered_keys(self):
+        """所有(楼栋, 房间)，按楼栋和CSV中的顺序排列；返回共享列表，调用方不应修改"""
+        if self._ordered_keys is None:
+            self._ordered_keys = [(building, room) for building in self for room in self[building]]
+        return self._ordered_keys
+
+    def positions(self):
+        """(楼栋, 房间) -> 在ordered_keys中的位置"""
+        if self._positions is None:
+            self._positions = {key: position for position, key in enumerate(self.ordered_keys())}
+        return self._positions
+
+    def building_ranges(self):
+        """楼栋 -> 该楼栋房间在ordered_keys中的位置区间 (起始, 结束)"""
+        ranges = {}
+        for position, (building, _) in enumerate(self.ordered_keys()):
+            start, _ = ranges.get(building, (position, position))
+            ranges[building] = (start, position + 1)
+        return ranges
+
+
+# 进程内共享的房间索引
+_room_index = None
+_room_index_lock = threading.Lock()
+
+
+def get_room_index():
+    """获取进程内共享的房间索引"""
+    global _room_index
+    if _room_index is None:
+        with _room_index_lock:
+            if _room_index is None:
+                _room_index = RoomIndex()
+    return _room_index
@@ -0,0 +1,198 @@
+import os
+import sys
+import mmap
+import json
+import zlib
+import array
+import struct
+import datetime
+from config.config import Config
+from utils.room_index import get_room_index
+from utils.crawl_results import CrawlResults, STATUS_SUCCESS
+
+
+class Snapshot:
+    """一次批量查询的列式快照，只读
+
+    文件布局（小端）:
+        头部64字节: 魔数、版本、房间数、房间顺序校验值、房间顺序段偏移/长度、query_time
+        float32电量数组: 房间数 × 4字节，按房间索引顺序排列
+        有效位图: 每个房间1位，1表示该房间有读数
+        房间顺序段: JSON [[楼栋, 房间], ...]，仅在房间索引与写入时不一致时读取
+
+    文件通过mmap打开，values直接引用映射内存，不复制数据。
+    """
+
+    MAGIC = b"LXSNAP"
+    VERSION = 1
+    HEADER = struct.Struct("<6sHIIQI19s17x")
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        magic, version, count, fingerprint, keys_offset, keys_length, query_time, = \
+            self.HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            self.close()
+            raise ValueError(f"不是有效的快照文件: {path}")
+        self.count = count
+        self.query_time = query_time.decode("ascii")
+        # 快照按小端写入，读取时按本机字节序解释，仅支持小端平台
+        self.values = memoryview(self._map)[self.HEADER.size:self.HEADER.size + count * 4].cast("f")
+        bitmap_offset = self.HEADER.size + count * 4
+        self.bitmap = memoryview(self._map)[bitmap_offset:bitmap_offset + (count + 7) // 8]
+        self._fingerprint = fingerprint
+        self._keys_offset = keys_offset
+        self._keys_length = keys_length
+        self._keys = None
+        self._positions = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def close(self):
+        """释放映射；之后不能再访问values"""
+        for view in ("values", "bitmap"):
+            if getattr(self, view, None) is not None:
+                getattr(self, view).release()
+                setattr(self, view, None)
+        self._map.close()
+        self._file.close()
+
+    @property
+    def keys(self):
+        """房间顺序 [(楼栋, 房间), ...]；与当前房间索引一致时直接使用索引"""
+        if self._keys is None:
+            ordered = get_room_index().ordered_keys()
+            if len(ordered) == self.count and room_order_fingerprint(ordered) == self._fingerprint:
+                self._keys = ordered
+            else:
+                raw = self._map[self._keys_offset:self._keys_offset + self._keys_length]
+                self._keys = [(building, room) for building, room in json.loads(raw.decode("utf-8"))]
+        return self._keys
+
+    def is_valid(self, position):
+        return bool(self.bitmap[position >> 3] & (1 << (position & 7)))
+
+    def valid_count(self):
+        """有读数的房间数"""
+        return sum(bin(byte).count("1") for byte in self.bitmap)
+
+    def position(self, building, room):
+        """房间在数组中的位置，不存在时返回None"""
+        if self._positions is None:
+            self._positions = {key: index for index, key in enumerate(self.keys)}
+        return self._positions.get((int(building), room))
+
+    def get(self, building, room):
+        """单个房间的电量，没有读数时返回None"""
+        position = self.position(building, room)
+        if position is None or not self.is_valid(position):
+            return None
+        return self.values[position]
+
+    def items(self):
+        """依次返回有读数的 (楼栋, 房间, 电量)"""
+        values = self.values
+        for position, (building, room) in enumerate(self.keys):
+            if self.is_valid(position):
+                yield building, room, values[position]
+
+    def to_dict(self):
+        """转换为与批量查询结果相同的嵌套结构 {楼栋: {房间: 电量字符串}}，只包含有读数的房间"""
+        data = {}
+        for building, room, value in self.items():
+            data.setdefault(building, {})[room] = f"{value:.2f}"
+        return data
+
+
+def room_order_fingerprint(keys):
+    """房间顺序的校验值，用于判断快照是否与当前房间索引一致"""
+    return zlib.crc32("\n".join(f"{building}-{room}" for building, room in keys).encode("utf-8"))
+
+
+def snapshot_path(query_time, folder=None):
+    """按query_time生成快照文件路径，如 snapshots/snapshot_20250101083000.bin"""
+    stamp = datetime.datetime.strptime(query_time, "%Y-%m-%d %H:%M:%S").strftime("%Y%m%d%H%M%S")
+    return os.path.join(folder or Config.SNAPSHOT_DIR, f"snapshot_{stamp}.bin")
+
+
+def write_snapshot(query_time, data, folder=None):
+    """把一次批量查询的结果写成列式快照
+
+    Args:
+        query_time: 查询时间 "%Y-%m-%d %H:%M:%S"
+        data: CrawlResults，或 {楼栋: {房间: 电量字符串}}（无法解析为数字的结果记为无读数）
+
+    Returns:
+        快照文件路径
+    """
+    keys = get_room_index().ordered_keys()
+    bitmap = bytearray((len(keys) + 7) // 8)
+    if isinstance(data, CrawlResults) and data.keys_list is keys:
+        # 紧凑结果与快照顺序相同，电量数组整体转为float32
+        values = array.array("f", data.values)
+        position = data.status.find(STATUS_SUCCESS)
+        while position != -1:
+            if data.has_value(position):
+                bitmap[position >> 3] |= 1 << (position & 7)
+            position = data.status.find(STATUS_SUCCESS, position + 1)
+    else:
+        values = array.array("f", bytes(4 * len(keys)))
+        for position, (building, room) in enumerate(keys):
+            text = data.get(building, {}).get(room)
+            if text is None:
+                continue
+            try:
+                values[position] = float(text.replace('度', '').strip())
+            except ValueError:
+                continue
+            bitmap[position >> 3] |= 1 << (position & 7)
+    if sys.byteorder != "little":
+        values.byteswap()
+
+    keys_blob = json.dumps(keys, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    keys_offset = Snapshot.HEADER.size + len(values) * 4 + len(bitmap)
+    header = Snapshot.HEADER.pack(Snapshot.MAGIC, Snapshot.VERSION, len(keys), room_order_fingerprint(keys),
+                                  keys_offset, len(keys_blob), query_time.encode("ascii"))
+
+    path = snapshot_path(query_time, folder)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(header)
+        values.tofile(f)
+        f.write(bitmap)
+        f.write(keys_blob)
+    os.replace(temp_path, path)
+    return path
+
+
+def list_snapshots(folder=None):
+    """按时间从旧到新列出所有快照文件"""
+    folder = folder or Config.SNAPSHOT_DIR
+    if not os.path.isdir(folder):
+        return []
+    names = sorted(name for name in os.listdir(folder) if name.startswith("snapshot_") and name.endswith(".bin"))
+    return [os.path.join(folder, name) for name in names]
+
+
+def open_snapshot(query_time=None, folder=None):
+    """打开指定query_time的快照，不指定时打开最新的快照；没有快照时返回None
+
+    只有覆盖全部楼栋的批量查询才写快照，最新的快照即最近一次完整查询。
+    """
+    if query_time:
+        path = snapshot_path(query_time, folder)
+        return Snapshot(path) if os.path.exists(path) else None
+    paths = list_snapshots(folder)
+    return Snapshot(paths[-1]) if paths else None
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""旧版宽表electricity_history迁移到长表electricity_records
+
+宽表每次查询增加一个 e_YYYYMMDDHHMMSS 列，列越多读取越慢，最终会触及MySQL的列数上限。
+本工具按时间顺序逐列把数据复制为electricity_records的行：每列按主键分批读取，
+每批的插入和migration_state中的游标在同一个事务中提交，中断后重新运行从断点继续，不会重复写入。
+所有列迁移完成后在migration_state中记录完成标记，旧版宽表的读取路径随之关闭。
+
+用法:
+    python -m utils.wide_table_migration [--batch-size 2000] [--drop-columns]
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import datetime
+import pymysql
+from config.config import Config
+from utils.db_migrations import table_exists
+from utils.latest_readings import rebuild_latest_readings
+
+MIGRATION_NAME = "wide_to_long"
+COLUMN_PATTERN = re.compile(r"^e_(\d{14})$")
+
+
+def migration_complete(cursor):
+    """宽表是否已全部迁移到electricity_records"""
+    if not table_exists(cursor, 'migration_state'):
+        return False
+    cursor.execute("SELECT done FROM migration_state WHERE name = %s", (MIGRATION_NAME,))
+    row = cursor.fetchone()
+    if row is None:
+        return False
+    return bool(row['done'] if isinstance(row, dict) else row[0])
+
+
+def legacy_reads_enabled(cursor):
+    """是否仍读取旧版宽表：配置未关闭且宽表尚未迁移完成"""
+    return Config.LEGACY_WIDE_TABLE_READS and not migration_complete(cursor)
+
+
+class WideTableMigration:
+    """分批、可续传的宽表迁移"""
+
+    def __init__(self, conn, batch_size=2000, callback=None):
+        """初始化迁移
+
+        Args:
+            conn: 已选定electricity_data库的pymysql连接，须已执行db_migrations
+            batch_size (int): 每批从宽表读取的行数
+            callback: 进度回调 callback(消息, 总列数, 已处理列数)
+        """
+        self.conn = conn
+        self.cursor = conn.cursor()
+        self.batch_size = batch_size
+        self.callback = callback
+
+    def legacy_columns(self):
+        """宽表中所有电量列，按时间从旧到新排列"""
+        if not table_exists(self.cursor, 'electricity_history'):
+            return []
+        self.cursor.execute("SHOW COLUMNS FROM electricity_history")
+        return sorted(row[0] for row in self.cursor.fetchall() if COLUMN_PATTERN.match(row[0]))
+
+    def _state(self, name):
+        self.cursor.execute("SELECT cursor_id, rows_copied, done FROM migration_state WHERE name = %s", (name,))
+        return self.cursor.fetchone()
+
+    def _save_state(self, name, cursor_id, rows_copied, done):
+        self.cursor.execute("""
+            INSERT INTO migration_state (name, cursor_id, rows_copied, done, updated_at)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE cursor_id = VALUES(cursor_id), rows_copied = VALUES(rows_copied),
+                                    done = VALUES(done), updated_at = VALUES(updated_at)
+        """, (name, cursor_id, rows_copied, int(done), datetime.datetime.now()))
+
+    @staticmethod
+    def _reading(value):
+        """宽表中的电量文本清洗后返回(文本, 数值)，错误消息等无法解析的值返回None"""
+        if value is None:
+            return None
+        text = str(value).replace('度', '').strip()
+        try:
+            return text, float(text)
+        except ValueError:
+            return None
+
+    def _load_crawl_readings(self, crawl_id, last_readings):
+        """用electricity_records中一次查询的读数更新每个房间的上次读数"""
+        self.cursor.execute("SELECT building, room, electricity FROM electricity_records WHERE crawl_id = %s",
+                            (crawl_id,))
+        for building, room, electricity in self.cursor.fetchall():
+            reading = self._reading(electricity)
+            if reading is not None:
+                last_readings[(str(building), room)] = reading[1]
+
+    def _migrate_column(self, column, last_readings):
+        """迁移一列，返回复制的行数；新表中已有该次查询时跳过并返回None
+
+        电量按宽表中的原文（去掉"度"字）写入，与all_room一致；消耗量按该房间上一个有效读数计算，
+        与入库时按上次读数计算的规则一致，中间某列缺失或无效不会中断。
+        last_readings为 {(楼栋, 房间): 上一个有效读数}，按列的时间顺序由调用方传入并在此更新。
+        """
+        name = f"{MIGRATION_NAME}:{column}"
+        state = self._state(name)
+        stamp = COLUMN_PATTERN.match(column).group(1)
+        query_time = datetime.datetime.strptime(stamp, "%Y%m%d%H%M%S")
+        crawl_id = int(stamp)
+        if state and state[2]:
+            self._load_crawl_readings(crawl_id, last_readings)
+            return state[1]
+
+        last_id, copied = (state[0], state[1]) if state else (0, 0)
+
+        if state is None:
+            # 新旧代码都写入过的查询，新表中已有数据，不再复制
+            self.cursor.execute("SELECT 1 FROM electricity_records WHERE crawl_id = %s LIMIT 1", (crawl_id,))
+            if self.cursor.fetchone():
+                self._save_state(name, 0, 0, True)
+                self.conn.commit()
+                self._load_crawl_readings(crawl_id, last_readings)
+                return None
+        elif last_id:
+            # 续传的列中已复制的行
+            self._load_crawl_readings(crawl_id, last_readings)
+
+        while True:
+            self.cursor.execute(f"""
+                SELECT id, building, room, {column}
+                FROM electricity_history
+                WHERE id > %s AND {column} IS NOT NULL
+                ORDER BY id
+                LIMIT %s
+            """, (last_id, self.batch_size))
+            batch = self.cursor.fetchall()
+            if not batch:
+                break
+
+            rows = []
+            for _, building, room, value in batch:
+                reading = self._reading(value)
+                if reading is None:
+                    continue
+                text, current = reading
+                key = (str(building), room)
+                prev = last_readings.get(key)
+                consumption = prev - current if prev is not None and prev > current else None
+                last_readings[key] = current
+                rows.append((building, room, query_time, crawl_id, text, consumption))
+            if rows:
+                self.cursor.executemany("""
+                    INSERT INTO electricity_records
+                    (building, room, query_time, crawl_id, electricity, consumption)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, rows)
+            last_id = batch[-1][0]
+            copied += len(rows)
+            # 本批数据与游标一起提交
+            self._save_state(name, last_id, copied, False)
+            self.conn.commit()
+            if len(batch) < self.batch_size:
+                break
+
+        # 补齐query_history，历史时间点列表依赖它
+        self.cursor.execute("SELECT COUNT(*) FROM electricity_records WHERE crawl_id = %s", (crawl_id,))
+        record_count = self.cursor.fetchone()[0]
+        self.cursor.execute("""
+            INSERT INTO query_history (query_time, description, record_count) VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE record_count = VALUES(record_count)
+        """, (query_time, f"宽表迁移 {query_time.strftime('%Y-%m-%d %H:%M')}", record_count))
+        self._save_state(name, last_id, copied, True)
+        self.conn.commit()
+        return copied
+
+    def run(self):
+        """迁移所有未完成的列，全部完成后写入完成标记
+
+        Returns:
+            {'columns', 'migrated_columns', 'skipped_columns', 'rows', 'complete'} 迁移统计
+        """
+        columns = self.legacy_columns()
+        summary = {'columns': len(columns), 'migrated_columns': 0, 'skipped_columns': 0, 'rows': 0}
+        # 每个房间上一个有效读数，按列的时间顺序累积
+        last_readings = {}
+        for index, column in enumerate(columns):
+            copied = self._migrate_column(column, last_readings)
+            if copied is None:
+                summary['skipped_columns'] += 1
+            else:
+                summary['migrated_columns'] += 1
+                summary['rows'] += copied
+            if self.callback:
+                self.callback(f"迁移宽表列 {column}: {index + 1}/{len(columns)}", len(columns), index + 1)
+
+        # 迁移来的读数可能比最新读数表中的更新（只写过宽表的库）
+        if summary['rows']:
+            rebuild_latest_readings(self.cursor)
+        self._save_state(MIGRATION_NAME, 0, summary['rows'], True)
+        self.conn.commit()
+        summary['complete'] = True
+        return summary
+
+    def drop_migrated_columns(self):
+        """迁移完成后删除宽表中已迁移的列，返回删除的列数"""
+        if not migration_complete(self.cursor):
+            raise RuntimeError("宽表尚未迁移完成，不能删除旧列")
+        columns = self.legacy_columns()
+        if columns:
+            self.cursor.execute(
+                "ALTER TABLE electricity_history " + ", ".join(f"DROP COLUMN {column}" for column in columns))
+        return len(columns)
+
+    def close(self):
+        self.cursor.close()
+
+
+def main(argv=None):
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root_dir not in sys.path:
+        sys.path.insert(0, root_dir)
+    from utils.crawl import get_db_password
+    from utils.query_electricity import ElectricityQuery
+
+    parser = argparse.ArgumentParser(description='把旧版宽表electricity_history迁移到electricity_records')
+    parser.add_argument('--db-host', default='localhost', help='数据库地址')
+    parser.add_argument('--db-user', default='elecuser', help='数据库用户名')
+    parser.add_argument('--db-password', default=None, help='数据库密码，默认读取config/db_password.txt')
+    parser.add_argument('--db-name', default='electricity_data', help='数据库名')
+    parser.add_argument('--batch-size', type=int, default=2000, help='每批读取的宽表行数')
+    parser.add_argument('--drop-columns', action='store_true', help='迁移完成后删除宽表中的电量列')
+    args = parser.parse_args(argv)
+    password = args.db_password if args.db_password is not None else get_db_password()
+
+    # 先执行结构迁移，确保crawl_id列和migration_state表存在
+    query = ElectricityQuery()
+    query.db_host = args.db_host
+    query.db_user = args.db_user
+    query.db_password = password
+    query.db_name = args.db_name
+    if not query.init_database():
+        return 1
+
+    conn = pymysql.connect(host=args.db_host, user=args.db_user, password=password, database=args.db_name)
+    migration = WideTableMigration(conn, batch_size=args.batch_size,
+                                   callback=lambda message, total, current: print(message, file=sys.stderr))
+    try:
+        summary = migration.run()
+        if args.drop_columns:
+            summary['dropped_columns'] = migration.drop_migrated_columns()
+    finally:
+        migration.close()
+        conn.close()
+    print(json.dumps(summary, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())